@@ -1,12 +1,13 @@
-import pandas_market_calendars as mcal
 from datetime import datetime
-import pandas as pd
 import sys
 
 class ArgsCheck:
     """
-    Uses Pandas Market Calendars to get a list of trading dates without needing to call 
-    the yfinance api. Used to check the arguments.
+    Uses the shared NYSE trading calendar (built with Pandas Market Calendars) to check for trading
+    dates without needing to call the yfinance api. Used to check the arguments.
+
+    pandas and the calendar are only imported once the dates are known to be well formed, so that
+    invalid arguments are reported without loading them.
     """
     def date_check(start_date, end_date):
         """
@@ -41,18 +42,20 @@ class ArgsCheck:
             if date_1 > today:
                 sys.exit('Error: Start date is in the future.')
             else:
-                nyse = mcal.get_calendar('NYSE')
+                import pandas as pd
+                import trading_calendar
+                nyse = trading_calendar.get_calendar('NYSE')
                 
                 """
-                Use pandas mcal to get the trading days for the NYSE exchange 
+                Use the trading calendar to get the trading days for the NYSE exchange 
                 (since we are using predominantly US stocks)
                 
                 """
 
                 if date_2 <= today:
                     try:
-                        #Get trading days in a df between provided start and end date
-                        df_trading_days = nyse.schedule(date_1,date_2)
+                        #Count trading days between provided start and end date
+                        num_trading_days = nyse.count(date_1, date_2)
                     
                     except pd.errors.OutOfBoundsDatetime:
 
@@ -67,10 +70,10 @@ class ArgsCheck:
 
                         sys.exit('Error: Dates out of bounds.')
 
-                    if len(df_trading_days) == 0:
+                    if num_trading_days == 0:
 
                         """
-                        If the provided dates don't result in an error, but the length of the dataframe is 0,
+                        If the provided dates don't result in an error, but the number of trading days is 0,
                         then no trading days were found. Then, print an error saying there were no trading
                         days found for the specified period.
                         """
@@ -84,8 +87,8 @@ class ArgsCheck:
                     This is if the end date is in the future.
                     """
                     try:
-                        #Get trading days between the start date and today.
-                        df_trading_days = nyse.schedule(date_1, today)
+                        #Count trading days between the start date and today.
+                        num_trading_days = nyse.count(date_1, today)
 
                     except pd.errors.OutOfBoundsDatetime:
 
@@ -99,9 +102,9 @@ class ArgsCheck:
                         """
                         sys.exit('Error: Dates out of bounds.')
 
-                    if len(df_trading_days) == 0:
+                    if num_trading_days == 0:
                         """
-                        If the provided dates don't result in an error, but the length of the dataframe is 0,
+                        If the provided dates don't result in an error, but the number of trading days is 0,
                         then no trading days were found. Then, print an error saying there were no trading
                         days found for the specified period.
                         """
@@ -130,4 +133,32 @@ class ArgsCheck:
     
     def ticker_check(list):
         if list == None:
-            sys.exit("Error: Please provide at least one ticker.")
\ No newline at end of file
+            sys.exit("Error: Please provide at least one ticker.")
+
+    def days_check(days):
+        """
+        Checks that the number of lookback days was provided and is greater than 0.
+        """
+        if days == None or days <= 0:
+            sys.exit('Error: Number of days must be greater than 0.')
+
+    def top_pct_check(top_pct):
+        """
+        Checks that the top percentile is between 1 and 100.
+        """
+        if top_pct == None or top_pct <= 0 or top_pct > 100:
+            sys.exit('Error: Top percentile must be between 1 and 100.')
+
+    def training_window_check(training_window):
+        """
+        Checks that the training window is 'expanding' or a whole number of months greater than 0.
+        """
+        if training_window != 'expanding' and not (str(training_window).isdigit() and int(training_window) > 0):
+            sys.exit('Error: Training window must be a number of months greater than 0 or expanding.')
+
+    def frequency_check(frequency):
+        """
+        Checks that the rebalance frequency is daily, weekly, monthly, quarterly or a whole number of trading days greater than 0.
+        """
+        if frequency not in ['daily', 'weekly', 'monthly', 'quarterly'] and not (str(frequency).isdigit() and int(frequency) > 0):
+            sys.exit('Error: Frequency must be daily, weekly, monthly, quarterly or a number of trading days greater than 0.')
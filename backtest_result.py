@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from result_writer import ResultReader
+
+
+class BacktestResult:
+    """
+    Everything produced by one run of Linreg.perform_strategy, so that the statistics and plots
+    built on a backtest never need to run it again.
+
+    initial_aum: AUM at the start of the backtest.
+    top_stocks: DataFrame of the stocks held each month with their strategy, actual and predicted returns.
+    aum_history: Series of the AUM at the end of each month.
+    holdings: DataFrame (months x tickers) of the portfolio weights held from each rebalance date.
+    equity_curve: Series of the daily marked-to-market AUM.
+    """
+    def __init__(self, initial_aum, top_stocks, aum_history, holdings, equity_curve):
+        self.initial_aum = initial_aum
+        self.top_stocks = top_stocks
+        self.aum_history = aum_history
+        self.holdings = holdings
+        self.equity_curve = equity_curve
+
+    @property
+    def final_aum(self):
+        if len(self.aum_history) == 0:
+            return self.initial_aum
+        return self.aum_history.iloc[-1]
+
+    @property
+    def daily_returns(self):
+        """
+        Returns the daily returns of the equity curve. The first day's return is relative to the initial AUM.
+        """
+        values = self.equity_curve.to_numpy(dtype = float)
+        previous = np.concatenate([[self.initial_aum], values[:-1]])
+        return pd.Series(values / previous - 1, index = self.equity_curve.index)
+
+    def write(self, writer):
+        """
+        Writes the backtest to a result_writer.ResultWriter as the tables top_stocks, aum_history, holdings and
+        equity_curve, each with a Date column.
+        """
+        writer.write('top_stocks', self.top_stocks)
+        writer.write('aum_history', {'Date': self.aum_history.index, 'AUM': self.aum_history.to_numpy(dtype = float)})
+        holdings = self.holdings.reset_index()
+        holdings.columns = ['Date'] + list(self.holdings.columns)
+        writer.write('holdings', holdings)
+        writer.write('equity_curve', {'Date': self.equity_curve.index, 'AUM': self.equity_curve.to_numpy(dtype = float)})
+
+    def __iter__(self):
+        #Unpacks as (final AUM, top stocks), what perform_strategy used to return.
+        return iter((self.final_aum, self.top_stocks))
+
+
+class StoredBacktestResult(BacktestResult):
+    """
+    The BacktestResult of a backtest streamed to a result_writer.ResultWriter, see Linreg.perform_strategy.
+
+    Only the AUM at the end of each month is kept in memory. The top stocks, holdings and equity curve are
+    read from the tables written to directory whenever they are used, so the backtest is never held in
+    memory as a whole. Parquet and arrow tables can only be read once their writer has been closed.
+    """
+    def __init__(self, initial_aum, aum_history, directory, tickers):
+        self.initial_aum = initial_aum
+        self.aum_history = aum_history
+        self.directory = directory
+        self.tickers = list(tickers)
+
+    def _read(self, table):
+        reader = ResultReader(self.directory)
+        return reader.read(table) if table in reader.tables else None
+
+    @property
+    def top_stocks(self):
+        top_stocks = self._read('top_stocks')
+        if top_stocks is None:
+            return pd.DataFrame(columns = ['Stock', 'Return_actual', 'Predicted_Return', 'Date'])
+        return top_stocks
+
+    @property
+    def holdings(self):
+        holdings = self._read('holdings')
+        if holdings is None:
+            return pd.DataFrame(np.zeros((0, len(self.tickers))), index = pd.DatetimeIndex([]), columns = self.tickers)
+        return pd.DataFrame(holdings[self.tickers].to_numpy(dtype = float), index = pd.DatetimeIndex(holdings['Date']), columns = self.tickers)
+
+    @property
+    def equity_curve(self):
+        equity_curve = self._read('equity_curve')
+        if equity_curve is None:
+            return pd.Series(dtype = float)
+        return pd.Series(equity_curve['AUM'].to_numpy(dtype = float), index = pd.DatetimeIndex(equity_curve['Date'], name = 'Date'))
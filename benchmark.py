@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from linreg import Linreg
+from portfolio_statistics import PortfolioStatistics
+from synthetic_data import SyntheticProvider, synthetic_tickers
+
+STAGES = ['load_panel', 'calculate_returns', 'run_strategy', 'actual_performance', 'perform_strategy', 'calculate_statistics']
+
+
+class Benchmark:
+    """
+    Times the hot paths of the backtest on a deterministic synthetic universe, without network access.
+
+    Each stage computes its results from scratch, none of them memoized by an earlier stage:
+    load_panel: loading the whole backtest's prices into the price panel.
+    calculate_returns: one month's lookback returns for every ticker.
+    run_strategy: one month's strategy selection.
+    actual_performance: one month's forward returns of the Strategy's selection.
+    perform_strategy: the whole Linreg backtest end to end, including loading its data.
+    calculate_statistics: PortfolioStatistics on the result of that backtest.
+    """
+    def __init__(self, num_tickers, years, end_date = '20221230', days_1 = 30, days_2 = 60, top_pct = 10, aum = 100000, seed = 0):
+        self.tickers = synthetic_tickers(num_tickers)
+        self.years = years
+        self.end_date = end_date
+        self.start_date = (pd.Timestamp(end_date) - pd.DateOffset(years = years)).strftime('%Y%m%d')
+        self.days_1 = days_1
+        self.days_2 = days_2
+        self.top_pct = top_pct
+        self.aum = aum
+        self.provider = SyntheticProvider(seed)
+
+    def linreg(self):
+        return Linreg(self.tickers, self.start_date, self.end_date, self.days_1, self.days_2, 'M', 'R', self.top_pct, self.aum,
+                      provider = self.provider)
+
+    def run(self, repeat = 1):
+        """
+        Returns a dict of stage -> best time in seconds over repeat runs.
+        """
+        timings = {stage: [] for stage in STAGES}
+        for _ in range(repeat):
+            for stage, seconds in self.run_once().items():
+                timings[stage].append(seconds)
+        return {stage: min(seconds) for stage, seconds in timings.items()}
+
+    def run_once(self):
+        timings = {}
+        linreg = self.linreg()
+        strategy = linreg.Strategy
+        last_trading_days, window_starts = linreg.window_starts()
+        if len(window_starts) < 3:
+            raise ValueError('The benchmark period must cover at least two month-ends.')
+        timings['load_panel'] = timed(lambda: linreg.load_panel(window_starts))
+
+        panel = strategy.get_panel(window_starts[1], window_starts[2], self.tickers)
+        timings['calculate_returns'] = timed(lambda: strategy.calculate_returns(window_starts[1], self.days_1, 'M', panel, self.tickers))
+        timings['run_strategy'] = timed(lambda: strategy.run_strategy(window_starts[1], window_starts[2], self.days_1, 'M', self.tickers))
+        timings['actual_performance'] = timed(lambda: strategy.actual_performance(window_starts[1], window_starts[2]))
+
+        linreg = self.linreg()
+        timings['perform_strategy'] = timed(linreg.perform_strategy)
+        timings['calculate_statistics'] = timed(lambda: PortfolioStatistics(linreg).calculate_statistics())
+        return timings
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def environment():
+    """
+    Returns the commit and library versions the benchmark ran with.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True,
+                                cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'time': datetime.now().isoformat(timespec = 'seconds'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine()}
+
+
+def run_benchmarks(universes, years, repeat = 1, **settings):
+    """
+    Runs the benchmark for every (number of tickers, years) combination and returns the results as a
+    JSON-serializable dict: the environment and one row per case and stage.
+    """
+    results = []
+    for num_tickers in universes:
+        for num_years in years:
+            timings = Benchmark(num_tickers, num_years, **settings).run(repeat)
+            for stage, seconds in timings.items():
+                results.append({'tickers': num_tickers, 'years': num_years, 'stage': stage, 'seconds': seconds})
+    return {'environment': environment(), 'results': results}
+
+
+def compare(results, baseline):
+    """
+    Returns a DataFrame of the timings of results next to those of a baseline run, with the speedup of each.
+    Cases missing from the baseline have NaN baseline timings.
+    """
+    columns = ['tickers', 'years', 'stage']
+    current = pd.DataFrame(results['results'])
+    previous = pd.DataFrame(baseline['results'])
+    merged = pd.merge(previous, current, on = columns, how = 'right', suffixes = ('_baseline', ''))
+    merged['speedup'] = merged['seconds_baseline'] / merged['seconds']
+    return merged
+
+
+def parse_arguments(arguments = None):
+    parser = argparse.ArgumentParser(description = 'Time the backtest on synthetic universes.')
+    parser.add_argument('--tickers', nargs='+', type=int, default=[10, 100], help='universe sizes to benchmark')
+    parser.add_argument('--years', nargs='+', type=int, default=[1, 5], help='backtest lengths in years')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the best time is kept')
+    parser.add_argument('--top_pct', type=int, default=10, help='top percentile to select')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic prices')
+    parser.add_argument('--output', type=str, default=None, help='JSON file to write the results to')
+    parser.add_argument('--compare', type=str, default=None, help='JSON results of an earlier run to compare against')
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    results = run_benchmarks(args.tickers, args.years, args.repeat, top_pct = args.top_pct, seed = args.seed)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent = 2)
+    if args.compare is not None:
+        with open(args.compare) as file:
+            print(compare(results, json.load(file)).to_string(index = False))
+    else:
+        print(pd.DataFrame(results['results']).to_string(index = False))
@@ -0,0 +1,203 @@
+import numpy as np
+from portfolio_statistics import RISK_FREE_RATE
+
+#Bytes of working arrays a resampling may hold at once. Resamples are drawn and reduced in chunks that fit.
+MEMORY_CAP = 256 * 2 ** 20
+
+
+def chunk_size(bytes_per_resample, memory_cap = MEMORY_CAP):
+    """
+    Returns how many resamples of bytes_per_resample bytes each fit in memory_cap, at least 1.
+    """
+    return max(1, int(memory_cap // max(bytes_per_resample, 1)))
+
+
+def sharpe_ratios(returns, risk_free_rate = RISK_FREE_RATE):
+    """
+    Returns the Sharpe ratio of every row of a (resamples x periods) array of returns, like
+    PortfolioStatistics: (mean - risk_free_rate) / standard deviation (ddof = 1).
+    """
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return (returns.mean(axis = 1) - risk_free_rate) / returns.std(axis = 1, ddof = 1)
+
+
+class ResamplingResult:
+    """
+    The Sharpe ratios and final AUMs of every resample, and those of the backtest they were resampled from.
+
+    null_sharpe and null_final_aum are the resamples under the null hypothesis the p-values test the backtest
+    against. They default to the resamples themselves, which is right when those are drawn under the null
+    (like random_portfolios) but not when they are drawn from the backtest itself (like block_bootstrap).
+    """
+    def __init__(self, sharpe, final_aum, observed_sharpe, observed_final_aum, null_sharpe = None, null_final_aum = None):
+        self.sharpe = sharpe
+        self.final_aum = final_aum
+        self.observed_sharpe = observed_sharpe
+        self.observed_final_aum = observed_final_aum
+        self.null_sharpe = null_sharpe if null_sharpe is not None else sharpe
+        self.null_final_aum = null_final_aum if null_final_aum is not None else final_aum
+
+    def __len__(self):
+        return len(self.sharpe)
+
+    @staticmethod
+    def p_value(values, observed):
+        """
+        Returns the share of resampled values at least as large as observed, counting the observation itself,
+        so it is never 0.
+        """
+        values = np.asarray(values, dtype = float)
+        return (1 + np.count_nonzero(values >= observed)) / (1 + len(values))
+
+    def summary(self, quantiles = (0.05, 0.5, 0.95)):
+        """
+        Returns a dict with the quantiles of the resampled Sharpe ratios and final AUMs, and the p-values of the
+        observed ones against their resamples under the null hypothesis.
+        """
+        summary = {}
+        for name, values, null_values, observed in [('Sharpe', self.sharpe, self.null_sharpe, self.observed_sharpe),
+                                                    ('Final AUM', self.final_aum, self.null_final_aum, self.observed_final_aum)]:
+            for q, value in zip(quantiles, np.nanquantile(values, quantiles)):
+                summary[f'{name} {q:.0%} quantile'] = value
+            summary[f'{name} p-value'] = self.p_value(null_values, observed)
+        return summary
+
+
+def block_bootstrap_indices(num_periods, num_resamples, block_length, rng):
+    """
+    Returns a (num_resamples x num_periods) int array of circular block bootstrap positions: every resample
+    joins blocks of block_length consecutive positions starting at random, wrapping around the end.
+    """
+    block_length = max(1, min(int(block_length), num_periods))
+    num_blocks = -(-num_periods // block_length)
+    starts = rng.integers(0, num_periods, size = (num_resamples, num_blocks))
+    positions = (starts[:, :, None] + np.arange(block_length)).reshape(num_resamples, -1)[:, :num_periods]
+    return positions % num_periods
+
+
+def block_bootstrap(returns, num_resamples = 10000, block_length = 20, initial_aum = 1.0, seed = None,
+                    risk_free_rate = RISK_FREE_RATE, memory_cap = MEMORY_CAP):
+    """
+    Resamples a series of daily returns with the circular block bootstrap, which keeps the autocorrelation
+    within blocks of block_length days, and returns a ResamplingResult with the Sharpe ratio and final AUM
+    (from initial_aum) of every resample.
+
+    The p-values test the null hypothesis that the strategy earns no more than risk_free_rate: the same
+    resamples are shifted by risk_free_rate - the mean return, so the series they are drawn from keeps its
+    volatility and autocorrelation but has a Sharpe ratio of 0.
+
+    The resamples are drawn in chunks that fit memory_cap and reduced one chunk at a time. The random draws
+    do not depend on the chunk size, so a seed gives the same result whatever the memory cap.
+    """
+    returns = np.asarray(returns, dtype = float)
+    returns = returns[~np.isnan(returns)]
+    num_periods = len(returns)
+    shift = risk_free_rate - returns.mean() if num_periods > 0 else 0.0
+    rng = np.random.default_rng(seed)
+    sharpe = np.empty(num_resamples)
+    final_aum = np.empty(num_resamples)
+    null_sharpe = np.empty(num_resamples)
+    null_final_aum = np.empty(num_resamples)
+    #Positions, resampled returns, their null hypothesis shift and their growth.
+    chunk = chunk_size(4 * 8 * num_periods, memory_cap)
+    for start in range(0, num_resamples, chunk):
+        stop = min(start + chunk, num_resamples)
+        resampled = returns[block_bootstrap_indices(num_periods, stop - start, block_length, rng)]
+        sharpe[start:stop] = sharpe_ratios(resampled, risk_free_rate)
+        final_aum[start:stop] = initial_aum * np.prod(1 + resampled, axis = 1)
+        resampled += shift
+        null_sharpe[start:stop] = sharpe_ratios(resampled, risk_free_rate)
+        null_final_aum[start:stop] = initial_aum * np.prod(1 + resampled, axis = 1)
+    observed = sharpe_ratios(returns[None, :], risk_free_rate)[0]
+    return ResamplingResult(sharpe, final_aum, observed, initial_aum * np.prod(1 + returns), null_sharpe, null_final_aum)
+
+
+def random_subsets(rng, sizes, k, num_resamples):
+    """
+    Draws num_resamples random subsets of k distinct positions in range(size) for every size in sizes, as a
+    (num_resamples x len(sizes) x k) int array sorted along the last axis. Where a size is at most k the
+    subset is range(k), whose positions from the size on are not real.
+
+    k positions are drawn and the repeated ones drawn again until none are left, which costs about k draws
+    per subset instead of one per position. Every subset is equally likely, since redrawing repeats does not
+    depend on which positions they are.
+    """
+    sizes = np.asarray(sizes)
+    picks = rng.integers(0, np.maximum(sizes, 1)[None, :, None], size = (num_resamples, len(sizes), k), dtype = np.int32)
+    picks[:, sizes <= k] = np.arange(k, dtype = np.int32)
+    #One subset per row, kept sorted so repeats are next to each other. Only rows with repeats are redrawn.
+    rows = picks.reshape(-1, k)
+    rows.sort(axis = 1)
+    row_sizes = np.broadcast_to(sizes, picks.shape[:2]).ravel()
+    checked = np.flatnonzero((rows[:, 1:] == rows[:, :-1]).any(axis = 1))
+    while len(checked) > 0:
+        subsets = rows[checked]
+        repeated_rows, places = np.nonzero(subsets[:, 1:] == subsets[:, :-1])
+        subsets[repeated_rows, places + 1] = rng.integers(0, row_sizes[checked[repeated_rows]])
+        subsets.sort(axis = 1)
+        rows[checked] = subsets
+        checked = checked[(subsets[:, 1:] == subsets[:, :-1]).any(axis = 1)]
+    return picks
+
+
+def random_portfolios(period_returns, num_stocks, num_resamples = 10000, initial_aum = 1.0, seed = None,
+                      observed_returns = None, risk_free_rate = RISK_FREE_RATE, memory_cap = MEMORY_CAP):
+    """
+    Holds num_stocks stocks picked at random each period, equally weighted, and returns a ResamplingResult
+    with the Sharpe ratio of the period returns and the final AUM of every random portfolio.
+
+    period_returns: (periods x tickers) array of each stock's return over each period, NaN where a stock
+                    cannot be held. A period with fewer stocks holds all of them.
+    observed_returns: the backtest's own period returns, to compare the random portfolios with.
+
+    Every chunk of resamples draws the stocks of all its portfolios and periods at once with random_subsets.
+    """
+    period_returns = np.asarray(period_returns, dtype = float)
+    num_periods, num_tickers = period_returns.shape
+    available = ~np.isnan(period_returns)
+    #Each period's stocks that can be held come first.
+    order = np.argsort(~available, axis = 1, kind = 'stable')
+    returns = np.take_along_axis(np.where(available, period_returns, 0.0), order, axis = 1)
+    sizes = available.sum(axis = 1)
+    k = max(min(int(num_stocks), num_tickers), 1)
+    #Positions past a period's number of stocks are left out of its portfolio.
+    held = np.arange(k)[None, :] < np.minimum(sizes, k)[:, None]
+    period_offsets = (np.arange(num_periods) * num_tickers)[None, :, None]
+    rng = np.random.default_rng(seed)
+    sharpe = np.empty(num_resamples)
+    final_aum = np.empty(num_resamples)
+    #Positions, returns and their product with the mask.
+    chunk = chunk_size(3 * 8 * num_periods * k, memory_cap)
+    for start in range(0, num_resamples, chunk):
+        stop = min(start + chunk, num_resamples)
+        picks = random_subsets(rng, sizes, k, stop - start)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            resampled = (returns.ravel()[period_offsets + picks] * held).sum(axis = 2) / held.sum(axis = 1)
+        sharpe[start:stop] = sharpe_ratios(resampled, risk_free_rate)
+        final_aum[start:stop] = initial_aum * np.prod(1 + resampled, axis = 1)
+    observed_sharpe = observed_final_aum = np.nan
+    if observed_returns is not None:
+        observed_returns = np.asarray(observed_returns, dtype = float)
+        observed_sharpe = sharpe_ratios(observed_returns[None, :], risk_free_rate)[0]
+        observed_final_aum = initial_aum * np.prod(1 + observed_returns)
+    return ResamplingResult(sharpe, final_aum, observed_sharpe, observed_final_aum)
+
+
+def resample_backtest(linreg, num_resamples = 10000, block_length = 20, seed = None, memory_cap = MEMORY_CAP):
+    """
+    Tests how robust a Linreg backtest is. Returns a dict with:
+    'block_bootstrap': the block bootstrap of its daily returns.
+    'random_portfolios': random portfolios of as many stocks as it holds, picked from the same tickers every
+                         month, compared with its monthly returns.
+    The backtest is run first if it has not been.
+    """
+    result = linreg.result if linreg.result is not None else linreg.perform_strategy()
+    _, window_starts = linreg.window_starts()
+    months = len(result.aum_history)
+    panel = linreg.Strategy.get_panel(window_starts[1], window_starts[-1], linreg.tickers)
+    period_returns = panel.window_returns(window_starts[1:months + 2], linreg.tickers)
+    aums = np.concatenate([[linreg.aum], result.aum_history.to_numpy(dtype = float)])
+    return {'block_bootstrap': block_bootstrap(result.daily_returns.to_numpy(), num_resamples, block_length, linreg.aum, seed,
+                                               memory_cap = memory_cap),
+            'random_portfolios': random_portfolios(period_returns, linreg.Strategy.compute_top_stocks(linreg.top_pct), num_resamples,
+                                                   linreg.aum, seed, aums[1:] / aums[:-1] - 1, memory_cap = memory_cap)}
@@ -0,0 +1,73 @@
+import os
+import pickle
+
+
+class BacktestCheckpoint:
+    """
+    State of a Linreg backtest after its last completed month, saved so that a later run with a
+    later end_date only computes the months after it.
+
+    settings: the Linreg settings the state was computed with. A checkpoint is only resumed by a
+              backtest with the same settings.
+    rebalance_dates: the rebalance dates the completed months were run on, one more than the months.
+    aum: AUM at the end of the last completed month.
+    top_stocks, aum_history, holdings, equity_curve: the BacktestResult so far.
+    training_frames: the merged training data of every completed month.
+    models: the fitted monthly regressions (an ols.OLSResult batch), so their coefficients are kept.
+    online_statistics: the OnlineStatistics after the last completed month.
+    """
+    def __init__(self, settings, rebalance_dates, aum, top_stocks, aum_history, holdings, equity_curve,
+                 training_frames, models, online_statistics):
+        self.settings = settings
+        self.rebalance_dates = rebalance_dates
+        self.aum = aum
+        self.top_stocks = top_stocks
+        self.aum_history = aum_history
+        self.holdings = holdings
+        self.equity_curve = equity_curve
+        self.training_frames = training_frames
+        self.models = models
+        self.online_statistics = online_statistics
+
+    @property
+    def months(self):
+        return len(self.aum_history)
+
+    @property
+    def last_rebalance_date(self):
+        return self.rebalance_dates[-1]
+
+    def matches(self, settings, rebalance_dates):
+        """
+        Returns whether a backtest with these settings and rebalance dates can resume from this checkpoint:
+        the settings are the same and the checkpoint's rebalance dates start the new ones.
+        """
+        return (self.settings == settings and len(self.rebalance_dates) <= len(rebalance_dates)
+                and list(rebalance_dates[:len(self.rebalance_dates)]) == list(self.rebalance_dates))
+
+    def save(self, path):
+        """
+        Saves the checkpoint with pickle. The file is written to a temporary path first and then moved
+        into place, so an interrupted run never leaves a partial checkpoint.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(self, file, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns the checkpoint saved at path, or None if there is none or it cannot be read.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as file:
+                checkpoint = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return checkpoint if isinstance(checkpoint, cls) else None
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from data_provider import DataProvider, YahooProvider
+from price_panel import PricePanel, to_day
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+
+class ColumnarStore(DataProvider):
+    """
+    Local price store holding each field of every ticker as one contiguous (dates x tickers) array
+    with a shared date index, saved as .npy files and opened memory-mapped.
+
+    Opening a store only reads its small metadata file: prices are paged in by the OS as they are
+    used, and load_panel returns a PricePanel whose arrays are views of the mapped file, so a
+    Strategy or Linreg using the store as its provider neither parses nor copies any data.
+
+    Layout of a store directory:
+    meta.json: tickers, fields and dtype.
+    dates.npy: the sorted datetime64[D] date index.
+    <field>.npy: one array per field, e.g. Close.npy. Missing prices are NaN.
+    """
+    META_FILE = 'meta.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, self.META_FILE)) as file:
+            meta = json.load(file)
+        self.tickers = meta['tickers']
+        self.fields = meta['fields']
+        self.dtype = np.dtype(meta['dtype'])
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.dates = np.load(os.path.join(directory, 'dates.npy'))
+        self._arrays = {}
+
+    @classmethod
+    def write(cls, directory, ticker_data, tickers = None, fields = None, dtype = 'float64'):
+        """
+        Writes a dict of ticker -> DataFrame (as returned by DataProvider.fetch_many) to a new store and
+        returns it opened. Dates are the union of every ticker's dates. dtype can be 'float32' to halve
+        the size of the store.
+        """
+        if tickers is None:
+            tickers = list(ticker_data)
+        if fields is None:
+            fields = FIELDS
+        os.makedirs(directory, exist_ok = True)
+        frames = [ticker_data.get(ticker) for ticker in tickers]
+        frames = [frame if frame is not None else pd.DataFrame() for frame in frames]
+        dates = np.unique(np.concatenate([to_day(frame.index) for frame in frames if len(frame) > 0] + [np.empty(0, dtype = 'datetime64[D]')]))
+        np.save(os.path.join(directory, 'dates.npy'), dates)
+
+        for field in fields:
+            #Filled one ticker at a time, so the whole panel is never held in memory twice.
+            array = np.lib.format.open_memmap(cls._path(directory, field), mode = 'w+', dtype = dtype, shape = (len(dates), len(tickers)))
+            array[:] = np.nan
+            for column, frame in enumerate(frames):
+                if len(frame) > 0 and field in frame.columns:
+                    array[np.searchsorted(dates, to_day(frame.index)), column] = frame[field].to_numpy(dtype = float)
+            array.flush()
+            del array
+
+        with open(os.path.join(directory, cls.META_FILE), 'w') as file:
+            json.dump({'tickers': list(tickers), 'fields': list(fields), 'dtype': np.dtype(dtype).name}, file)
+        return cls(directory)
+
+    @classmethod
+    def build(cls, directory, provider, tickers, start_date, end_date, fields = None, dtype = 'float64'):
+        """
+        Fetches [start_date, end_date) of every ticker from another DataProvider and writes it to a new store.
+        """
+        return cls.write(directory, provider.fetch_many(tickers, start_date, end_date), tickers, fields, dtype)
+
+    @staticmethod
+    def _path(directory, field):
+        return os.path.join(directory, field.replace(' ', '_') + '.npy')
+
+    def field(self, field):
+        """
+        Returns the memory-mapped (dates x tickers) array of a field.
+        """
+        if field not in self._arrays:
+            self._arrays[field] = np.load(self._path(self.directory, field), mmap_mode = 'r')
+        return self._arrays[field]
+
+    def _rows(self, start_date, end_date):
+        return np.searchsorted(self.dates, to_day(start_date), 'left'), np.searchsorted(self.dates, to_day(end_date), 'left')
+
+    def load_panel(self, tickers, start_date, end_date, field = 'Close'):
+        """
+        Returns [start_date, end_date) of a field as a PricePanel of views into the mapped file. The panel
+        holds every ticker of the store; tickers only needs to be a subset of them.
+        Tickers that are not in the store get all-NaN prices, which takes a copy.
+        """
+        first_row, end_row = self._rows(start_date, end_date)
+        dates = self.dates[first_row:end_row]
+        values = self.field(field)[first_row:end_row]
+        missing = [ticker for ticker in tickers if ticker not in self.columns]
+        if len(missing) == 0:
+            return PricePanel(dates, self.tickers, values)
+        print(f"Warning: No data found in the store for {', '.join(missing)}.")
+        values = np.concatenate([values, np.full((len(dates), len(missing)), np.nan, dtype = values.dtype)], axis = 1)
+        return PricePanel(dates, self.tickers + missing, values)
+
+    def fetch(self, ticker, start_date, end_date):
+        """
+        Returns one ticker's data for [start_date, end_date) as a DataFrame, like the other providers.
+        Dates on which the ticker has no prices are left out.
+        """
+        first_row, end_row = self._rows(start_date, end_date)
+        index = pd.DatetimeIndex(self.dates[first_row:end_row], name = 'Date')
+        if ticker not in self.columns:
+            print(f"Warning: No data found in the store for {ticker}.")
+            return pd.DataFrame(index = index[:0])
+        column = self.columns[ticker]
+        data = pd.DataFrame({field: np.asarray(self.field(field)[first_row:end_row, column], dtype = float) for field in self.fields}, index = index)
+        return data.dropna(how = 'all')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Build a memory-mapped columnar price store.')
+    parser.add_argument('--tickers', nargs='+', type=str, required=True, help='list of tickers')
+    parser.add_argument('--b', type=str, required=True, help='start date in YYYYMMDD format')
+    parser.add_argument('--e', type=str, required=True, help='end date in YYYYMMDD format')
+    parser.add_argument('--output', type=str, required=True, help='directory to write the store to')
+    parser.add_argument('--data_dir', type=str, default=None, help='read prices from <TICKER>.csv files in this directory instead of yfinance')
+    parser.add_argument('--float32', action='store_true', help='store prices as float32')
+    args = parser.parse_args()
+
+    if args.data_dir is not None:
+        from data_provider import CsvProvider
+        provider = CsvProvider(args.data_dir)
+    else:
+        provider = YahooProvider()
+    store = ColumnarStore.build(args.output, provider, args.tickers, args.b, args.e, dtype = 'float32' if args.float32 else 'float64')
+    print(f"Wrote {len(store.tickers)} tickers x {len(store.dates)} dates to {args.output}")
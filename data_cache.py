@@ -0,0 +1,190 @@
+import os
+import json
+from datetime import datetime
+import pandas as pd
+import instrumentation
+from data_provider import DataProvider, YahooProvider, slice_dates
+from fetcher import ConcurrentFetcher
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.bloopberg', 'cache')
+
+
+class DataCache(DataProvider):
+    """
+    Persistent on-disk cache of OHLCV data keyed by ticker, sitting in front of another DataProvider.
+
+    Each ticker is stored as <cache_dir>/<TICKER>.csv, and the date range that has been
+    requested from upstream so far is stored in <cache_dir>/index.json. Coverage is kept
+    contiguous: when a request overlaps the cached range, only the missing head and/or
+    tail of the range is downloaded and merged into the stored file.
+    """
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir = None, provider = None):
+        """
+        cache_dir: directory holding the cache. Defaults to $BLOOPBERG_CACHE_DIR or ~/.bloopberg/cache.
+        provider: DataProvider used for upstream fetches. Defaults to the yf API, fetched concurrently
+                  with rate limiting and retries.
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get('BLOOPBERG_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.cache_dir = cache_dir
+        if provider is None:
+            provider = ConcurrentFetcher(YahooProvider(), max_workers = 8, requests_per_second = 10)
+        self.provider = provider
+        self.upstream_calls = 0
+        self._index = None
+        self._frames = {}
+
+    def fetch(self, ticker, start_date, end_date):
+        """
+        Returns the data of a ticker for [start_date, end_date), fetching only the parts of the
+        range that are not already cached.
+        """
+        return self.fetch_many([ticker], start_date, end_date)[ticker]
+
+    def fetch_many(self, tickers, start_date, end_date):
+        """
+        Returns a dict of ticker -> DataFrame for [start_date, end_date).
+
+        Tickers missing the same head or tail range are fetched from the provider together
+        in one batched call.
+        """
+        start_date = pd.Timestamp(start_date).normalize()
+        end_date = pd.Timestamp(end_date).normalize()
+
+        #Work out which ranges are missing for every ticker, grouping tickers by range.
+        missing = {}
+        new_coverage = {}
+        for ticker in tickers:
+            coverage = self.coverage(ticker)
+            if coverage is None or self._load(ticker) is None:
+                ranges = [(start_date, end_date)]
+                new_coverage[ticker] = (start_date, end_date)
+            else:
+                covered_start, covered_end = coverage
+                new_start = min(start_date, covered_start)
+                new_end = max(end_date, covered_end)
+                ranges = []
+                #Missing head of the range.
+                if new_start < covered_start:
+                    ranges.append((new_start, covered_start))
+                #Missing tail of the range.
+                if new_end > covered_end:
+                    ranges.append((covered_end, new_end))
+                new_coverage[ticker] = (new_start, new_end)
+            for missing_range in ranges:
+                missing.setdefault(missing_range, []).append(ticker)
+            instrumentation.count('cache.misses' if len(ranges) > 0 else 'cache.hits')
+
+        pieces = {}
+        for (range_start, range_end), range_tickers in missing.items():
+            fetched = self._fetch(range_tickers, range_start, range_end)
+            for ticker in range_tickers:
+                pieces.setdefault(ticker, []).append(fetched.get(ticker))
+
+        #Bars from today onwards may still change, so they never count as covered.
+        today = pd.Timestamp(datetime.today().date())
+        all_data = {}
+        #Index entries of the tickers stored below, written to index.json once for the whole call.
+        entries = {}
+        for ticker in tickers:
+            data = self._load(ticker)
+            if ticker in pieces:
+                fetched_pieces = [piece for piece in pieces[ticker] if piece is not None]
+                data = self._merge(data, fetched_pieces)
+                #A provider leaves out tickers it failed to fetch; only extend the coverage if every piece arrived.
+                if len(fetched_pieces) == len(pieces[ticker]):
+                    new_start, new_end = new_coverage[ticker]
+                    entries[ticker] = self._store(ticker, data, new_start, min(new_end, max(today, new_start)))
+            if data is None:
+                data = pd.DataFrame(index = pd.DatetimeIndex([], name = 'Date'))
+            all_data[ticker] = slice_dates(data, start_date, end_date)
+        if len(entries) > 0:
+            self._write_index({**self._read_index(), **entries})
+        return all_data
+
+    def coverage(self, ticker):
+        """
+        Returns the cached [start, end) range of a ticker as Timestamps, or None if not cached.
+        """
+        entry = self._read_index().get(ticker)
+        if entry is None:
+            return None
+        return pd.Timestamp(entry['start']), pd.Timestamp(entry['end'])
+
+    def clear(self, ticker = None):
+        """
+        Removes one ticker from the cache, or every ticker if none is given.
+        """
+        index = self._read_index()
+        tickers = list(index) if ticker is None else [ticker]
+        for name in tickers:
+            index.pop(name, None)
+            self._frames.pop(name, None)
+            path = self._path(name)
+            if os.path.exists(path):
+                os.remove(path)
+        self._write_index(index)
+
+    def _fetch(self, tickers, start_date, end_date):
+        self.upstream_calls += 1
+        with instrumentation.span('cache.upstream_fetch', tickers = len(tickers)):
+            fetched = self.provider.fetch_many(tickers, start_date, end_date)
+        instrumentation.record_fetch('upstream', tickers, start_date, end_date, sum(len(data) for data in fetched.values()),
+                                     sum(int(data.memory_usage().sum()) for data in fetched.values()))
+        return fetched
+
+    def _merge(self, data, pieces):
+        frames = [frame for frame in [data] + pieces if frame is not None and len(frame) > 0]
+        if len(frames) == 0:
+            return pd.DataFrame(index = pd.DatetimeIndex([], name = 'Date'))
+        merged = pd.concat(frames)
+        #Later downloads win if upstream returned an overlapping row.
+        merged = merged[~merged.index.duplicated(keep = 'last')].sort_index()
+        merged.index.name = 'Date'
+        return merged
+
+    def _path(self, ticker):
+        return os.path.join(self.cache_dir, ticker + '.csv')
+
+    def _load(self, ticker):
+        if ticker in self._frames:
+            return self._frames[ticker]
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        data = pd.read_csv(path, index_col = 0, parse_dates = True)
+        data.index.name = 'Date'
+        self._frames[ticker] = data
+        return data
+
+    def _store(self, ticker, data, start_date, end_date):
+        """
+        Writes a ticker's file and returns its index entry, which the caller adds to index.json.
+        """
+        os.makedirs(self.cache_dir, exist_ok = True)
+        temp_path = self._path(ticker) + '.tmp'
+        data.to_csv(temp_path)
+        os.replace(temp_path, self._path(ticker))
+        self._frames[ticker] = data
+        return {'start': start_date.strftime('%Y-%m-%d'), 'end': end_date.strftime('%Y-%m-%d')}
+
+    def _read_index(self):
+        if self._index is None:
+            path = os.path.join(self.cache_dir, self.INDEX_FILE)
+            if os.path.exists(path):
+                with open(path) as index_file:
+                    self._index = json.load(index_file)
+            else:
+                self._index = {}
+        return self._index
+
+    def _write_index(self, index):
+        #Written to a temporary file and moved into place, so index.json is never left half written.
+        self._index = index
+        os.makedirs(self.cache_dir, exist_ok = True)
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with open(path + '.tmp', 'w') as index_file:
+            json.dump(index, index_file, indent = 1, sort_keys = True)
+        os.replace(path + '.tmp', path)
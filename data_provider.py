@@ -0,0 +1,170 @@
+import io
+import os
+import urllib.parse
+import urllib.request
+import pandas as pd
+from price_panel import PricePanel
+
+
+class DataProvider:
+    """
+    Interface for market data sources used by Getdata, Strategy and Linreg.
+
+    A provider returns OHLCV data for [start_date, end_date) as a DataFrame indexed by
+    Date with the same columns as tests/getdata_spy.csv (Open, High, Low, Close, Adj Close, Volume).
+    Dates may be given as anything pd.Timestamp accepts, e.g. '20210105' or a datetime.
+    """
+    def fetch(self, ticker, start_date, end_date):
+        """
+        Returns one ticker's data for [start_date, end_date).
+        """
+        raise NotImplementedError
+
+    def fetch_many(self, tickers, start_date, end_date):
+        """
+        Returns a dict of ticker -> DataFrame for [start_date, end_date).
+
+        Providers that can load several tickers in one round-trip should override this.
+        """
+        return {ticker: self.fetch(ticker, start_date, end_date) for ticker in tickers}
+
+    def load_panel(self, tickers, start_date, end_date, field = 'Close'):
+        """
+        Returns one field of every ticker for [start_date, end_date) as a PricePanel.
+
+        Providers that already hold their data as arrays (e.g. columnar_store.ColumnarStore) override
+        this to skip building a DataFrame per ticker.
+        """
+        return PricePanel.from_frames(self.fetch_many(tickers, start_date, end_date), tickers, field)
+
+
+def slice_dates(data, start_date, end_date):
+    """
+    Returns the rows of a Date-indexed DataFrame in [start_date, end_date).
+    """
+    start_date = pd.Timestamp(start_date)
+    end_date = pd.Timestamp(end_date)
+    return data.loc[(data.index >= start_date) & (data.index < end_date)]
+
+
+class YahooProvider(DataProvider):
+    """
+    Gets data from the yf API.
+    """
+    COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+    def fetch(self, ticker, start_date, end_date):
+        """
+        Downloads one ticker through yf.Ticker, which unlike yf.download is safe to call from
+        several threads at once (see fetcher.ConcurrentFetcher).
+        """
+        import yfinance as yf
+        data = yf.Ticker(ticker).history(start = pd.Timestamp(start_date), end = pd.Timestamp(end_date), auto_adjust = False)
+        return self.columns(data)
+
+    def fetch_many(self, tickers, start_date, end_date):
+        """
+        Downloads every ticker in a single yf.download call. Prices are not adjusted, like fetch, so both
+        return the same columns.
+        """
+        import yfinance as yf
+        tickers = list(tickers)
+        data = pd.DataFrame(yf.download(tickers, start = pd.Timestamp(start_date), end = pd.Timestamp(end_date), group_by = 'ticker',
+                                        auto_adjust = False))
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: self.columns(data)}
+        all_data = {}
+        for ticker in tickers:
+            if ticker in data.columns.get_level_values(0):
+                all_data[ticker] = self.columns(data[ticker].dropna(how = 'all'))
+            else:
+                all_data[ticker] = pd.DataFrame()
+        return all_data
+
+    def columns(self, data):
+        """
+        Returns yfinance data with only the COLUMNS, in order, indexed by a timezone-naive Date.
+        """
+        data = pd.DataFrame(data)[[column for column in self.COLUMNS if column in data.columns]]
+        if data.index.tz is not None:
+            data.index = data.index.tz_localize(None)
+        data.index.name = 'Date'
+        return data
+
+
+class CsvProvider(DataProvider):
+    """
+    Reads data from local CSV files in the format of tests/getdata_spy.csv and tests/getdata_aapl.csv,
+    so that backtests can run without network access.
+
+    Files are found with a filename pattern where {ticker} is replaced by the ticker and {lower}
+    by the lowercase ticker, e.g. CsvProvider('tests', 'getdata_{lower}.csv').
+    Each file is only parsed once per provider.
+    """
+    def __init__(self, directory, pattern = '{ticker}.csv'):
+        self.directory = directory
+        self.pattern = pattern
+        self._frames = {}
+
+    def path(self, ticker):
+        return os.path.join(self.directory, self.pattern.format(ticker = ticker, lower = ticker.lower()))
+
+    def fetch(self, ticker, start_date, end_date):
+        return slice_dates(self.load(ticker), start_date, end_date)
+
+    def load(self, ticker):
+        """
+        Returns the full contents of a ticker's file, or an empty DataFrame if there is no file.
+        """
+        if ticker not in self._frames:
+            path = self.path(ticker)
+            if not os.path.exists(path):
+                print(f"Warning: No data file found for {ticker} at {path}.")
+                data = pd.DataFrame(index = pd.DatetimeIndex([], name = 'Date'))
+            else:
+                data = read_price_csv(path)
+            self._frames[ticker] = data
+        return self._frames[ticker]
+
+
+class HttpCsvProvider(DataProvider):
+    """
+    Downloads CSV files in the same format as CsvProvider from an HTTP server, e.g. an internal
+    mirror of the price files: <base_url>/<pattern>. Errors are raised to the caller, so wrap it
+    in a fetcher.ConcurrentFetcher for retries, rate limiting and concurrent downloads.
+    """
+    def __init__(self, base_url, pattern = '{ticker}.csv', timeout = 10):
+        self.base_url = base_url.rstrip('/')
+        self.pattern = pattern
+        self.timeout = timeout
+
+    def url(self, ticker):
+        return self.base_url + '/' + urllib.parse.quote(self.pattern.format(ticker = ticker, lower = ticker.lower()))
+
+    def fetch(self, ticker, start_date, end_date):
+        with urllib.request.urlopen(self.url(ticker), timeout = self.timeout) as response:
+            data = read_price_csv(io.BytesIO(response.read()))
+        return slice_dates(data, start_date, end_date)
+
+
+def read_price_csv(path):
+    """
+    Reads a saved price file into a DataFrame indexed by Date, sorted by date.
+    """
+    data = pd.read_csv(path, index_col = 0)
+    data.index = parse_dates(data.index)
+    data.index.name = 'Date'
+    return data.sort_index()
+
+
+def parse_dates(values):
+    """
+    Parses the Date column of a saved CSV file.
+
+    Files saved by pandas use YYYY-MM-DD, while files saved from a spreadsheet (e.g.
+    getdata_aapl.csv) use day-first D/M/YY dates.
+    """
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(values, format = '%Y-%m-%d'))
+    except ValueError:
+        return pd.DatetimeIndex(pd.to_datetime(values, dayfirst = True, format = 'mixed'))
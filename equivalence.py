@@ -0,0 +1,262 @@
+import argparse
+import heapq
+import math
+import os
+import time
+from datetime import datetime
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from data_provider import CsvProvider
+from linreg import Linreg
+from synthetic_data import SyntheticProvider, synthetic_tickers
+
+#Linreg options of every optimized engine checked against the reference.
+ENGINES = {'vectorized': {},
+           'per_window': {'single_load': False},
+           'sharded': {'processes': 2}}
+#Largest difference allowed between an engine and the reference: absolute for predicted returns, relative for the final AUM.
+TOLERANCE = 1e-9
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests')
+#Final AUM of the fixture_case backtest.
+FIXTURE_FINAL_AUM = 144692.99464159686
+
+
+class ReferenceBacktest:
+    """
+    The backtest computed the way the original Strategy and Linreg did, one month and one ticker at a time,
+    without PricePanel, FeatureStore, selection.top_k_mask or ols:
+    calculate_returns finds each ticker's signal date in its own DataFrame and reads the Close prices
+    days (and 20) rows back, run_strategy picks the top stocks with heapq, actual_performance computes
+    each selected stock's return from its own Close prices, and every month's regression is fitted on its
+    own like sklearn's LinearRegression. The top stocks are the head of the month sorted by predicted return.
+
+    Two changes made since on purpose are kept, so the engines can be compared with it: actual_performance
+    keeps every selected stock, whatever the sign of its lookback return, and measures from the Close of
+    the window start to the Close of the window end.
+    """
+    def __init__(self, settings):
+        #Only used for the settings and the rebalance dates.
+        self.linreg = Linreg(**settings)
+        self.provider = self.linreg.Strategy.provider
+        self.tickers = list(self.linreg.tickers)
+        #Each window's DataFrames, loaded once per window.
+        self.data = {}
+
+    def get_data_for_all_tickers(self, start_date, end_date):
+        """
+        Returns a dict of ticker -> DataFrame from 400 days before start_date through end_date.
+        """
+        key = (start_date, end_date)
+        if key not in self.data:
+            data_start_date = datetime.strptime(start_date, '%Y%m%d') - timedelta(days=400)
+            data_end_date = datetime.strptime(end_date, '%Y%m%d') + timedelta(days=1)
+            self.data[key] = {ticker: self.provider.fetch(ticker, data_start_date, data_end_date).sort_index()
+                              for ticker in self.tickers}
+        return self.data[key]
+
+    def calculate_returns(self, start_date, days, strategy, ticker_data):
+        backtest_returns = {}
+        for ticker in self.tickers:
+            df = ticker_data[ticker].reset_index()
+            start_date_index = df.loc[df['Date'] == pd.Timestamp(start_date)].index
+            if len(start_date_index) == 0:
+                continue
+            start_date_row_number = start_date_index[0]
+            if strategy == 'M':
+                #Momentum skips the most recent 20 days to avoid the reversal effect.
+                backtest_start_row, backtest_end_row = start_date_row_number - days - 20, start_date_row_number - 20
+            else:
+                backtest_start_row, backtest_end_row = start_date_row_number - days, start_date_row_number
+            if backtest_start_row < 0:
+                continue
+            backtest_start_price = df.loc[backtest_start_row, 'Close']
+            backtest_end_price = df.loc[backtest_end_row, 'Close']
+            backtest_return = (backtest_end_price - backtest_start_price) / backtest_start_price
+            if not math.isnan(backtest_return):
+                backtest_returns[ticker] = backtest_return
+        return backtest_returns
+
+    def selected_stocks(self, start_date, end_date, days, strategy, top_pct):
+        returns = self.calculate_returns(start_date, days, strategy, self.get_data_for_all_tickers(start_date, end_date))
+        num_top_stocks = math.ceil(len(self.tickers) * top_pct / 100)
+        if strategy == 'M':
+            return heapq.nlargest(num_top_stocks, returns, key = returns.get), returns
+        return heapq.nsmallest(num_top_stocks, returns, key = returns.get), returns
+
+    def run_strategy(self, start_date, end_date, days, strategy):
+        selected_stocks, returns = self.selected_stocks(start_date, end_date, days, strategy, self.linreg.top_pct)
+        stock_returns_df = pd.DataFrame(data = {'Stock': self.tickers, 'Return': [0.0] * len(self.tickers)})
+        for stock in selected_stocks:
+            stock_returns_df.loc[stock_returns_df['Stock'] == stock, 'Return'] = returns[stock]
+        return stock_returns_df
+
+    def actual_performance(self, start_date, end_date):
+        #The Strategy's own selection, as Linreg sets it up.
+        strategy = self.linreg.Strategy
+        stocks_list, _ = self.selected_stocks(strategy.start_date, strategy.end_date, strategy.days, strategy.strategy, self.linreg.top_pct)
+        ticker_data = self.get_data_for_all_tickers(start_date, end_date)
+        stock_returns = []
+        for stock in self.tickers:
+            if stock not in stocks_list:
+                continue
+            close = ticker_data[stock]['Close'].dropna()
+            #The Close of the window start (or the first one after it) to the last Close on or before its end.
+            close = close[(close.index >= pd.Timestamp(start_date)) & (close.index <= pd.Timestamp(end_date))]
+            if len(close) > 0 and close.index[0] < pd.Timestamp(end_date):
+                stock_returns.append({'Stock': stock, 'Return': (close.iloc[-1] - close.iloc[0]) / close.iloc[0]})
+        return pd.DataFrame(stock_returns, columns = ['Stock', 'Return'])
+
+    def merge_data(self, start_date, end_date):
+        merged_df = pd.DataFrame({'Stock': self.tickers})
+        for column, (days, strategy) in zip(self.linreg.signal_columns, self.linreg.signals):
+            merged_df[column] = self.run_strategy(start_date, end_date, days, strategy)['Return'].to_numpy()
+        merged_df = pd.merge(merged_df, self.actual_performance(start_date, end_date), on = 'Stock', how = 'inner')
+        return merged_df.rename(columns = {'Return': 'Return_actual'})
+
+    @staticmethod
+    def predict_performance(X_train, y_train, X_test):
+        """
+        Fits y_train on X_train with an intercept like sklearn's LinearRegression (least squares on centered
+        data, the minimum-norm solution when the fit is underdetermined) and predicts X_test.
+        """
+        X_train = np.asarray(X_train, dtype = float)
+        y_train = np.asarray(y_train, dtype = float)
+        X_mean = X_train.mean(axis = 0) if len(X_train) > 0 else np.zeros(X_train.shape[1])
+        y_mean = y_train.mean() if len(y_train) > 0 else 0.0
+        slopes = np.linalg.lstsq(X_train - X_mean, y_train - y_mean, rcond = None)[0]
+        return np.asarray(X_test, dtype = float) @ slopes + (y_mean - X_mean @ slopes)
+
+    def run(self):
+        """
+        Returns the final AUM and a DataFrame of the top stocks of every month, with the predicted return of
+        every stock of every month in self.predictions (a DataFrame of Date x Stock).
+        """
+        linreg = self.linreg
+        last_trading_days, window_starts = linreg.window_starts()
+        num_months = max(len(window_starts) - 2, 0)
+        window = linreg.training_window
+        num_top_stocks = math.ceil(len(self.tickers) * linreg.top_pct / 100)
+        aum = linreg.aum
+        frames = []
+        top_stocks = []
+        predictions = pd.DataFrame(np.nan, index = last_trading_days[:num_months], columns = self.tickers)
+        if num_months > 0:
+            frames.append(self.merge_data(window_starts[0], window_starts[1]))
+        for i in range(num_months):
+            current_month = self.merge_data(window_starts[i + 1], window_starts[i + 2])
+            training_data = pd.concat(frames if window == 'expanding' else frames[-window:], ignore_index = True)
+            current_month['Predicted_Return'] = self.predict_performance(training_data[linreg.feature_columns],
+                                                                         training_data['Return_actual'],
+                                                                         current_month[linreg.feature_columns])
+            predictions.loc[last_trading_days[i], current_month['Stock']] = current_month['Predicted_Return'].to_numpy()
+            top_pct_df = current_month.sort_values(by = 'Predicted_Return', ascending = False, kind = 'stable').head(num_top_stocks)
+            top_pct_df['Date'] = last_trading_days[i]
+            top_stocks.append(top_pct_df)
+            if len(top_pct_df) > 0:
+                aum = aum * (1 + top_pct_df['Return_actual'].mean())
+            frames.append(current_month)
+        self.predictions = predictions
+        if len(top_stocks) == 0:
+            return aum, pd.DataFrame(columns = ['Stock', 'Predicted_Return', 'Return_actual', 'Date'])
+        return aum, pd.concat(top_stocks, ignore_index = True)
+
+
+def compare(reference, predictions, result, tolerance = TOLERANCE):
+    """
+    Compares the BacktestResult of an engine with the (final AUM, top stocks) of a ReferenceBacktest and
+    its predictions. Returns a dict with:
+    'selection_mismatches': months whose top stocks differ, other than by swapping stocks tied (within
+                            tolerance) with the last one the reference holds.
+    'prediction_error': largest difference between the predicted return of a held stock and the reference's.
+    'aum_error': relative difference of the final AUMs.
+    'passed': whether all three are within tolerance.
+    """
+    reference_aum, reference_top = reference
+    engine_top = result.top_stocks
+    mismatches = 0
+    prediction_error = 0.0
+    for date in predictions.index:
+        held = engine_top.loc[engine_top['Date'] == date]
+        reference_held = reference_top.loc[reference_top['Date'] == date, 'Stock']
+        expected = predictions.loc[date, held['Stock']].to_numpy(dtype = float)
+        if len(held) > 0:
+            prediction_error = max(prediction_error, float(np.max(np.abs(held['Predicted_Return'].to_numpy(dtype = float) - expected))))
+        swapped = set(held['Stock']) ^ set(reference_held)
+        if len(held) != len(reference_held):
+            mismatches += 1
+        elif len(swapped) > 0:
+            cutoff = predictions.loc[date, reference_held].min()
+            #Stocks the reference has no prediction for (NaN) are never tied.
+            if not np.all(np.abs(predictions.loc[date, list(swapped)].to_numpy(dtype = float) - cutoff) <= tolerance):
+                mismatches += 1
+    aum_error = abs(result.final_aum - reference_aum) / abs(reference_aum)
+    return {'selection_mismatches': mismatches, 'prediction_error': prediction_error, 'aum_error': aum_error,
+            'passed': mismatches == 0 and prediction_error <= tolerance and aum_error <= tolerance}
+
+
+def fixture_case():
+    """
+    Returns the settings of the backtest on the SPY and AAPL fixtures in tests/.
+    """
+    return {'tickers': ['SPY', 'AAPL'], 'start_date': '20200601', 'end_date': '20210129', 'days_1': 30, 'days_2': 60,
+            'strategy_1': 'M', 'strategy_2': 'R', 'top_pct': 50, 'aum': 100000,
+            'provider': CsvProvider(FIXTURE_DIR, 'getdata_{lower}.csv')}
+
+
+def synthetic_case(num_tickers, years, end_date = '20221230', top_pct = 10, seed = 0, **settings):
+    """
+    Returns the settings of a backtest of num_tickers synthetic tickers over years years to end_date.
+    """
+    start_date = (pd.Timestamp(end_date) - pd.DateOffset(years = years)).strftime('%Y%m%d')
+    case = {'tickers': synthetic_tickers(num_tickers), 'start_date': start_date, 'end_date': end_date, 'days_1': 30,
+            'days_2': 60, 'strategy_1': 'M', 'strategy_2': 'R', 'top_pct': top_pct, 'aum': 100000,
+            'provider': SyntheticProvider(seed)}
+    case.update(settings)
+    return case
+
+
+def run_equivalence(cases, engines = None, tolerance = TOLERANCE):
+    """
+    Runs the reference backtest and every engine (a dict of name -> Linreg options, defaults to ENGINES) on
+    every case (a dict of name -> Linreg settings). Returns a DataFrame with one row per case and engine:
+    the comparison of compare, both run times and the speedup of the engine over the reference.
+    """
+    if engines is None:
+        engines = ENGINES
+    rows = []
+    for case, settings in cases.items():
+        reference_backtest = ReferenceBacktest(settings)
+        start = time.perf_counter()
+        reference = reference_backtest.run()
+        reference_seconds = time.perf_counter() - start
+        for engine, options in engines.items():
+            start = time.perf_counter()
+            result = Linreg(**settings, **options).perform_strategy()
+            seconds = time.perf_counter() - start
+            row = {'case': case, 'engine': engine}
+            row.update(compare(reference, reference_backtest.predictions, result, tolerance))
+            row.update({'reference_seconds': reference_seconds, 'seconds': seconds, 'speedup': reference_seconds / seconds})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def parse_arguments(arguments = None):
+    parser = argparse.ArgumentParser(description = 'Check the optimized backtest engines against the reference backtest.')
+    parser.add_argument('--tickers', nargs='+', type=int, default=[20, 100], help='synthetic universe sizes')
+    parser.add_argument('--years', nargs='+', type=int, default=[2], help='synthetic backtest lengths in years')
+    parser.add_argument('--engines', nargs='+', type=str, default=list(ENGINES), choices=list(ENGINES), help='engines to check')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='largest difference allowed')
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    cases = {'fixtures': fixture_case()}
+    for num_tickers in args.tickers:
+        for num_years in args.years:
+            cases[f'synthetic_{num_tickers}x{num_years}y'] = synthetic_case(num_tickers, num_years)
+    results = run_equivalence(cases, {engine: ENGINES[engine] for engine in args.engines}, args.tolerance)
+    print(results.to_string(index = False))
+    if not results['passed'].all():
+        raise SystemExit('Some engines differ from the reference backtest.')
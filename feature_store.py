@@ -0,0 +1,89 @@
+import numpy as np
+from price_panel import to_day
+
+#Most recent trading days a momentum signal skips, to avoid the short-term reversal effect.
+MOMENTUM_SKIP = 20
+
+
+def signal_horizon(days, strategy):
+    """
+    Returns the (days, skip) horizon of a strategy's lookback: momentum ('M') skips the most recent
+    MOMENTUM_SKIP trading days, reversal ('R') skips none.
+    """
+    return (days, MOMENTUM_SKIP if strategy == 'M' else 0)
+
+
+def horizon_family(days_list, strategies = ('M', 'R')):
+    """
+    Returns the (days, strategy) signals of every lookback length in days_list for each strategy,
+    e.g. horizon_family(range(5, 255, 5)) for 5 to 250 days of momentum and reversal.
+    """
+    return [(days, strategy) for strategy in strategies for days in days_list]
+
+
+class FeatureStore:
+    """
+    Lookback returns of every ticker of a PricePanel over any horizon, from log prices.
+
+    The return over any (days, skip) horizon ending at a row, from row - days - skip to row - skip, is
+    expm1 of the difference of two log prices: O(1) per date and ticker whatever the horizon. tensor()
+    materializes a whole family of horizons as one (dates x tickers x features) array.
+
+    The log prices are computed once per ticker, the first time a query reads it, into one column of
+    log_close, whose columns are contiguous (Fortran order). The panel itself is never copied: a panel
+    of views into a memory-mapped ColumnarStore stays mapped, and a ticker no query reads is never read.
+
+    Returns match PricePanel.lookback_returns up to rounding: rows are counted on the panel's date index,
+    and a return is NaN where the date is not in the index, the lookback runs past the first row (or before
+    first_date), or a price is missing, including the price on the signal date itself.
+    """
+    def __init__(self, panel):
+        self.panel = panel
+        self.dates = panel.dates
+        self.tickers = panel.tickers
+        #Log Close prices, filled one ticker column at a time. Pages of columns never filled are never touched.
+        self.log_close = np.empty(panel.close.shape, dtype = float, order = 'F')
+        self.has_log_close = np.zeros(len(self.tickers), dtype = bool)
+
+    def log_prices(self, columns):
+        """
+        Returns log_close after taking the log prices of the given ticker columns that have none yet.
+        """
+        for column in np.unique(columns[~self.has_log_close[columns]]):
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                self.log_close[:, column] = np.log(np.asarray(self.panel.close[:, column], dtype = float))
+            self.has_log_close[column] = True
+        return self.log_close
+
+    def lookback_returns(self, dates, days, skip = 0, tickers = None, first_date = None):
+        """
+        Returns a (len(dates) x len(tickers)) array of the returns from row - days - skip to row - skip
+        of each date's row. first_date: the lookback must not start before this date.
+        """
+        return self.tensor(dates, [(days, skip)], tickers, first_date)[:, :, 0]
+
+    def tensor(self, dates, horizons, tickers = None, first_date = None):
+        """
+        Returns a (len(dates) x len(tickers) x len(horizons)) array of lookback returns, one feature per
+        (days, skip) horizon. Use signal_horizon to get the horizon of a (days, strategy) signal.
+        first_date can also be an array with one first date per date.
+        """
+        horizons = np.asarray(horizons, dtype = int).reshape(-1, 2)
+        rows = self.panel.positions(dates)
+        columns = self.panel.column_indices(tickers)
+        end_rows = rows[:, None] - horizons[:, 1][None, :]
+        start_rows = end_rows - horizons[:, 0][None, :]
+        first_row = 0 if first_date is None else np.searchsorted(self.dates, to_day(first_date), 'left')
+        valid = (rows[:, None] >= 0) & (start_rows >= np.reshape(first_row, (-1, 1)))
+
+        log_close = self.log_prices(columns)
+        #Rows are (dates x horizons), so the log prices are (dates x horizons x tickers).
+        end_prices = log_close[np.where(valid, end_rows, 0)[..., None], columns]
+        start_prices = log_close[np.where(valid, start_rows, 0)[..., None], columns]
+        with np.errstate(invalid = 'ignore'):
+            returns = np.expm1(end_prices - start_prices)
+        returns[~valid] = np.nan
+        #A ticker without a price on the signal date itself has no return on that date.
+        signal_missing = np.isnan(log_close[np.where(rows >= 0, rows, 0)[:, None], columns])
+        returns = np.where(signal_missing[:, None, :], np.nan, returns)
+        return returns.transpose(0, 2, 1)
@@ -0,0 +1,131 @@
+import sys
+import threading
+import time
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+import instrumentation
+from data_provider import DataProvider
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket allowing at most `rate` requests per second, with bursts of up to `burst` requests.
+    """
+    def __init__(self, rate, burst = 1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be made.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(error):
+    """
+    Returns whether a failed request is worth retrying: network errors, timeouts, HTTP 429 and 5xx, and
+    yfinance's rate limit error. Other HTTP errors (e.g. 404 for an unknown ticker) and data errors are not retried.
+    """
+    #yfinance is only imported by YahooProvider, so its errors can only be raised once it is loaded.
+    yfinance_exceptions = sys.modules.get('yfinance.exceptions')
+    if yfinance_exceptions is not None and isinstance(error, yfinance_exceptions.YFRateLimitError):
+        return True
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (OSError, TimeoutError, ConnectionError))
+
+
+class ConcurrentFetcher(DataProvider):
+    """
+    Wraps a DataProvider (one data source) to fetch many tickers concurrently on a bounded thread pool.
+
+    Every request to the source goes through the fetcher's own RateLimiter, failed requests are retried
+    with exponential backoff, and failures are isolated per ticker: a ticker that still fails is left out
+    of the result of fetch_many and recorded in self.failures, instead of aborting the whole run.
+    """
+    def __init__(self, provider, max_workers = 8, requests_per_second = None, retries = 3, backoff = 0.5, batch_size = 1):
+        """
+        provider: the data source to fetch from.
+        max_workers: size of the thread pool.
+        requests_per_second: rate limit for this source, or None for no limit.
+        retries: number of retries after the first failed attempt.
+        backoff: seconds to wait before the first retry; doubled for every further retry.
+        batch_size: tickers per request. Above 1, provider.fetch_many is called per batch, and a batch that
+                    keeps failing is retried one ticker at a time.
+        """
+        self.provider = provider
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second) if requests_per_second is not None else None
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.failures = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, ticker, start_date, end_date):
+        """
+        Fetches one ticker with rate limiting and retries. Raises the last error if every attempt fails.
+        """
+        return self._call(self.provider.fetch, ticker, start_date, end_date)
+
+    def fetch_many(self, tickers, start_date, end_date):
+        """
+        Returns a dict of ticker -> DataFrame for every ticker that could be fetched.
+        """
+        tickers = list(tickers)
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        all_data = {}
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            for batch_data in executor.map(lambda batch: self._fetch_batch(batch, start_date, end_date), batches):
+                all_data.update(batch_data)
+        return all_data
+
+    def _fetch_batch(self, batch, start_date, end_date):
+        if len(batch) > 1:
+            try:
+                return self._call(self.provider.fetch_many, batch, start_date, end_date)
+            except Exception:
+                #Isolate the failing ticker(s) by falling back to one request per ticker.
+                pass
+        batch_data = {}
+        for ticker in batch:
+            try:
+                batch_data[ticker] = self.fetch(ticker, start_date, end_date)
+                with self.lock:
+                    self.failures.pop(ticker, None)
+            except Exception as error:
+                with self.lock:
+                    self.failures[ticker] = error
+                print(f"Warning: Failed to fetch {ticker}: {error}. Skipping...")
+        return batch_data
+
+    def _call(self, function, *args):
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with self.lock:
+                self.requests += 1
+            instrumentation.count('fetcher.requests')
+            try:
+                return function(*args)
+            except Exception as error:
+                if attempt >= self.retries or not is_retryable(error):
+                    raise
+                instrumentation.count('fetcher.retries')
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
@@ -1,33 +1,39 @@
-import yfinance as yf
-import pandas as pd
-from parse_args import Parseargs
+from trading_calendar import month_end_positions
 from datetime import datetime
+import instrumentation
+from data_cache import DataCache
 
 class Getdata:
     """
     Uses yfinance to get data of a given ticker.
+
+    The data is read through a DataProvider, by default a DataCache in front of the yf API, so a
+    range that was downloaded before is read from the cache. Any other provider (e.g. a CsvProvider)
+    can be passed in instead.
     """
-    def __init__(self, start_date, end_date, ticker):
+    def __init__(self, start_date, end_date, ticker, provider = None):
         self.start_date =datetime.strptime(start_date, '%Y%m%d')
         self.end_date =datetime.strptime(end_date, '%Y%m%d')     
         self.ticker = ticker
+        self.provider = provider if provider is not None else DataCache()
         self.data = self.getdata()
 
     def getdata(self):
         """
-        Returns one stock's data from the yf API for the period specified.
+        Returns one stock's data from the provider for the period specified.
         """
-        data = yf.download(self.ticker, start = self.start_date, end = self.end_date)
-        data = pd.DataFrame(data)
+        with instrumentation.span('getdata', ticker = self.ticker):
+            data = self.provider.fetch(self.ticker, self.start_date, self.end_date)
+        instrumentation.record_fetch(type(self.provider).__name__, [self.ticker], self.start_date, self.end_date, len(data),
+                                     data.memory_usage().sum())
         return data
     
     def buy_sell_dates(self):
         """
         Returns a list of the last trading days of each month given a valid date period.
         """
-        trading_dates = self.data.index
-        series_trading_dates = pd.Series(trading_dates)
-        monthly_final_trading_days = series_trading_dates.groupby(series_trading_dates.dt.strftime('%Y-%m')).max().tolist()
+        trading_dates = self.data.index.sort_values()
+        monthly_final_trading_days = trading_dates[month_end_positions(trading_dates.values)].tolist()
         return monthly_final_trading_days
 
     def get_first_last_trading_days(self):
@@ -38,6 +44,7 @@ class Getdata:
         return [trading_dates[0], trading_dates[-1]]
 
 if __name__ == '__main__':
+    from parse_args import Parseargs
     list_arguments = Parseargs().parse_arguments()
     print(list_arguments)
     
@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+#The active Profiler, or None when profiling is off.
+_profiler = None
+#Returned by span() when profiling is off, so a disabled span costs one call and no allocation.
+_NULL_SPAN = nullcontext()
+
+
+class Profiler:
+    """
+    Collects timed spans and counters from the hot paths of a backtest.
+
+    Spans are named stages (e.g. 'run_strategy'); spans opened inside a 'month' span are also
+    attributed to that month. A 'chunk' span covers the months given as its dates: the spans opened
+    inside it, outside any 'month' span, are attributed to each of those months in equal shares.
+    Counters count events such as data fetches, rows and bytes loaded, memo and cache hits and
+    misses, and fetches identical to an earlier one.
+
+    Results are written either as a JSON summary (write_json) or as a Chrome trace (write_chrome_trace)
+    that can be opened in chrome://tracing or https://ui.perfetto.dev.
+    """
+    def __init__(self):
+        self.events = []
+        self.counters = defaultdict(int)
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self._fetches = set()
+        self._local = threading.local()
+
+    def span(self, name, **args):
+        return _Span(self, name, args)
+
+    def count(self, name, value = 1):
+        with self.lock:
+            self.counters[name] += value
+
+    def record_fetch(self, source, tickers, start_date, end_date, rows, nbytes):
+        """
+        Counts one data fetch from source, the rows and bytes it loaded, and whether an identical
+        fetch was issued before.
+        """
+        key = (source, tuple(tickers), str(start_date), str(end_date))
+        with self.lock:
+            self.counters['fetches'] += 1
+            self.counters[f'fetches.{source}'] += 1
+            self.counters['rows_loaded'] += int(rows)
+            self.counters['bytes_loaded'] += int(nbytes)
+            if key in self._fetches:
+                self.counters['duplicate_fetches'] += 1
+            self._fetches.add(key)
+
+    def summary(self):
+        """
+        Returns the total calls and seconds of every stage, the seconds of every stage per month, and the counters.
+        """
+        stages = defaultdict(lambda: {'calls': 0, 'seconds': 0.0})
+        months = defaultdict(lambda: defaultdict(float))
+        for event in self.events:
+            stages[event['name']]['calls'] += 1
+            stages[event['name']]['seconds'] += event['duration']
+            for month in event['months']:
+                months[month][event['name']] += event['duration'] / len(event['months'])
+        return {'stages': dict(stages),
+                'months': {month: dict(timings) for month, timings in months.items()},
+                'counters': dict(self.counters)}
+
+    def write_json(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.summary(), file, indent = 2, default = str)
+
+    def write_chrome_trace(self, path):
+        """
+        Writes the spans as complete ('X') events and the final counters as a counter ('C') event,
+        in the Trace Event Format.
+        """
+        trace_events = []
+        for event in self.events:
+            args = dict(event['args'])
+            if len(event['months']) == 1:
+                args['month'] = event['months'][0]
+            elif len(event['months']) > 1:
+                args['months'] = list(event['months'])
+            trace_events.append({'name': event['name'], 'cat': 'backtest', 'ph': 'X', 'pid': 1, 'tid': event['thread'],
+                                 'ts': event['start'] * 1e6, 'dur': event['duration'] * 1e6, 'args': args})
+        end = max([event['start'] + event['duration'] for event in self.events] + [0.0])
+        trace_events.append({'name': 'counters', 'ph': 'C', 'pid': 1, 'tid': 0, 'ts': end * 1e6, 'args': dict(self.counters)})
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file, default = str)
+
+    def write(self, path, format = 'json'):
+        if format == 'chrome':
+            self.write_chrome_trace(path)
+        else:
+            self.write_json(path)
+
+
+class _Span:
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.previous_months = getattr(local, 'months', ())
+        if self.name == 'month':
+            local.months = (str(self.args.get('date')),)
+        elif self.name == 'chunk':
+            local.months = tuple(str(date) for date in self.args.get('dates', ()))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        profiler = self.profiler
+        months = getattr(profiler._local, 'months', ())
+        profiler._local.months = self.previous_months
+        event = {'name': self.name, 'start': self.start - profiler.start, 'duration': end - self.start,
+                 'thread': threading.get_ident(), 'months': months, 'args': self.args}
+        with profiler.lock:
+            profiler.events.append(event)
+        return False
+
+
+def enable():
+    """
+    Starts profiling with a new Profiler and returns it.
+    """
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def disable():
+    """
+    Stops profiling and returns the Profiler that was active, if any.
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def active():
+    return _profiler
+
+
+def span(name, **args):
+    """
+    Returns a context manager timing a stage, e.g. `with instrumentation.span('run_strategy'):`.
+    Does nothing when profiling is off.
+    """
+    if _profiler is None:
+        return _NULL_SPAN
+    return _profiler.span(name, **args)
+
+
+def count(name, value = 1):
+    if _profiler is not None:
+        _profiler.count(name, value)
+
+
+def record_fetch(source, tickers, start_date, end_date, rows, nbytes):
+    if _profiler is not None:
+        _profiler.record_fetch(source, tickers, start_date, end_date, rows, nbytes)
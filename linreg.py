@@ -1,14 +1,22 @@
-import yfinance as yf
+import copy
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from datetime import timedelta
-from sklearn.linear_model import LinearRegression
+import ols
 import stock_strategy
-import pandas_market_calendars as mcal
+from backtest_result import BacktestResult, StoredBacktestResult
+from checkpoint import BacktestCheckpoint
+from online_stats import OnlineStatistics
+import trading_calendar
+from price_panel import to_day
+import instrumentation
+
+#Months perform_strategy computes at once. The statistics, progress and writer follow the backtest chunk by chunk.
+CHUNK_MONTHS = 64
 
 class Linreg:
 
-    def __init__(self, tickers, start_date, end_date, days_1, days_2, strategy_1, strategy_2, top_pct,aum):
+    def __init__(self, tickers, start_date, end_date, days_1, days_2, strategy_1, strategy_2, top_pct,aum, provider = None, single_load = True, strategy = None,
+                 training_window = 1, signals = None, regressors = None, frequency = 'monthly', processes = 1):
         self.tickers = tickers
         self.strategy_1 = strategy_1
         self.strategy_2 = strategy_2
@@ -16,139 +24,477 @@ class Linreg:
         self.days_2 = days_2
         self.aum = aum
 
-        self.start_date = start_date
+        #The backtest starts on the first trading day on or after start_date.
+        self.start_date = trading_calendar.snap(start_date, 'next')
         self.end_date = end_date
         self.top_pct = top_pct
-        self.Strategy = stock_strategy.Strategy(tickers, start_date, end_date, 10, "M",top_pct)
-
-    def merge_data(self):
-        """Merges momentum and reversal data frames for each stock."""
-        ticker_data = self.Strategy.get_data_for_all_tickers(self.start_date, self.end_date, self.tickers)
-
-        strategy_1_returns_df = self.Strategy.run_strategy(self.start_date, self.end_date, self.days_1, self.strategy_1, self.tickers)
-        strategy_2_returns_df = self.Strategy.run_strategy(self.start_date, self.end_date, self.days_2, self.strategy_2, self.tickers)
-
-
-        merged_df = pd.merge(strategy_1_returns_df,strategy_2_returns_df, on='Stock', how='inner')
-        
-
-        actual_performance = self.Strategy.actual_performance(self.start_date, self.end_date)
+        #(days, strategy) lookback signals, each merged as a Return_strategy_<k> column. Defaults to the two
+        #strategies above; any number of signals can be given instead, e.g. feature_store.horizon_family(...).
+        if signals is None:
+            signals = [(days_1, strategy_1), (days_2, strategy_2)]
+        self.signals = [(int(days), strategy) for days, strategy in signals]
+        self.signal_columns = [f'Return_strategy_{k + 1}' for k in range(len(self.signals))]
+        #Strategy return columns used as regression features: all the signals, or the subset in regressors.
+        self.feature_columns = list(regressors) if regressors is not None else list(self.signal_columns)
+        unknown = [column for column in self.feature_columns if column not in self.signal_columns]
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown regressors: {', '.join(unknown)}.")
+        #Rebalance frequency: 'daily', 'weekly', 'monthly', 'quarterly' or every N trading days. The backtest
+        #runs one period per rebalance; the docstrings below call a period a month.
+        trading_calendar.period_keys([], frequency)
+        self.frequency = frequency
+        #Months of cross-sections each month's regression is trained on: 1 for the previous month only,
+        #N for a rolling window of the last N months, or 'expanding' for every month so far.
+        if training_window != 'expanding' and not (isinstance(training_window, (int, np.integer)) and training_window > 0):
+            raise ValueError("training_window must be a number of months greater than 0 or 'expanding'.")
+        self.training_window = training_window
+        #Load the whole backtest's prices once instead of once per month.
+        self.single_load = single_load
+        #Worker processes that merge the windows of the loaded panel in shards of tickers, from shared memory.
+        self.processes = processes
+        #provider is the market data source (a DataProvider); None means the cached yf API.
+        #An existing Strategy (e.g. one shared by every configuration of a sweep) can be passed in instead.
+        if strategy is None:
+            strategy = stock_strategy.Strategy(tickers, self.start_date, end_date, 10, "M",top_pct, provider = provider)
+        else:
+            strategy.top_pct = top_pct
+        self.Strategy = strategy
+        #BacktestResult and OnlineStatistics of the last perform_strategy run.
+        self.result = None
+        self.online_statistics = None
+
+    def merge_data(self, start_date = None, end_date = None):
+        """Merges the returns of every signal's strategy (momentum or reversal) for each stock at start_date,
+        one Return_strategy_<k> column per signal, with the actual performance from the Close of start_date to that of end_date. Defaults to the whole backtest period."""
+        if start_date is None:
+            start_date = self.start_date
+        if end_date is None:
+            end_date = self.end_date
+
+        #run_strategy returns every ticker in the same order, so its columns line up.
+        merged_df = pd.DataFrame({'Stock': self.tickers})
+        for column, (days, strategy) in zip(self.signal_columns, self.signals):
+            merged_df[column] = self.Strategy.run_strategy(start_date, end_date, days, strategy, self.tickers)['Return'].to_numpy()
+
+        actual_performance = self.Strategy.actual_performance(start_date, end_date)
         merged_df = pd.merge(merged_df, actual_performance, on='Stock', how='inner')
 
-        merged_df = merged_df.rename(columns={'Return_x': 'Return_strategy_1', 'Return_y': 'Return_strategy_2', 'Return': 'Return_actual'})
-
-        #print(merged_df)
+        merged_df = merged_df.rename(columns={'Return': 'Return_actual'})
 
         return merged_df
     
     def predict_performance(self, X_train, y_train, X_test):
         # Fit a linear regression model
-        model = LinearRegression()
-        model.fit(X_train, y_train)
+        model = ols.fit_ols(X_train, y_train)
+        self.model = model
 
         # Predict stock returns
         predicted_returns = model.predict(X_test)
         return predicted_returns
-    
 
+    def fit_model(self, feature_columns = None):
+        """
+        Fits one regression of actual returns on the strategy returns over every month's training
+        data from the last perform_strategy run. Returns an OLSResult with .params and .tvalues.
+
+        feature_columns: any subset of the signal columns to regress on, defaults to feature_columns.
+        The training data already holds every signal, so no price is read again. A streamed backtest (see
+        perform_strategy) does not keep its training data, so only the feature columns it was run with can be
+        fitted, from self.online_statistics.regression.
+        """
+        if feature_columns is None:
+            feature_columns = self.feature_columns
+        if any(frame is None for frame in self.training_frames):
+            if list(feature_columns) != list(self.feature_columns):
+                raise ValueError("A streamed backtest keeps no training data to fit other feature columns on.")
+            return self.online_statistics.regression.fit(self.feature_columns)
+        training_data = pd.concat(self.training_frames, ignore_index=True)
+        return ols.fit_ols(training_data[list(feature_columns)], training_data['Return_actual'])
+
+    def rebalance_dates(self):
+        """Returns the last trading day of each rebalance period (by default each month) in the backtest period,
+        using the NYSE calendar."""
+        nyse = trading_calendar.get_calendar('NYSE')
+        return pd.DatetimeIndex(nyse.rebalance_dates(self.start_date, self.end_date, self.frequency))
+
+    def previous_trading_day(self, date):
+        """Returns the last NYSE trading day on or before date."""
+        nyse = trading_calendar.get_calendar('NYSE')
+        return pd.Timestamp(nyse.snap(date, 'previous'))
+
+    def window_starts(self):
+        """
+        Returns the month-end rebalance dates and the 'YYYYMMDD' start dates of every window of the backtest.
+
+        Window 0 is the period before the first rebalance (starting on a trading day), and window i + 1 runs
+        from rebalance date i to rebalance date i + 1. Month i trains on window i and is tested on window i + 1.
+        """
+        last_trading_days = self.rebalance_dates()
+        if len(last_trading_days) < 2:
+            return last_trading_days, []
+        nyse = trading_calendar.get_calendar('NYSE')
+        first_month_start = pd.Timestamp(nyse.period_start(last_trading_days[0], self.frequency)).strftime('%Y%m%d')
+        return last_trading_days, [first_month_start] + [day.strftime('%Y%m%d') for day in last_trading_days]
+
+    def load_panel(self, window_starts):
+        """Loads prices for every window of the backtest, and for the Strategy's own selection window, in one go."""
+        self.Strategy.load_panel(window_starts[0], max(window_starts[-1], self.end_date), self.tickers)
+
+    def merge_windows(self, window_starts):
+        """
+        Returns merge_data for every window from window_starts[i] to window_starts[i + 1] as arrays over self.tickers:
+        the (windows x tickers x signals) strategy returns and the (windows x tickers) actual returns, which are
+        NaN for the stocks merge_data leaves out.
 
-    def perform_strategy(self):
+        Inside the panel preloaded by load_panel, all windows are merged at once with Strategy.run_strategy_many
+        and Strategy.actual_performance_many; otherwise merge_data is run window by window.
+        """
+        num_windows = len(window_starts) - 1
+        if self.Strategy.covers(window_starts[0], window_starts[-1], self.tickers):
+            with instrumentation.span('merge_data', windows = num_windows):
+                return (self.Strategy.run_strategy_many(window_starts, self.signals, self.tickers),
+                        self.Strategy.actual_performance_many(window_starts, self.tickers))
+
+        features = np.zeros((num_windows, len(self.tickers), len(self.signals)))
+        actual = np.full((num_windows, len(self.tickers)), np.nan)
+        columns = {ticker: j for j, ticker in enumerate(self.tickers)}
+        for i in range(num_windows):
+            with instrumentation.span('merge_data', date = window_starts[i]):
+                merged_df = self.merge_data(window_starts[i], window_starts[i + 1])
+            rows = [columns[stock] for stock in merged_df['Stock']]
+            features[i, rows] = merged_df[self.signal_columns].to_numpy(dtype = float)
+            actual[i, rows] = merged_df['Return_actual'].to_numpy(dtype = float)
+        return features, actual
+
+    def window_frames(self, features, actual):
+        """Returns the merge_data frame of every window of merge_windows, built as one frame and split by window."""
+        windows, stocks = np.nonzero(~np.isnan(actual))
+        merged_df = pd.DataFrame({'Stock': np.array(self.tickers, dtype = object)[stocks]})
+        for k, column in enumerate(self.signal_columns):
+            merged_df[column] = features[windows, stocks, k]
+        merged_df['Return_actual'] = actual[windows, stocks]
+        bounds = np.searchsorted(windows, np.arange(len(actual) + 1), 'left')
+        return [merged_df.iloc[bounds[i]:bounds[i + 1]].reset_index(drop = True) for i in range(len(actual))]
+
+    def perform_strategy(self, progress = None, checkpoint = None, writer = None, chunk_months = CHUNK_MONTHS):
         """Fits a multiple linear regression model to predict stock returns 
         and selects the top stocks based on the --top_pct score.
+
+        The months are computed chunk_months at a time on (months x tickers) arrays: a chunk's windows are
+        merged with merge_windows, its regressions are fitted with ols.batched_ols (or over rolling or expanding
+        training windows with fit_window_models), its top stocks are picked with one argsort and its holdings
+        are marked to market with one PricePanel.holding_growth call. With single_load, the full padded price
+        range for the whole backtest is loaded once, so the cost of a month does not depend on the rebalance
+        frequency. The working arrays only ever hold one chunk.
+
+        Returns a BacktestResult, which is also kept as self.result so it can be reused without running
+        the backtest again. Its daily equity curve marks the monthly holdings to the daily Close prices.
+
+        As each chunk completes, its months are added to the portfolio statistics in self.online_statistics
+        one by one, and if a progress function is given it is called with the OnlineStatistics after every month.
+
+        checkpoint: path of a BacktestCheckpoint file. If it holds the months of an earlier run with the
+        same settings, only the months after them are computed. The state is saved back to it after every
+        chunk, up to the last month that ended on a period end, so a month cut short by end_date is computed
+        again and an interrupted run resumes after its last completed chunk.
+
+        writer: a result_writer.ResultWriter the rows of every chunk are written to with BacktestResult.write
+        as soon as it is computed, after the months restored from a checkpoint. The backtest is then streamed:
+        only the current chunk and the training frames later months still train on are kept in memory, and the
+        result is a StoredBacktestResult read back from the writer's tables. A streamed backtest can only be
+        checkpointed with the numpy format, whose tables can be read while they are written.
         """
+        streaming = writer is not None
+        if streaming and checkpoint is not None and writer.format != 'numpy':
+            raise ValueError("A streamed backtest can only be checkpointed with the numpy format.")
         
-        #Get a list of the last trading days of each month for the specified period. These will be used in our for-loop.
-        nyse = mcal.get_calendar('NYSE')
-        schedule = nyse.schedule(start_date=self.start_date, end_date=self.end_date)
-        last_trading_days = schedule.resample('M', closed='right', label='right').last().index
-
-        aum = self.aum
-
-        for i in range(len(last_trading_days) - 1):
-            current_month_start = last_trading_days[i].strftime('%Y%m%d')
-            current_month_end = last_trading_days[i + 1].strftime('%Y%m%d')
-            prev_month_start = (last_trading_days[i] - pd.DateOffset(months=1)).strftime('%Y%m%d')
-
-
-            # Get data for previous and current months
-            prev_month_data = self.Strategy.get_data_for_all_tickers(prev_month_start, current_month_start, self.tickers)
-            current_month_data = self.Strategy.get_data_for_all_tickers(current_month_start, current_month_end, self.tickers)
-
-            # Run strategies for previous and current months
-            prev_month_strat1 = self.Strategy.run_strategy(prev_month_start, current_month_start, self.days_1, self.strategy_1, self.tickers)
-            prev_month_strat2 = self.Strategy.run_strategy(prev_month_start, current_month_start, self.days_2, self.strategy_2, self.tickers)
-            current_month_strat1 = self.Strategy.run_strategy(current_month_start, current_month_end, self.days_1, self.strategy_1, self.tickers)
-            current_month_strat2 = self.Strategy.run_strategy(current_month_start, current_month_end, self.days_2, self.strategy_2, self.tickers)
-
-            # Merge data
-            prev_month_merged = pd.merge(prev_month_strat1, prev_month_strat2, on='Stock', how='inner')
-            prev_month_actual_performance = self.Strategy.actual_performance(prev_month_start, current_month_start)
-            prev_month_merged = pd.merge(prev_month_merged, prev_month_actual_performance, on='Stock', how='inner')
-            prev_month_merged = prev_month_merged.rename(columns={'Return_x': 'Return_strategy_1', 'Return_y': 'Return_strategy_2', 'Return': 'Return_actual'})
-
-            current_month_merged = pd.merge(current_month_strat1, current_month_strat2, on='Stock', how='inner')
-            current_month_actual_performance = self.Strategy.actual_performance(current_month_start, current_month_end)
-            current_month_merged = pd.merge(current_month_merged, current_month_actual_performance, on='Stock', how='inner')
-            current_month_merged = current_month_merged.rename(columns={'Return_x': 'Return_strategy_1', 'Return_y': 'Return_strategy_2', 'Return': 'Return_actual'})
-
-            # Prepare the data for the regression model
-            X_train = prev_month_merged[['Return_strategy_1', 'Return_strategy_2']]
-            y_train = prev_month_merged['Return_actual']
-            X_test = current_month_merged[['Return_strategy_1', 'Return_strategy_2']]
-
-            # Predict stock returns using the linear regression model
-            predicted_returns = self.predict_performance(X_train, y_train, X_test)
-            current_month_merged['Predicted_Return'] = predicted_returns
-
-            top_stocks = self.Strategy.compute_top_stocks(self.top_pct)
-            sorted_df = current_month_merged.sort_values(by='Predicted_Return', ascending=False)
-            top_pct_df = sorted_df.head(top_stocks)
-            # Store the top-performing stocks for each month
-            if i == 0:
-                all_top_stocks = top_pct_df
+        #Get a list of the last trading days of each month for the specified period.
+        with instrumentation.span('window_starts'):
+            last_trading_days, window_starts = self.window_starts()
+        num_months = max(len(window_starts) - 2, 0)
+
+        state = self.resume(checkpoint, last_trading_days[:num_months + 1]) if checkpoint is not None else None
+        #First month to compute, and the number of months to compute.
+        start = state.months if state is not None else 0
+        new_months = max(num_months - start, 0)
+
+        #AUM at the end of each month.
+        self.aum_history = pd.Series(np.empty(num_months), index = last_trading_days[1:num_months + 1], dtype = float)
+        #Top stocks, equal portfolio weights and daily equity curve of every chunk, unless they are streamed.
+        monthly_top_stocks = []
+        monthly_holdings = []
+        equity_curves = []
+        monthly_models = []
+        if state is not None:
+            self.aum_history.iloc[:start] = state.aum_history.to_numpy()
+            monthly_models.append(state.models)
+            self.online_statistics = state.online_statistics
+            restored = BacktestResult(self.aum, state.top_stocks, state.aum_history, self.holdings_frame(state.holdings, last_trading_days[:start]),
+                                      state.equity_curve)
+            if streaming:
+                with instrumentation.span('write_result'):
+                    restored.write(writer)
             else:
-                all_top_stocks = all_top_stocks.append(top_pct_df, ignore_index=True)
-            # Calculate average return and update AUM
-            average_return = top_pct_df['Return_actual'].mean()
-            aum = (aum * (1 + average_return))
+                monthly_top_stocks.append(restored.top_stocks)
+                monthly_holdings.append(restored.holdings)
+                equity_curves.append(restored.equity_curve)
+        else:
+            self.online_statistics = OnlineStatistics(self.aum, len(self.feature_columns))
+        training_frames = list(state.training_frames) if state is not None else []
+        self.training_frames = training_frames
+        aum = state.aum if state is not None else self.aum
+        #The rolling or expanding training window, carried from chunk to chunk.
+        accumulator = self.window_accumulator(training_frames, start) if self.training_window != 1 else None
+
+        #Months whose last day ends a rebalance period, which are the ones kept in the checkpoint.
+        complete_months = num_months
+        if num_months > 0 and not trading_calendar.get_calendar('NYSE').is_period_end(last_trading_days[num_months], self.frequency,
+                                                                                        self.start_date):
+            complete_months = num_months - 1
+        saved_statistics = None
+
+        def collected_result():
+            #The BacktestResult of the months computed so far.
+            if streaming:
+                writer.flush()
+                return StoredBacktestResult(self.aum, self.aum_history, writer.directory, self.tickers)
+            if len(monthly_top_stocks) > 0:
+                all_top_stocks = pd.concat(monthly_top_stocks, ignore_index=True)
+            else:
+                all_top_stocks = pd.DataFrame(columns=['Stock'] + self.signal_columns + ['Return_actual', 'Predicted_Return', 'Date'])
+            all_holdings = pd.concat(monthly_holdings) if len(monthly_holdings) > 0 else self.holdings_frame(np.zeros((0, len(self.tickers))), [])
+            return BacktestResult(self.aum, all_top_stocks, self.aum_history, all_holdings,
+                                  pd.concat(equity_curves) if len(equity_curves) > 0 else pd.Series(dtype = float))
+
+        if new_months > 0:
+            if self.single_load:
+                self.load_panel(window_starts[start:])
+                if self.processes > 1:
+                    self.Strategy.share_panel(self.processes)
+            feature_indices = [self.signal_columns.index(column) for column in self.feature_columns]
+            #The last window merged by the previous chunk, which trains the first month of the next one.
+            carried = None
+            try:
+                for first in range(start, num_months, chunk_months):
+                    months_in_chunk = min(chunk_months, num_months - first)
+                    #The chunk-level stages below are shared out among the months of the chunk.
+                    with instrumentation.span('chunk', dates = list(last_trading_days[first:first + months_in_chunk])):
+                        # Merge strategy returns and actual performance for every window of the chunk at once.
+                        # features[j] and actual[j] are window first + j; stocks left out of a window have no actual return.
+                        if carried is None:
+                            features, actual = self.merge_windows(window_starts[first:first + months_in_chunk + 2])
+                        else:
+                            features, actual = self.merge_windows(window_starts[first + 1:first + months_in_chunk + 2])
+                            features, actual = np.concatenate([carried[0], features]), np.concatenate([carried[1], actual])
+                        carried = (features[-1:], actual[-1:])
+                        rows = ~np.isnan(actual)
+                        training_frames.extend(self.window_frames(features[:-1], actual[:-1]))
+
+                        # Fit every month's regression at once and predict each following month.
+                        X = features[:, :, feature_indices]
+                        with instrumentation.span('fit_regressions', months = months_in_chunk):
+                            if self.training_window == 1:
+                                models = ols.batched_ols(X[:-1], actual[:-1], rows[:-1])
+                            else:
+                                models = self.fit_window_models(training_frames, first, accumulator)
+                            predictions = models.predict(X[1:])
+                        monthly_models.append(models)
+
+                        with instrumentation.span('select', months = months_in_chunk):
+                            # The top stocks of every month by predicted return, ties going to the first ticker.
+                            order = np.argsort(np.where(rows[1:], -predictions, np.inf), axis = 1, kind = 'stable')
+                            num_held = np.minimum(rows[1:].sum(axis = 1), self.Strategy.compute_top_stocks(self.top_pct))
+                            months, ranks = np.nonzero(np.arange(len(self.tickers))[None, :] < num_held[:, None])
+                            stocks = order[months, ranks]
+                            held_returns = actual[1:][months, stocks]
+                            holdings = np.zeros((months_in_chunk, len(self.tickers)))
+                            holdings[months, stocks] = 1.0 / num_held[months]
+                            #A month without any stock to hold is spent in cash.
+                            average_returns = np.bincount(months, held_returns, months_in_chunk) / np.maximum(num_held, 1)
+                            top_pct_df = pd.DataFrame({'Stock': np.array(self.tickers, dtype = object)[stocks]})
+                            for k, column in enumerate(self.signal_columns):
+                                top_pct_df[column] = features[1:][months, stocks, k]
+                            top_pct_df['Return_actual'] = held_returns
+                            top_pct_df['Predicted_Return'] = predictions[months, stocks]
+                            top_pct_df['Date'] = last_trading_days[first:first + months_in_chunk][months]
+
+                        # AUM at the start of every month, and the daily AUM of its holdings.
+                        month_aums = np.empty(months_in_chunk + 1)
+                        month_aums[0] = aum
+                        for j in range(months_in_chunk):
+                            month_aums[j + 1] = month_aums[j] * (1 + average_returns[j])
+                        aum = month_aums[-1]
+                        self.aum_history.iloc[first:first + months_in_chunk] = month_aums[1:]
+                        chunk_starts = window_starts[first + 1:first + months_in_chunk + 2]
+                        with instrumentation.span('mark_to_market', months = months_in_chunk):
+                            panel = self.Strategy.get_panel(chunk_starts[0], chunk_starts[-1], self.tickers)
+                            dates, growth = panel.holding_growth(chunk_starts, holdings, self.tickers)
+                            #First equity curve row of every month: the day after its rebalance.
+                            month_rows = np.searchsorted(dates, to_day(chunk_starts), 'right')
+                            equity = month_aums[:-1].repeat(np.diff(month_rows)) * growth
+                        chunk_result = BacktestResult(self.aum, top_pct_df, self.aum_history.iloc[first:first + months_in_chunk],
+                                                      self.holdings_frame(holdings, last_trading_days[first:first + months_in_chunk]),
+                                                      pd.Series(equity, index = pd.DatetimeIndex(dates, name = 'Date')))
+                        if streaming:
+                            with instrumentation.span('write_result'):
+                                chunk_result.write(writer)
+                            self.release_training_frames(training_frames)
+                        else:
+                            monthly_top_stocks.append(chunk_result.top_stocks)
+                            monthly_holdings.append(chunk_result.holdings)
+                            equity_curves.append(chunk_result.equity_curve)
+
+                        # Update the running statistics month by month.
+                        held_rows = np.searchsorted(months, np.arange(months_in_chunk + 1), 'left')
+                        for j in range(months_in_chunk):
+                            i = first + j
+                            with instrumentation.span('month', date = last_trading_days[i]):
+                                with instrumentation.span('online_statistics'):
+                                    self.online_statistics.update(last_trading_days[i], month_aums[j + 1], held_returns[held_rows[j]:held_rows[j + 1]],
+                                                                  equity[month_rows[j]:month_rows[j + 1]], X[j][rows[j]], actual[j][rows[j]])
+                                if checkpoint is not None and i + 1 == complete_months < first + months_in_chunk:
+                                    saved_statistics = copy.deepcopy(self.online_statistics)
+                                if progress is not None:
+                                    progress(self.online_statistics)
+
+                        #Save the complete months so far after every chunk, with the statistics after the last of them.
+                        saved_months = min(first + months_in_chunk, complete_months)
+                        if checkpoint is not None and saved_months > first:
+                            if saved_months == first + months_in_chunk:
+                                saved_statistics = self.online_statistics
+                            self.monthly_models = ols.concat(monthly_models)
+                            with instrumentation.span('save_checkpoint'):
+                                self.save_checkpoint(checkpoint, last_trading_days[:saved_months + 1], saved_statistics, collected_result())
+            finally:
+                self.Strategy.close_shards()
+        self.monthly_models = ols.concat(monthly_models)
+        self.result = collected_result()
+        return self.result
+
+    def holdings_frame(self, holdings, rebalance_dates):
+        """Returns the (months x tickers) holdings array as a DataFrame indexed by the months' rebalance dates."""
+        return pd.DataFrame(holdings, index = rebalance_dates, columns = self.tickers)
+
+    def release_training_frames(self, training_frames):
+        """
+        Replaces the training frames no later month trains on with None, so a streamed backtest does not keep
+        them: every frame but the last training_window of a rolling window, which fit_window_models still removes
+        from its accumulator. An expanding window is carried on by its accumulator, which holds the same rows as
+        self.online_statistics.regression, and a window of 1 month is fitted from the merged chunk alone.
+        """
+        keep = 0 if self.training_window in (1, 'expanding') else self.training_window
+        for i in range(len(training_frames) - keep - 1, -1, -1):
+            if training_frames[i] is None:
+                break
+            training_frames[i] = None
 
-        return aum, all_top_stocks
+    def window_accumulator(self, training_frames, first_month):
+        """
+        Returns an ols.OLSAccumulator holding the training frames of the training window of month
+        first_month - 1, which fit_window_models carries on from to fit month first_month. The frames of an
+        expanding window released by a streamed backtest are taken from self.online_statistics.regression.
+        """
+        first_frame = 0 if self.training_window == 'expanding' else max(first_month - self.training_window, 0)
+        if self.training_window == 'expanding' and any(frame is None for frame in training_frames[:first_month]):
+            return copy.deepcopy(self.online_statistics.regression)
+        accumulator = ols.OLSAccumulator(len(self.feature_columns))
+        for frame in training_frames[first_frame:first_month]:
+            accumulator.add(frame[self.feature_columns], frame['Return_actual'])
+        return accumulator
+
+    def fit_window_models(self, training_frames, first_month = 0, accumulator = None):
+        """
+        Fits the regressions of months first_month onwards, each on the training frames of its training window.
 
-    
-    
+        The window's X'X and X'y are kept in an ols.OLSAccumulator: each month adds its own training
+        frame and removes the one that leaves a rolling window, so the cost per month does not depend
+        on the length of the window. Returns the fits as one ols.OLSResult batch.
 
-        
+        accumulator: the window_accumulator of first_month, which is updated in place so that the months after
+        training_frames can be fitted with it later. By default a new one is built.
+        """
+        if accumulator is None:
+            accumulator = self.window_accumulator(training_frames, first_month)
+        window = self.training_window
+        def rows(frame):
+            return frame[self.feature_columns], frame['Return_actual']
+
+        fits = []
+        for i in range(first_month, len(training_frames)):
+            accumulator.add(*rows(training_frames[i]))
+            if window != 'expanding' and i - window >= 0:
+                accumulator.remove(*rows(training_frames[i - window]))
+            fits.append(accumulator.fit())
+        return ols.concat(fits)
+
+    def checkpoint_settings(self):
+        """Returns the settings a checkpoint must have been computed with to be resumed by this backtest."""
+        return {'tickers': list(self.tickers), 'start_date': self.start_date, 'days_1': self.days_1, 'days_2': self.days_2,
+                'strategy_1': self.strategy_1, 'strategy_2': self.strategy_2, 'top_pct': self.top_pct, 'aum': self.aum,
+                'frequency': self.frequency, 'signals': list(self.signals), 'feature_columns': list(self.feature_columns), 'training_window': self.training_window}
+
+    def resume(self, path, rebalance_dates):
+        """
+        Returns the BacktestCheckpoint at path if this backtest can resume from it, None otherwise.
+        rebalance_dates: the rebalance dates of the months of this backtest, plus its last day.
+        """
+        state = BacktestCheckpoint.load(path)
+        if state is None or not state.matches(self.checkpoint_settings(), list(rebalance_dates)):
+            return None
+        return state
 
-import matplotlib.pyplot as plt
-
-# Replace these parameters with your own values
-tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA']
-start_date = '20210105'
-end_date = '20211228'
-days_1 = 30
-day_2 =60
-strategy_1 = 'M'
-strategy_2 = 'R'
-top_pct = 30
-aum = 100000
-
-# Create an instance of the Linreg class
-linreg = Linreg(tickers, start_date, end_date, days_1, day_2, strategy_1, strategy_2, top_pct,aum)
-
-
-updated_aum, top_stocks = linreg.perform_strategy()
-print(updated_aum)
-
-# Plot the graph comparing the actual and predicted returns of the top stocks
-fig, ax = plt.subplots()
-x_labels = top_stocks['Stock'].unique().tolist()
-actual_returns = top_stocks.groupby('Stock')['Return_actual'].mean()
-predicted_returns = top_stocks.groupby('Stock')['Predicted_Return'].mean()
-ax.bar(x_labels, actual_returns, label='Actual', alpha=0.5, color='b')
-ax.bar(x_labels, predicted_returns, label='Predicted', alpha=0.5, color='r')
-ax.set_xlabel('Stocks')
-ax.set_ylabel('Returns (%)')
-ax.set_title('Comparison of Actual and Predicted Returns')
-ax.legend(loc='best')
-
-plt.show()
\ No newline at end of file
+    def save_checkpoint(self, path, rebalance_dates, online_statistics, result = None):
+        """
+        Saves the first len(rebalance_dates) - 1 months of result (by default the last run's), with the
+        OnlineStatistics after them, to path. BacktestCheckpoint.save replaces the file atomically.
+        """
+        months = len(rebalance_dates) - 1
+        if result is None:
+            result = self.result
+        end = pd.Timestamp(rebalance_dates[-1])
+        top_stocks = result.top_stocks[pd.to_datetime(result.top_stocks['Date']) < end]
+        models = self.monthly_models
+        if models is not None:
+            models = ols.OLSResult(models.params[:months], models.bse[:months], models.tvalues[:months], models.nobs[:months],
+                                   models.intercept, models.names)
+        BacktestCheckpoint(self.checkpoint_settings(), list(rebalance_dates), result.aum_history.iloc[months - 1],
+                           top_stocks.reset_index(drop = True), result.aum_history.iloc[:months], result.holdings.to_numpy()[:months],
+                           result.equity_curve[result.equity_curve.index <= end], self.training_frames[:months], models,
+                           online_statistics).save(path)
+
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
+    # Replace these parameters with your own values
+    tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA']
+    start_date = '20210105'
+    end_date = '20211228'
+    days_1 = 30
+    day_2 =60
+    strategy_1 = 'M'
+    strategy_2 = 'R'
+    top_pct = 30
+    aum = 100000
+
+    # Create an instance of the Linreg class
+    linreg = Linreg(tickers, start_date, end_date, days_1, day_2, strategy_1, strategy_2, top_pct,aum)
+
+
+    result = linreg.perform_strategy()
+    top_stocks = result.top_stocks
+    print(result.final_aum)
+
+    # Plot the graph comparing the actual and predicted returns of the top stocks
+    fig, ax = plt.subplots()
+    x_labels = top_stocks['Stock'].unique().tolist()
+    actual_returns = top_stocks.groupby('Stock')['Return_actual'].mean()
+    predicted_returns = top_stocks.groupby('Stock')['Predicted_Return'].mean()
+    ax.bar(x_labels, actual_returns, label='Actual', alpha=0.5, color='b')
+    ax.bar(x_labels, predicted_returns, label='Predicted', alpha=0.5, color='r')
+    ax.set_xlabel('Stocks')
+    ax.set_ylabel('Returns (%)')
+    ax.set_title('Comparison of Actual and Predicted Returns')
+    ax.legend(loc='best')
+
+    plt.show()
@@ -0,0 +1,104 @@
+import sys
+from args_check import ArgsCheck
+from parse_args import Parseargs
+
+#Libraries that are only imported once the arguments are valid and a backtest is about to run.
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'sklearn', 'yfinance', 'matplotlib', 'pandas_market_calendars']
+#Maximum time in seconds for importing this module, which is all that --help and invalid arguments cost.
+IMPORT_BUDGET = 0.1
+
+
+def parse_arguments(argv = None):
+    """
+    Parses the command line with Parseargs, plus the second strategy of the regression:
+    --days_2: lookback days of the second strategy. Defaults to --days.
+    --strategy_2: type of the second strategy. Defaults to the opposite of --strategy_type.
+    --data_dir: read prices from <TICKER>.csv files in this directory instead of yfinance.
+    --store: read prices from a columnar_store.ColumnarStore directory instead of yfinance.
+    --progress: print the running statistics after every month of the backtest.
+    --checkpoint: resume the backtest from this checkpoint file, and save its state back to it.
+    --training_window: months each regression is trained on, or expanding. Defaults to 1, the previous month.
+    --frequency: rebalance daily, weekly, monthly, quarterly or every N trading days. Defaults to monthly.
+
+    Returns the argparse namespace, with days_2 and strategy_2 filled in, training_window an int unless it is
+    expanding, and frequency an int when it is a number of trading days.
+    """
+    parser = Parseargs()
+    parser.parser.add_argument('--days_2', type=int, help='number of days for the second strategy (default: --days)')
+    parser.parser.add_argument('--strategy_2', type=str, help='type of the second strategy (default: the opposite of --strategy_type)')
+    parser.parser.add_argument('--data_dir', type=str, help='read prices from <TICKER>.csv files in this directory instead of yfinance')
+    parser.parser.add_argument('--store', type=str, help='read prices from a columnar price store directory instead of yfinance')
+    parser.parser.add_argument('--progress', action='store_true', help='print the running statistics after every month')
+    parser.parser.add_argument('--checkpoint', type=str, help='resume from this checkpoint file and save the backtest state to it')
+    parser.parser.add_argument('--training_window', type=str, default='1', help='months each regression is trained on, or expanding (default: 1)')
+    parser.parser.add_argument('--frequency', type=str, default='monthly', help='rebalance daily, weekly, monthly, quarterly or every N trading days (default: monthly)')
+    parser.parse_arguments(argv = argv)
+    arguments = parser.namespace
+    ArgsCheck.days_check(arguments.days)
+    ArgsCheck.top_pct_check(arguments.top_pct)
+
+    if arguments.days_2 is None:
+        arguments.days_2 = arguments.days
+    if arguments.strategy_2 is None:
+        arguments.strategy_2 = 'R' if arguments.strategy_type == 'M' else 'M'
+    ArgsCheck.days_check(arguments.days_2)
+    ArgsCheck.strategy_check(arguments.strategy_2)
+    ArgsCheck.training_window_check(arguments.training_window)
+    if arguments.training_window != 'expanding':
+        arguments.training_window = int(arguments.training_window)
+    ArgsCheck.frequency_check(arguments.frequency)
+    if arguments.frequency.isdigit():
+        arguments.frequency = int(arguments.frequency)
+    return arguments
+
+
+def main(argv = None):
+    """
+    Runs the linear regression backtest for the command line arguments and prints its PortfolioStatistics.
+    With --profile, every stage is timed and the timings and counters are written to the profile file.
+    Returns the statistics.
+    """
+    arguments = parse_arguments(argv)
+
+    import instrumentation
+    if arguments.profile is not None:
+        instrumentation.enable()
+    try:
+        statistics = run_backtest(arguments)
+    finally:
+        if arguments.profile is not None:
+            instrumentation.disable().write(arguments.profile, arguments.profile_format)
+            print(f"Profile written to {arguments.profile}")
+    for key, value in statistics.items():
+        print(f"{key}: {value}")
+    return statistics
+
+
+def run_backtest(arguments):
+    """
+    Runs the backtest for the namespace from parse_arguments and returns the statistics calculated by PortfolioStatistics.
+    """
+    import instrumentation
+
+    from data_provider import CsvProvider
+    from linreg import Linreg
+    from portfolio_statistics import PortfolioStatistics
+
+    provider = None
+    if arguments.store is not None:
+        from columnar_store import ColumnarStore
+        provider = ColumnarStore(arguments.store)
+    elif arguments.data_dir is not None:
+        provider = CsvProvider(arguments.data_dir)
+    linreg = Linreg(arguments.tickers, arguments.b, arguments.e, arguments.days, arguments.days_2, arguments.strategy_type,
+                    arguments.strategy_2, arguments.top_pct, arguments.initial_aum, provider = provider,
+                    training_window = arguments.training_window, frequency = arguments.frequency)
+    with instrumentation.span('perform_strategy'):
+        linreg.perform_strategy(progress = (lambda online_statistics: print(online_statistics.progress())) if arguments.progress else None,
+                                checkpoint = arguments.checkpoint)
+    with instrumentation.span('calculate_statistics'):
+        return PortfolioStatistics(linreg).calculate_statistics()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
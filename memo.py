@@ -0,0 +1,45 @@
+from collections import OrderedDict
+import instrumentation
+
+
+class LRUMemo:
+    """
+    A bounded in-process memo table with least-recently-used eviction.
+
+    Used by Strategy to avoid recomputing identical run_strategy / actual_performance
+    calls within a backtest run. A maxsize of None means the table is never evicted.
+    """
+    def __init__(self, maxsize = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._table = OrderedDict()
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, key):
+        return key in self._table
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the memoized value for key, calling compute() and storing its result on a miss.
+        """
+        if key in self._table:
+            self.hits += 1
+            instrumentation.count('memo.hits')
+            self._table.move_to_end(key)
+            return self._table[key]
+        self.misses += 1
+        instrumentation.count('memo.misses')
+        value = compute()
+        self._table[key] = value
+        if self.maxsize is not None and len(self._table) > self.maxsize:
+            #Evict the least recently used entry.
+            self._table.popitem(last = False)
+        return value
+
+    def clear(self):
+        self._table.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+
+class OLSResult:
+    """
+    Coefficients, standard errors and t-values of one or many ordinary least squares fits.
+
+    For a single fit params, bse and tvalues have shape (p,), or are pd.Series indexed by the
+    parameter names if names were given. For a batch of fits they have shape (m, p), one row per fit.
+    The intercept, if any, is the first parameter and is named 'const'.
+    """
+    def __init__(self, params, bse, tvalues, nobs, intercept, names = None):
+        if names is not None and np.ndim(params) == 1:
+            params = pd.Series(params, index = names)
+            bse = pd.Series(bse, index = names)
+            tvalues = pd.Series(tvalues, index = names)
+        self.params = params
+        self.bse = bse
+        self.tvalues = tvalues
+        self.nobs = nobs
+        self.intercept = intercept
+        self.names = names
+
+    def predict(self, X):
+        """
+        Predicts y for X of shape (n, k), or (m, n, k) for a batch of fits.
+        """
+        X = np.asarray(X, dtype = float)
+        params = np.asarray(self.params, dtype = float)
+        if self.intercept:
+            X = add_constant(X)
+        if params.ndim == 1:
+            return X @ params
+        return np.einsum('mnk,mk->mn', X, params)
+
+
+def add_constant(X):
+    ones = np.ones(X.shape[:-1] + (1,))
+    return np.concatenate([ones, X], axis = -1)
+
+
+def pinv_symmetric(matrix, cutoff = 0.0):
+    """
+    Returns the pseudo-inverse of a symmetric matrix, treating eigenvalues no larger than cutoff (or than
+    np.linalg.pinv's relative tolerance) as 0.
+    """
+    values, vectors = np.linalg.eigh(matrix)
+    cutoff = max(cutoff, len(values) * np.finfo(float).eps * np.abs(values).max(initial = 0.0))
+    with np.errstate(divide = 'ignore'):
+        inverse = np.where(np.abs(values) > cutoff, 1 / values, 0.0)
+    return (vectors * inverse) @ vectors.T
+
+
+def batched_ols(X, y, mask = None, intercept = True):
+    """
+    Fits m independent regressions at once by solving the normal equations on stacked arrays.
+
+    X: array (m, n, k) of features, y: array (m, n) of targets.
+    mask: optional boolean array (m, n) marking the rows that belong to each fit, so fits with
+    different numbers of observations can be padded to the same n.
+
+    Returns an OLSResult whose params, bse and tvalues have shape (m, k + intercept).
+    Fits with no more observations than parameters have NaN standard errors and t-values.
+    """
+    X = np.asarray(X, dtype = float)
+    y = np.asarray(y, dtype = float)
+    if mask is None:
+        mask = np.ones(y.shape, dtype = bool)
+    weights = np.asarray(mask, dtype = float)
+    nobs = weights.sum(axis = 1)
+    #Padded rows may hold anything; zero them so they drop out of every sum.
+    X = np.where(weights[..., None] > 0, X, 0.0)
+    y = np.where(weights > 0, y, 0.0)
+
+    #The pseudo-inverse gives the minimum-norm solution when a month's cross-section is too small.
+    if intercept:
+        #Solve for the slopes on centered data, like sklearn's LinearRegression, so the intercept
+        #is not shrunk when the fit is underdetermined.
+        count = np.maximum(nobs, 1)[:, None]
+        X_mean = X.sum(axis = 1) / count
+        y_mean = y.sum(axis = 1) / count[:, 0]
+        X_centered = (X - X_mean[:, None, :]) * weights[..., None]
+        y_centered = (y - y_mean[:, None]) * weights
+        slopes = np.einsum('mkj,mj->mk', np.linalg.pinv(np.einsum('mnk,mnj->mkj', X_centered, X_centered)),
+                           np.einsum('mnk,mn->mk', X_centered, y_centered))
+        constant = y_mean - np.einsum('mk,mk->m', X_mean, slopes)
+        params = np.concatenate([constant[:, None], slopes], axis = 1)
+        X = add_constant(X) * weights[..., None]
+        XtX_inv = np.linalg.pinv(np.einsum('mnk,mnj->mkj', X, X))
+    else:
+        XtX_inv = np.linalg.pinv(np.einsum('mnk,mnj->mkj', X, X))
+        params = np.einsum('mkj,mj->mk', XtX_inv, np.einsum('mnk,mn->mk', X, y))
+
+    residuals = (y - np.einsum('mnk,mk->mn', X, params)) * weights
+    num_params = X.shape[-1]
+    dof = nobs - num_params
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        sigma2 = np.where(dof > 0, (residuals ** 2).sum(axis = 1) / dof, np.nan)
+        bse = np.sqrt(np.diagonal(XtX_inv, axis1 = 1, axis2 = 2) * sigma2[:, None])
+        tvalues = params / bse
+    return OLSResult(params, bse, tvalues, nobs, intercept)
+
+
+def concat(results):
+    """
+    Joins fits with the same parameters into one batch: batches from batched_ols, single fits, or both.
+    """
+    results = [result for result in results if result is not None]
+    if len(results) == 0:
+        return None
+    def join(values):
+        return np.concatenate([np.atleast_2d(np.asarray(value, dtype = float)) for value in values])
+    return OLSResult(join([result.params for result in results]), join([result.bse for result in results]),
+                     join([result.tvalues for result in results]),
+                     np.concatenate([np.atleast_1d(result.nobs) for result in results]), results[0].intercept, results[0].names)
+
+
+def fit_ols(X, y, intercept = True):
+    """
+    Fits a single regression of y on X. If X is a DataFrame its column names are used to
+    label the parameters, like statsmodels' .params and .tvalues.
+    """
+    names = None
+    if isinstance(X, pd.DataFrame):
+        names = (['const'] if intercept else []) + list(X.columns)
+    X = np.asarray(X, dtype = float)
+    y = np.asarray(y, dtype = float)
+    result = batched_ols(X[None], y[None], intercept = intercept)
+    return OLSResult(result.params[0], result.bse[0], result.tvalues[0], result.nobs[0], intercept, names)
+
+
+class OLSAccumulator:
+    """
+    Running sufficient statistics X'X, X'y and y'y of a pooled regression that grows one block
+    of rows at a time, so it can be refitted without keeping or restacking the rows. Blocks can
+    also be removed again, for a regression over a rolling window of blocks.
+
+    fit() gives the same result as fit_ols on all the rows added (and not removed) so far. Removing
+    rows leaves rounding errors in the sums, on the scale of every sum added or removed so far, so
+    directions of the features smaller than that are treated as having no variance at all.
+    """
+    def __init__(self, num_features, intercept = True):
+        num_params = num_features + (1 if intercept else 0)
+        self.intercept = intercept
+        self.XtX = np.zeros((num_params, num_params))
+        self.Xty = np.zeros(num_params)
+        self.yty = 0.0
+        self.nobs = 0
+        #Sum of the largest entry of every X'X added or removed, which bounds the rounding error of XtX.
+        self.magnitude = 0.0
+
+    def add(self, X, y):
+        """
+        Adds the rows X (n, k) with targets y (n,).
+        """
+        self._update(X, y, 1)
+
+    def remove(self, X, y):
+        """
+        Removes rows X (n, k) with targets y (n,) that were added before.
+        """
+        self._update(X, y, -1)
+
+    def _update(self, X, y, sign):
+        X = np.asarray(X, dtype = float)
+        y = np.asarray(y, dtype = float)
+        if self.intercept:
+            X = add_constant(X)
+        XtX = X.T @ X
+        self.XtX += sign * XtX
+        self.magnitude += np.abs(XtX).max(initial = 0.0)
+        self.Xty += sign * (X.T @ y)
+        self.yty += sign * (y @ y)
+        self.nobs += sign * len(y)
+
+    def fit(self, names = None):
+        """
+        Returns the OLSResult of the rows added so far. names labels the features, as in fit_ols.
+        """
+        if names is not None:
+            names = (['const'] if self.intercept else []) + list(names)
+        nobs = self.nobs
+        cutoff = 16 * np.finfo(float).eps * self.magnitude
+        XtX_inv = pinv_symmetric(self.XtX, cutoff)
+        if self.intercept:
+            #Solve for the slopes on centered sums, like batched_ols.
+            count = max(nobs, 1)
+            X_mean = self.XtX[0, 1:] / count
+            y_mean = self.Xty[0] / count
+            Sxx = self.XtX[1:, 1:] - nobs * np.outer(X_mean, X_mean)
+            Sxy = self.Xty[1:] - nobs * X_mean * y_mean
+            slopes = pinv_symmetric(Sxx, cutoff) @ Sxy
+            params = np.concatenate([[y_mean - X_mean @ slopes], slopes])
+        else:
+            params = XtX_inv @ self.Xty
+
+        residual_ss = max(self.yty - 2 * params @ self.Xty + params @ self.XtX @ params, 0.0)
+        dof = nobs - len(params)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            sigma2 = residual_ss / dof if dof > 0 else np.nan
+            bse = np.sqrt(np.diagonal(XtX_inv) * sigma2)
+            tvalues = params / bse
+        return OLSResult(params, bse, tvalues, nobs, self.intercept, names)
@@ -0,0 +1,99 @@
+import numpy as np
+import ols
+
+
+class RunningMoments:
+    """
+    Count, mean, variance and maximum of a stream of values, updated one chunk at a time with
+    Welford's method (Chan's formula for merging a chunk). NaN values are skipped, like pandas.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = np.nan
+        self.m2 = 0.0
+        self.max = np.nan
+
+    def update(self, values):
+        values = np.asarray(values, dtype = float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        chunk_count = len(values)
+        chunk_mean = values.mean()
+        chunk_m2 = ((values - chunk_mean) ** 2).sum()
+        if self.count == 0:
+            self.count, self.mean, self.m2, self.max = chunk_count, chunk_mean, chunk_m2, values.max()
+            return
+        count = self.count + chunk_count
+        delta = chunk_mean - self.mean
+        self.mean += delta * chunk_count / count
+        self.m2 += chunk_m2 + delta ** 2 * self.count * chunk_count / count
+        self.max = max(self.max, values.max())
+        self.count = count
+
+    @property
+    def variance(self):
+        #Sample variance (ddof = 1), like pandas' Series.var.
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class OnlineStatistics:
+    """
+    Portfolio statistics of a backtest accumulated month by month in constant memory, so they are
+    available (e.g. for progress reports) while a long backtest runs, without keeping its top stocks or
+    daily equity curve. Linreg.perform_strategy updates one month by month as each chunk of months completes.
+
+    The final values match PortfolioStatistics.calculate_statistics on the complete backtest.
+    """
+    def __init__(self, initial_aum, num_features = 2):
+        self.initial_aum = initial_aum
+        self.final_aum = initial_aum
+        self.months = 0
+        self.last_date = None
+        self.total_stock_return = 0.0
+        #Daily AUM and daily returns of the equity curve.
+        self.aum = RunningMoments()
+        self.returns = RunningMoments()
+        self.last_aum = initial_aum
+        self.peak_aum = initial_aum
+        self.max_drawdown = 0.0
+        #Pooled regression of the actual returns on the strategy returns.
+        self.regression = ols.OLSAccumulator(num_features)
+
+    def update(self, date, aum, stock_returns, equity_values, X = None, y = None):
+        """
+        Adds one completed month.
+
+        date: the month's rebalance date. aum: the AUM at the end of the month.
+        stock_returns: actual returns of the stocks held during the month.
+        equity_values: daily AUM during the month.
+        X, y: the month's regression training rows, if any.
+        """
+        self.months += 1
+        self.last_date = date
+        self.final_aum = aum
+        self.total_stock_return += np.sum(np.asarray(stock_returns, dtype = float))
+
+        equity_values = np.asarray(equity_values, dtype = float)
+        if len(equity_values) > 0:
+            previous = np.concatenate([[self.last_aum], equity_values[:-1]])
+            self.returns.update(equity_values / previous - 1)
+            self.aum.update(equity_values)
+            peaks = np.fmax.accumulate(np.concatenate([[self.peak_aum], equity_values]))[1:]
+            self.max_drawdown = max(self.max_drawdown, np.nanmax(1 - equity_values / peaks, initial = 0.0))
+            self.peak_aum = peaks[-1]
+            self.last_aum = equity_values[-1]
+
+        if X is not None and len(X) > 0:
+            self.regression.add(X, y)
+
+    def progress(self):
+        """
+        Returns a one line summary of the backtest so far.
+        """
+        return (f"{self.months} months to {self.last_date}: AUM {self.final_aum:.2f}, "
+                f"average daily return {self.returns.mean:.6f}, maximum drawdown {self.max_drawdown:.2%}")
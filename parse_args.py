@@ -15,6 +15,10 @@ class Parseargs:
         --strategy_type: M or R
         --days: Number of days to factor into backtesting.
         --top_pct: The percentage of stocks we want to consider as 'top' and buy at the end of a backtesting period.
+
+        Optional:
+        --profile: Time every stage of the backtest and write the results to this file (default: profile.json).
+        --profile_format: json for a summary per stage and month, or chrome for a trace to open in chrome://tracing.
         """
         self.parser = argparse.ArgumentParser()
         self.parser.add_argument('--tickers', nargs='+', type=str, help='list of tickers')
@@ -24,11 +28,14 @@ class Parseargs:
         self.parser.add_argument('--strategy_type', type=str, help='type of strategy')
         self.parser.add_argument('--days', type=int, help='number of days for calculation')
         self.parser.add_argument('--top_pct', type=int, help='top percentile for calculation')
+        self.parser.add_argument('--profile', nargs='?', const='profile.json', default=None, help='write per-stage timings and counters to this file')
+        self.parser.add_argument('--profile_format', type=str, choices=['json', 'chrome'], default='json', help='format of the --profile output')
 
 
-    def parse_arguments(self, arguments = None):
+    def parse_arguments(self, arguments = None, argv = None):
         """
-        Parses arguments and returns a list where arguments are in the following index order:
+        Parses argv (defaults to the command line) into the arguments namespace, keeps the
+        namespace as self.namespace (which also holds the --profile options), and returns a list where arguments are in the following index order:
         0: tickers
         1: beginning date
         2: end date
@@ -37,7 +44,8 @@ class Parseargs:
         5: num days
         6: top pct
         """
-        namespace_args = self.parser.parse_args(namespace = arguments)
+        namespace_args = self.parser.parse_args(argv, namespace = arguments)
+        self.namespace = namespace_args
         list_arguments = [namespace_args.tickers, 
                           namespace_args.b, 
                           namespace_args.e, 
@@ -50,12 +58,13 @@ class Parseargs:
         to see if the arguments pass the tests.
 
         If the arguments do not pass the tests, an error message will be printed and the 
-        program will exit.
+        program will exit. The date check runs last because it is the only one that needs the
+        trading calendar.
         """
         ArgsCheck.ticker_check(list_arguments[0])
-        ArgsCheck.date_check(list_arguments[1], list_arguments[2])
         ArgsCheck.aum_check(list_arguments[3])
         ArgsCheck.strategy_check(list_arguments[4])
+        ArgsCheck.date_check(list_arguments[1], list_arguments[2])
         return list_arguments
     
 if __name__ == '__main__':
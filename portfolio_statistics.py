@@ -1,8 +1,9 @@
 import numpy as np
-import scipy.stats as stats
-from linreg import Linreg
 import pandas as pd
-import pandas_market_calendars as mcal
+import trading_calendar
+
+#Daily risk-free rate of the Sharpe ratio.
+RISK_FREE_RATE = 0.0001
 
 
 class PortfolioStatistics:
@@ -11,8 +12,14 @@ class PortfolioStatistics:
     """
     def __init__(self, linreg_instance):
         self.linreg = linreg_instance
-        self.top_stocks = linreg_instance.perform_strategy()[1]
-        self.daily_returns = self.top_stocks.groupby(pd.to_datetime(self.top_stocks['Date'])).mean()['Return_actual']
+        #The backtest runs at most once: a result already computed by the Linreg instance is reused.
+        if linreg_instance.result is not None:
+            self.result = linreg_instance.result
+        else:
+            self.result = linreg_instance.perform_strategy()
+        self.top_stocks = self.result.top_stocks
+        self.equity_curve = self.result.equity_curve
+        self.daily_returns = self.result.daily_returns
         self.start_date = pd.to_datetime(self.linreg.start_date)
         self.end_date = pd.to_datetime(self.linreg.end_date)
         self.aum = self.linreg.aum
@@ -23,14 +30,14 @@ class PortfolioStatistics:
 
         This function will adjust the start_date and end_date attributes to be valid trading days.
         """
-        nyse = mcal.get_calendar('NYSE')
-        schedule = nyse.schedule(start_date=self.start_date, end_date=self.end_date)
-        self.start_date = schedule.index[0]
-        self.end_date = schedule.index[-1]
+        nyse = trading_calendar.get_calendar('NYSE')
+        self.start_date = pd.Timestamp(nyse.snap(self.start_date, 'next'))
+        self.end_date = pd.Timestamp(nyse.snap(self.end_date, 'previous'))
 
-    def calculate_statistics(self):
+    def calculate_statistics(self, online = False):
         """
-        Args: None
+        Args: online: take the values from the OnlineStatistics accumulated while the backtest ran,
+        instead of from the complete top stocks and equity curve. Both give the same numbers.
 
         Returns: A dictionary containing the statistics requested:
         - Number of calendar days between the first and last trading day.
@@ -49,20 +56,33 @@ class PortfolioStatistics:
         """
         self.adjust_dates()
         num_days = (self.end_date - self.start_date).days
-        total_return = self.top_stocks['Return_actual'].sum()
         initial_aum = self.aum
-        final_aum = self.linreg.perform_strategy()[0]
+        if online:
+            online_statistics = self.linreg.online_statistics
+            total_return = online_statistics.total_stock_return
+            final_aum = online_statistics.final_aum
+            avg_daily_aum = online_statistics.aum.mean
+            max_daily_aum = online_statistics.aum.max
+            max_drawdown = online_statistics.max_drawdown
+            avg_daily_return = online_statistics.returns.mean
+            daily_std = online_statistics.returns.std
+            model = online_statistics.regression.fit(self.linreg.feature_columns)
+        else:
+            total_return = self.top_stocks['Return_actual'].sum()
+            final_aum = self.result.final_aum
+            #Daily AUM and returns come from the marked-to-market equity curve of the backtest.
+            avg_daily_aum = self.equity_curve.mean()
+            max_daily_aum = self.equity_curve.max()
+            max_drawdown = self.max_drawdown()
+            avg_daily_return = self.daily_returns.mean()
+            daily_std = self.daily_returns.std()
+            model = self.linreg.fit_model()
         total_return_aum = final_aum - initial_aum
         annualized_rate_of_return = (final_aum / initial_aum) ** (365.0 / num_days) - 1
-        avg_daily_aum = (self.daily_returns * initial_aum).mean()
-        max_daily_aum = (self.daily_returns * initial_aum).max()
         pnl = total_return_aum
-        avg_daily_return = self.daily_returns.mean()
-        daily_std = self.daily_returns.std()
-        daily_sharpe_ratio = (avg_daily_return - 0.0001) / daily_std
+        daily_sharpe_ratio = (avg_daily_return - RISK_FREE_RATE) / daily_std
 
         # Linear regression coefficients and t-values
-        model = self.linreg.predict_performance()
         coeffs = model.params
         t_values = model.tvalues
 
@@ -77,6 +97,7 @@ class PortfolioStatistics:
             'Final AUM': final_aum,
             'Average daily AUM': avg_daily_aum,
             'Maximum daily AUM': max_daily_aum,
+            'Maximum drawdown (AUM)': max_drawdown,
             'PnL (AUM)': pnl,
             'Average daily return of the portfolio': avg_daily_return,
             'Daily Standard deviation of the return of the portfolio': daily_std,
@@ -87,7 +108,19 @@ class PortfolioStatistics:
 
         return statistics
 
+    def max_drawdown(self):
+        """
+        Returns the largest fall of the daily AUM from its highest value so far, as a fraction of that high.
+        """
+        values = self.equity_curve.to_numpy(dtype = float)
+        if len(values) == 0:
+            return 0.0
+        peaks = np.fmax.accumulate(np.concatenate([[self.aum], values]))[1:]
+        return max(np.nanmax(1 - values / peaks), 0.0)
+
 if __name__ == '__main__':
+    from linreg import Linreg
+
     tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA']
     start_date = '20210105'
     end_date = '20211228'
@@ -100,8 +133,6 @@ if __name__ == '__main__':
 
     linreg = Linreg(tickers, start_date, end_date, days_1, day_2, strategy_1, strategy_2, top_pct, aum)
 
-    linreg.perform_strategy()
-
     portfolio_stats = PortfolioStatistics(linreg)
 
     stats = portfolio_stats.calculate_statistics()
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+
+def to_day(dates):
+    """
+    Converts a date, 'YYYYMMDD' string, or array of them to numpy datetime64[D].
+    """
+    if np.ndim(dates) == 0:
+        return np.datetime64(pd.Timestamp(dates).date(), 'D')
+    return pd.DatetimeIndex(pd.to_datetime(dates)).values.astype('datetime64[D]')
+
+
+class PricePanel:
+    """
+    Close prices of many tickers held as one aligned 2-D NumPy array (dates x tickers)
+    with a sorted datetime64[D] date index. Missing prices are NaN. Float32 prices (e.g. from a
+    float32 columnar_store.ColumnarStore) are kept as they are rather than copied to float64.
+
+    Date lookups use searchsorted instead of per-ticker boolean masks, so lookback returns for
+    all tickers and all rebalance dates are computed in a single vectorized pass.
+    """
+    def __init__(self, dates, tickers, close):
+        self.dates = np.asarray(dates, dtype = 'datetime64[D]')
+        self.tickers = list(tickers)
+        close = np.asarray(close)
+        self.close = close if close.dtype in (np.float32, np.float64) else close.astype(float)
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def from_frames(cls, ticker_data, tickers = None, field = 'Close'):
+        """
+        Builds a panel from a dict of ticker -> DataFrame (as returned by Strategy.get_data_for_all_tickers).
+        Dates are the union of every ticker's dates.
+        """
+        if tickers is None:
+            tickers = list(ticker_data)
+        columns = {}
+        for ticker in tickers:
+            data = ticker_data.get(ticker)
+            if data is None or len(data) == 0 or field not in data.columns:
+                columns[ticker] = pd.Series(dtype = float)
+            else:
+                columns[ticker] = data[field].astype(float)
+        frame = pd.concat(columns, axis = 1, sort = True) if len(columns) > 0 else pd.DataFrame()
+        frame = frame.reindex(columns = tickers)
+        dates = pd.DatetimeIndex(frame.index).values.astype('datetime64[D]')
+        return cls(dates, tickers, frame.to_numpy(dtype = float))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def window(self, start_date, end_date):
+        """
+        Returns the rows in [start_date, end_date) as a new PricePanel whose arrays are views into this one.
+        """
+        first_row = np.searchsorted(self.dates, to_day(start_date), 'left')
+        end_row = np.searchsorted(self.dates, to_day(end_date), 'left')
+        return PricePanel(self.dates[first_row:end_row], self.tickers, self.close[first_row:end_row])
+
+    def positions(self, dates):
+        """
+        Returns the row of each date in the date index, or -1 where the date is not in the index.
+        """
+        dates = np.atleast_1d(to_day(dates))
+        rows = np.searchsorted(self.dates, dates)
+        found = rows < len(self.dates)
+        found[found] = self.dates[rows[found]] == dates[found]
+        return np.where(found, rows, -1)
+
+    def column_indices(self, tickers = None):
+        if tickers is None:
+            return np.arange(len(self.tickers))
+        return np.array([self.columns[ticker] for ticker in tickers], dtype = int)
+
+    def lookback_returns(self, dates, days, strategy, tickers = None):
+        """
+        Returns a (len(dates) x len(tickers)) array of lookback returns ending at each date.
+
+        Momentum ('M') skips the most recent 20 trading days to avoid the reversal effect, i.e. the
+        return from row - days - 20 to row - 20. Reversal ('R') is the return from row - days to row.
+        Rows are counted on the shared date index. Entries are NaN where a date is not in the index,
+        the lookback runs past the first row, or a price is missing.
+        """
+        rows = self.positions(dates)
+        if strategy == 'M':
+            start_rows = rows - days - 20
+            end_rows = rows - 20
+        else:
+            start_rows = rows - days
+            end_rows = rows
+        valid = (rows >= 0) & (start_rows >= 0)
+        columns = self.column_indices(tickers)
+
+        start_prices = self.close[np.ix_(np.where(valid, start_rows, 0), columns)]
+        end_prices = self.close[np.ix_(np.where(valid, end_rows, 0), columns)]
+        #A ticker without a price on the signal date itself has no return on that date.
+        signal_prices = self.close[np.ix_(np.where(valid, rows, 0), columns)]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            returns = (end_prices - start_prices) / start_prices
+        returns[~valid] = np.nan
+        returns[np.isnan(signal_prices)] = np.nan
+        return returns
+
+    def rebalance_rows(self, dates):
+        """
+        Returns the row of the Close each date is rebalanced at: the last row on or before the date, or -1
+        where the date comes before the first row.
+        """
+        return np.searchsorted(self.dates, np.atleast_1d(to_day(dates)), 'right') - 1
+
+    def forward_returns(self, start_date, end_date, tickers = None):
+        """
+        Returns an array with each ticker's return from the Close of start_date to the Close of end_date (the
+        latest Close on or before each date). A ticker without a Close on start_date starts from its first Close
+        after it. Entries are NaN for tickers without any price from start_date until before end_date.
+        """
+        return self.window_returns([start_date, end_date], tickers)[0]
+
+    def holding_growth(self, window_starts, weights, tickers = None):
+        """
+        Returns the dates and the daily growth of a portfolio rebalanced at the Close of every window start.
+
+        window_starts: the m + 1 boundaries of m consecutive windows, window i holding from the Close of
+                 window_starts[i] to the Close of window_starts[i + 1].
+        weights: array (m, len(tickers)) of the weight held in each ticker during each window. Each window's
+                 weights are normalized to sum to 1.
+
+        The dates are the trading days after window_starts[0] up to window_starts[-1], each in the window it
+        closes. Each holding is marked to its latest Close relative to its Close at the window start, like
+        window_returns, so the growth on the last day of a window is 1 + the weighted sum of the holdings'
+        window returns. Holdings without a price yet count at their starting value. Windows with weights
+        summing to 0 hold cash, so their growth is 1.
+        """
+        columns = self.column_indices(tickers)
+        weights = np.asarray(weights, dtype = float)
+        boundaries = self.rebalance_rows(window_starts)
+        first_row, end_row = max(boundaries[0], 0), boundaries[-1] + 1
+        close = self.close[first_row:end_row][:, columns]
+        num_rows = close.shape[0]
+        boundaries = boundaries - first_row
+        if num_rows == 0 or boundaries[0] + 1 >= num_rows:
+            return self.dates[:0], np.empty(0)
+        rows = np.arange(num_rows)[:, None]
+
+        #Latest row with a price on or before each row, and first row with a price on or after it.
+        has_price = ~np.isnan(close)
+        last_price_row = np.maximum.accumulate(np.where(has_price, rows, -1), axis = 0)
+        next_price_row = np.minimum.accumulate(np.where(has_price, rows, num_rows)[::-1], axis = 0)[::-1]
+        #Window of every row after the first rebalance, and the row of each holding's starting price.
+        marked_rows = np.arange(boundaries[0] + 1, num_rows)
+        row_windows = np.searchsorted(boundaries, marked_rows, 'left') - 1
+        first_price_row = next_price_row[np.maximum(boundaries[:-1], 0)][row_windows]
+        last_price_row = last_price_row[marked_rows]
+
+        every_column = np.arange(len(columns))
+        held = last_price_row >= first_price_row
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            relative = close[np.maximum(last_price_row, 0), every_column] / close[np.minimum(first_price_row, num_rows - 1), every_column]
+            relative = np.where(held, relative, 1.0)
+            row_weights = weights[row_windows]
+            total_weights = row_weights.sum(axis = 1)
+            growth = np.where(total_weights > 0, (row_weights * relative).sum(axis = 1) / total_weights, 1.0)
+        return self.dates[first_row:end_row][marked_rows], growth
+
+    def window_returns(self, window_starts, tickers = None):
+        """
+        Returns the return of every window from the Close of window_starts[i] to the Close of window_starts[i + 1]
+        at once, as an (m x len(tickers)) array for the m windows. Like forward_returns, a ticker without a Close
+        on the window start starts from its first Close after it, and has no return (NaN) without any price
+        before the Close the window ends on.
+        """
+        columns = self.column_indices(tickers)
+        boundaries = self.rebalance_rows(window_starts)
+        first_row, end_row = max(boundaries[0], 0), boundaries[-1] + 1
+        close = self.close[first_row:end_row][:, columns]
+        num_rows = close.shape[0]
+        if num_rows == 0:
+            return np.full((len(boundaries) - 1, len(columns)), np.nan)
+        boundaries = boundaries - first_row
+        window_first_rows = np.maximum(boundaries[:-1], 0)
+        window_last_rows = boundaries[1:]
+
+        #Latest row with a price on or before each row, and first row with a price on or after it.
+        rows = np.arange(num_rows)[:, None]
+        has_price = ~np.isnan(close)
+        last_price_row = np.maximum.accumulate(np.where(has_price, rows, -1), axis = 0)
+        next_price_row = np.minimum.accumulate(np.where(has_price, rows, num_rows)[::-1], axis = 0)[::-1]
+        first = next_price_row[np.minimum(window_first_rows, num_rows - 1)]
+        last = last_price_row[np.maximum(window_last_rows, 0)]
+        #A window has a return where its first price comes before the Close it ends on.
+        has_return = (window_last_rows >= 0)[:, None] & (first < window_last_rows[:, None])
+
+        every_column = np.arange(len(columns))
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            returns = ((close[np.maximum(last, 0), every_column] - close[np.minimum(first, num_rows - 1), every_column])
+                       / close[np.minimum(first, num_rows - 1), every_column])
+        returns[~has_return] = np.nan
+        return returns
@@ -0,0 +1,237 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+FORMATS = ['numpy', 'parquet', 'arrow']
+#Rows of a table held in memory before they are written out as one chunk.
+CHUNK_ROWS = 65536
+
+
+def _pyarrow():
+    #pyarrow is only needed for the parquet and arrow formats, so it is imported when they are used.
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("The parquet and arrow formats need pyarrow; install it or use the numpy format.") from None
+    return pyarrow
+
+
+def _frame(rows):
+    """Returns rows given as a DataFrame, a Series or a dict of column -> values as a DataFrame."""
+    if isinstance(rows, pd.DataFrame):
+        return rows
+    if isinstance(rows, pd.Series):
+        return rows.reset_index()
+    return pd.DataFrame(rows)
+
+
+class ResultWriter:
+    """
+    Streams the rows of backtest and sweep results to columnar files, one file set per table, in chunks
+    of at most chunk_rows rows, so results never have to be held in memory as a whole.
+
+    Rows are appended with write(table, rows) and buffered per table; a table's buffer is written out as
+    soon as it holds chunk_rows rows, and every buffer is written by flush() and close(). The first rows
+    written to a table fix its columns and their types.
+
+    format:
+    'numpy': every column is one raw binary file that grows chunk by chunk, with the column names, types
+             and row count in <table>/meta.json, like a columnar_store.ColumnarStore. Text columns are stored
+             as int32 codes into a list of categories. Needs nothing beyond NumPy.
+    'parquet': <table>.parquet, one row group per chunk. Needs pyarrow.
+    'arrow': <table>.arrow, an Arrow IPC file with one record batch per chunk. Needs pyarrow.
+
+    'numpy' is the supported format: it is the only one that needs no optional dependency (pyarrow is not in
+    requirements.txt) and whose tables can be read while they are still being written, which is what a
+    streamed Linreg.perform_strategy reads its result back from. ResultReader opens the files again memory-mapped.
+    """
+    def __init__(self, directory, format = 'numpy', chunk_rows = CHUNK_ROWS):
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}.")
+        if format != 'numpy':
+            _pyarrow()
+        self.directory = directory
+        self.format = format
+        self.chunk_rows = int(chunk_rows)
+        os.makedirs(directory, exist_ok = True)
+        self._buffers = {}
+        self._buffered_rows = {}
+        #Per table: the open pyarrow writer and schema, or the numpy column layout.
+        self._tables = {}
+
+    def write(self, table, rows):
+        """
+        Appends rows, a DataFrame, Series or dict of column -> values, to a table.
+        """
+        frame = _frame(rows)
+        if len(frame) == 0:
+            return
+        self._buffers.setdefault(table, []).append(frame)
+        self._buffered_rows[table] = self._buffered_rows.get(table, 0) + len(frame)
+        if self._buffered_rows[table] >= self.chunk_rows:
+            self.flush(table)
+
+    def flush(self, table = None):
+        """
+        Writes out the buffered rows of a table, or of every table, in chunks of at most chunk_rows rows.
+        """
+        for name in ([table] if table is not None else list(self._buffers)):
+            frames = self._buffers.pop(name, [])
+            self._buffered_rows.pop(name, None)
+            if len(frames) == 0:
+                continue
+            frame = pd.concat(frames, ignore_index = True) if len(frames) > 1 else frames[0].reset_index(drop = True)
+            for start in range(0, len(frame), self.chunk_rows):
+                self._write_chunk(name, frame.iloc[start:start + self.chunk_rows])
+
+    def close(self):
+        """
+        Writes out every buffered row and closes the files.
+        """
+        self.flush()
+        for name, state in self._tables.items():
+            if self.format == 'numpy':
+                self._save_meta(name, state)
+            else:
+                state['writer'].close()
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_chunk(self, name, frame):
+        if self.format == 'numpy':
+            self._write_numpy_chunk(name, frame)
+            return
+        pa = _pyarrow()
+        state = self._tables.get(name)
+        if state is None:
+            chunk = pa.Table.from_pandas(frame, preserve_index = False)
+            path = os.path.join(self.directory, f'{name}.{self.format}')
+            if self.format == 'parquet':
+                writer = pa.parquet.ParquetWriter(path, chunk.schema)
+            else:
+                writer = pa.ipc.new_file(path, chunk.schema)
+            state = self._tables[name] = {'writer': writer, 'schema': chunk.schema}
+        else:
+            chunk = pa.Table.from_pandas(frame, schema = state['schema'], preserve_index = False)
+        state['writer'].write_table(chunk)
+
+    def _write_numpy_chunk(self, name, frame):
+        state = self._tables.get(name)
+        if state is None:
+            os.makedirs(os.path.join(self.directory, name), exist_ok = True)
+            columns = []
+            for column in frame.columns:
+                values = frame[column].to_numpy()
+                if values.dtype.kind in 'biufcmM':
+                    columns.append({'name': str(column), 'dtype': values.dtype.str})
+                else:
+                    columns.append({'name': str(column), 'dtype': np.dtype(np.int32).str, 'categories': []})
+            #A table written again starts from empty files.
+            for k in range(len(columns)):
+                path = os.path.join(self.directory, name, f'{k}.bin')
+                if os.path.exists(path):
+                    os.remove(path)
+            state = self._tables[name] = {'columns': columns, 'rows': 0,
+                                          'codes': [{category: code for code, category in enumerate(column.get('categories', []))}
+                                                    for column in columns]}
+        for k, column in enumerate(state['columns']):
+            values = frame[column['name']].to_numpy()
+            if 'categories' in column:
+                values = values.astype(str)
+                codes = state['codes'][k]
+                for value in pd.unique(values):
+                    if value not in codes:
+                        codes[value] = len(column['categories'])
+                        column['categories'].append(value)
+                values = pd.Index(column['categories']).get_indexer(values)
+            with open(os.path.join(self.directory, name, f'{k}.bin'), 'ab') as file:
+                file.write(np.ascontiguousarray(values, dtype = np.dtype(column['dtype'])).tobytes())
+        state['rows'] += len(frame)
+        #The metadata is saved after every chunk, so the rows written so far can be read while the backtest runs.
+        self._save_meta(name, state)
+
+    def _save_meta(self, name, state):
+        path = os.path.join(self.directory, name, 'meta.json')
+        with open(path + '.tmp', 'w') as file:
+            json.dump({'columns': state['columns'], 'rows': state['rows']}, file)
+        os.replace(path + '.tmp', path)
+
+
+class ResultReader:
+    """
+    Reads the tables written by a ResultWriter, memory-mapped so that only the columns and rows used are
+    read from disk. The format is found from the files in the directory.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        names = sorted(os.listdir(directory))
+        self.tables = {}
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.isfile(os.path.join(path, 'meta.json')):
+                self.tables[name] = 'numpy'
+            elif name.endswith('.parquet') or name.endswith('.arrow'):
+                self.tables[name.rsplit('.', 1)[0]] = name.rsplit('.', 1)[1]
+
+    def columns(self, table):
+        """Returns the column names of a table."""
+        if self.tables[table] == 'numpy':
+            return [column['name'] for column in self._meta(table)['columns']]
+        return list(self._arrow_table(table).column_names)
+
+    def column(self, table, name):
+        """
+        Returns one column of a table. For the numpy format this is a read-only memory-mapped array (the
+        int32 codes for a text column, see categories); otherwise a pyarrow ChunkedArray of the mapped file.
+        """
+        if self.tables[table] != 'numpy':
+            return self._arrow_table(table).column(name)
+        meta = self._meta(table)
+        for k, column in enumerate(meta['columns']):
+            if column['name'] == name:
+                if meta['rows'] == 0:
+                    return np.empty(0, dtype = np.dtype(column['dtype']))
+                return np.memmap(os.path.join(self.directory, table, f'{k}.bin'), dtype = np.dtype(column['dtype']),
+                                 mode = 'r', shape = (meta['rows'],))
+        raise KeyError(name)
+
+    def categories(self, table, name):
+        """Returns the categories the codes of a text column of the numpy format refer to."""
+        column = [column for column in self._meta(table)['columns'] if column['name'] == name][0]
+        return column.get('categories')
+
+    def read(self, table, columns = None):
+        """
+        Returns a table, or the given columns of it, as a DataFrame.
+        """
+        if columns is None:
+            columns = self.columns(table)
+        if self.tables[table] != 'numpy':
+            return self._arrow_table(table).select(list(columns)).to_pandas()
+        data = {}
+        for name in columns:
+            values = self.column(table, name)
+            categories = self.categories(table, name)
+            if categories is not None:
+                values = np.array(categories, dtype = object)[values]
+            data[name] = values
+        return pd.DataFrame(data, columns = list(columns))
+
+    def _meta(self, table):
+        with open(os.path.join(self.directory, table, 'meta.json')) as file:
+            return json.load(file)
+
+    def _arrow_table(self, table):
+        pa = _pyarrow()
+        path = os.path.join(self.directory, f'{table}.{self.tables[table]}')
+        if self.tables[table] == 'parquet':
+            return pa.parquet.read_table(path, memory_map = True)
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
@@ -0,0 +1,35 @@
+import numpy as np
+
+
+def top_k_mask(scores, k, largest = True):
+    """
+    Selects the k largest (or smallest) scores of every row of a (dates x tickers) array at once.
+
+    Returns a boolean array of the same shape that is True for the selected tickers. NaN scores are
+    never selected, so a row with fewer than k scores selects all of them. A 1-d array of scores is
+    treated as a single row.
+
+    The k-th score of every row is found with np.argpartition in O(tickers). Ties at the k-th score
+    go to the leftmost tickers, the same choice heapq.nlargest / heapq.nsmallest make.
+    """
+    scores = np.asarray(scores, dtype = float)
+    single_row = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    num_rows, num_columns = scores.shape
+    k = min(int(k), num_columns)
+    if k <= 0:
+        mask = np.zeros(scores.shape, dtype = bool)
+        return mask[0] if single_row else mask
+
+    #Rank on a key where smaller is better and NaN is worst.
+    key = -scores if largest else scores.copy()
+    key[np.isnan(key)] = np.inf
+    kth = np.take_along_axis(key, np.argpartition(key, k - 1, axis = 1)[:, k - 1:k], axis = 1)
+
+    better = key < kth
+    ties = (key == kth) & np.isfinite(key)
+    #Fill the places left after the strictly better scores with the leftmost ties.
+    places_left = k - better.sum(axis = 1, keepdims = True)
+    mask = better | (ties & (np.cumsum(ties, axis = 1) <= places_left))
+    return mask[0] if single_row else mask
+
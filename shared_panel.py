@@ -0,0 +1,140 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from feature_store import FeatureStore
+from price_panel import PricePanel
+
+#Set in each worker process by _attach_worker.
+_worker_state = {}
+
+
+class SharedPanel:
+    """
+    The Close prices of a PricePanel copied once into a multiprocessing.shared_memory block, so that
+    worker processes can attach to them without copying or pickling the prices.
+
+    handle() returns the small picklable description a worker passes to attach(), which returns a
+    PricePanel whose close array is a view of the shared block. The process that created the block
+    releases it with close(), or by using the SharedPanel as a context manager.
+    """
+    def __init__(self, panel):
+        close = np.ascontiguousarray(panel.close)
+        self.dates = panel.dates
+        self.tickers = list(panel.tickers)
+        self.shape = close.shape
+        self.dtype = close.dtype
+        self.memory = shared_memory.SharedMemory(create = True, size = max(close.nbytes, 1))
+        self.prices = np.ndarray(self.shape, dtype = self.dtype, buffer = self.memory.buf)
+        self.prices[:] = close
+        self.panel = PricePanel(self.dates, self.tickers, self.prices)
+
+    def handle(self):
+        return (self.memory.name, self.shape, self.dtype.str, self.dates, self.tickers)
+
+    @staticmethod
+    def attach(handle):
+        """
+        Returns the shared block and a PricePanel of views into it, for a worker process of the process that
+        created it. The block must be kept referenced for as long as the panel is used.
+        """
+        name, shape, dtype, dates, tickers = handle
+        #Worker processes share the resource tracker of the process that created the block, which unlinks it.
+        memory = shared_memory.SharedMemory(name = name)
+        close = np.ndarray(shape, dtype = np.dtype(dtype), buffer = memory.buf)
+        return memory, PricePanel(dates, tickers, close)
+
+    def close(self):
+        #Views of the block must be released before it can be closed.
+        self.panel = None
+        self.prices = None
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ShardPool:
+    """
+    Worker processes that compute lookback and forward returns of a PricePanel in shards of tickers.
+
+    The panel is put into a SharedPanel once, and every worker attaches to it when it starts. Each call
+    splits the tickers into one contiguous shard per worker; a worker reads its shard's columns of the
+    shared prices in place and returns only its results, which are joined along the tickers.
+
+    tensor() and window_returns() give the same results as FeatureStore.tensor and
+    PricePanel.window_returns on the whole panel.
+    """
+    def __init__(self, panel, processes = None):
+        self.processes = processes if processes is not None else os.cpu_count()
+        self.tickers = list(panel.tickers)
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.shared = SharedPanel(panel)
+        self.executor = ProcessPoolExecutor(self.processes, initializer = _attach_worker, initargs = (self.shared.handle(),))
+
+    def shards(self):
+        """Returns the (start, stop) column range of every shard, one per worker."""
+        bounds = np.linspace(0, len(self.tickers), min(self.processes, max(len(self.tickers), 1)) + 1).astype(int)
+        return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    def _map(self, task, *arguments):
+        shards = self.shards()
+        return list(self.executor.map(task, shards, *[[argument] * len(shards) for argument in arguments]))
+
+    def _columns(self, tickers):
+        return slice(None) if tickers is None else [self.columns[ticker] for ticker in tickers]
+
+    def tensor(self, dates, horizons, tickers = None, first_date = None):
+        """
+        Returns FeatureStore.tensor of the whole panel, each worker computing its shard of tickers.
+        """
+        results = self._map(_shard_tensor, list(dates), [tuple(horizon) for horizon in horizons], first_date)
+        return np.concatenate(results, axis = 1)[:, self._columns(tickers)]
+
+    def window_returns(self, window_starts, tickers = None):
+        """
+        Returns PricePanel.window_returns of the whole panel, each worker computing its shard of tickers.
+        """
+        results = self._map(_shard_window_returns, list(window_starts))
+        return np.concatenate(results, axis = 1)[:, self._columns(tickers)]
+
+    def close(self):
+        self.executor.shutdown()
+        self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _attach_worker(handle):
+    _worker_state['memory'], _worker_state['panel'] = SharedPanel.attach(handle)
+
+
+def _shard_panel(shard):
+    #Columns of the shared prices, as a view.
+    panel = _worker_state['panel']
+    start, stop = shard
+    return PricePanel(panel.dates, panel.tickers[start:stop], panel.close[:, start:stop])
+
+
+def _shard_store(shard):
+    #The FeatureStore of a shard is kept by the worker, so each ticker's log prices are taken once.
+    stores = _worker_state.setdefault('stores', {})
+    if shard not in stores:
+        stores[shard] = FeatureStore(_shard_panel(shard))
+    return stores[shard]
+
+
+def _shard_tensor(shard, dates, horizons, first_date):
+    return _shard_store(tuple(shard)).tensor(dates, horizons, first_date = first_date)
+
+
+def _shard_window_returns(shard, window_starts):
+    return _shard_panel(shard).window_returns(window_starts)
@@ -1,19 +1,37 @@
-import yfinance as yf
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from datetime import timedelta
-from getdata import Getdata
+from data_cache import DataCache
+from memo import LRUMemo
+from price_panel import PricePanel, to_day
+from selection import top_k_mask
+from feature_store import FeatureStore, signal_horizon
+import instrumentation
+import trading_calendar
 import math
-import heapq
 
 class Strategy:
-    def __init__(self, tickers, start_date, end_date, days, strategy, top_pct):
+    def __init__(self, tickers, start_date, end_date, days, strategy, top_pct, provider = None, memo_size = 256):
         self.tickers = tickers
         self.strategy = strategy
-        self.start_date = start_date
+        #Stocks are selected on the first trading day on or after start_date, which has prices to rank them by.
+        self.start_date = trading_calendar.snap(start_date, 'next')
         self.end_date = end_date
         self.days = days
         self.top_pct = top_pct
+        #Market data source. By default the yf API behind a persistent on-disk cache,
+        #so repeated windows are not re-fetched.
+        self.provider = provider if provider is not None else DataCache()
+        #Memo of identical data loads / run_strategy / actual_performance calls within a backtest run.
+        self.memo = LRUMemo(memo_size)
+        #Price panel preloaded by load_panel for a whole backtest, and the [start, end) range it covers.
+        self.panel = None
+        self.panel_range = None
+        #Log prices of the preloaded panel, from which every lookback return is read.
+        self.feature_store = None
+        #shared_panel.ShardPool computing the signals of the preloaded panel in worker processes, see share_panel.
+        self.shard_pool = None
 
     def compute_top_stocks (self, top_pct):
         self.top_pct = top_pct
@@ -25,71 +43,175 @@ class Strategy:
         return num_top_stocks
 
     def get_data_for_all_tickers(self, start_date, end_date, tickers):
-        self.end_date = end_date
         self.tickers = tickers
         """
-        Saves on runtime by calling API once per stock. 
-        Calls API for each stock in the list of tickers with data_start_date being one year before actual start_date.
+        Saves on runtime by loading every stock in one batched call to the data provider.
+        Loads each stock in the list of tickers with data_start_date being one year before actual start_date.
         Allows for maximum of 250 trading days for backtesting.
+        Identical loads within a run are served from the memo.
         
         Returns:
             all_data (dict): Dictionary of dataframes with ticker as key and dataframe as value.
         """
-        all_data = {}
+        key = ('get_data_for_all_tickers', start_date, end_date, tuple(tickers))
+        return self.memo.get_or_compute(key, lambda: self._load_data(start_date, end_date, tickers))
+
+    def _load_data(self, start_date, end_date, tickers):
         start_date_datetime = datetime.strptime(start_date, '%Y%m%d')
         data_start_date = start_date_datetime - timedelta(days=400)
-        for ticker in self.tickers:
-            data_obj = Getdata(data_start_date.strftime('%Y%m%d'), self.end_date, ticker)
-            data_df = data_obj.getdata()
-            all_data[ticker] = data_df
+        end_date_datetime = datetime.strptime(end_date, '%Y%m%d')
+        with instrumentation.span('fetch_many', tickers = len(tickers)):
+            all_data = self.provider.fetch_many(tickers, data_start_date, end_date_datetime)
+        instrumentation.record_fetch(type(self.provider).__name__, tickers, data_start_date, end_date_datetime,
+                                     sum(len(data) for data in all_data.values()),
+                                     sum(int(data.memory_usage().sum()) for data in all_data.values()))
         return all_data
 
 
-    def calculate_returns(self, start_date, days, strategy, ticker_data, tickers):
+    def data_range(self, start_date, end_date):
+        """
+        Returns the padded [start, end) range of prices loaded for [start_date, end_date]: 400 days of lookback
+        before start_date, through the Close of end_date, on which a window's forward return ends.
+        """
+        return datetime.strptime(start_date, '%Y%m%d') - timedelta(days=400), datetime.strptime(end_date, '%Y%m%d') + timedelta(days=1)
 
+    def load_panel(self, start_date, end_date, tickers):
         """
-        identifies the proper date by using iloc to locate the row of the dataframe that corresponds to the start_date.
-        moves back the correct number of days to get the backtest_start_date and backtest_end_date.
-        ranks stocks in ascending order of returns as a dict with ticker as key and return as value.
+        Loads the whole padded range data_range(start_date, end_date) for all tickers in one go.
+        Every later window that falls inside this range is served as a view of the loaded panel
+        instead of being loaded again. Nothing is loaded if the current panel already covers the range.
         """
+        data_start_date, data_end_date = self.data_range(start_date, end_date)
+        if self._panel_covers(data_start_date, data_end_date, tickers):
+            return self.panel
+        self.set_panel(self._fetch_panel(tickers, data_start_date, data_end_date), (data_start_date, data_end_date))
+        return self.panel
 
-        backtest_returns = {}
+    def set_panel(self, panel, panel_range):
+        """
+        Uses panel, holding the padded [start, end) panel_range, as the preloaded panel of load_panel, e.g. a
+        shared_panel.SharedPanel's panel that a worker process attached to.
+        """
+        self.close_shards()
+        self.panel = panel
+        self.panel_range = panel_range
+        self.feature_store = FeatureStore(panel)
+        self.memo.clear()
 
-        for ticker in tickers:
-            #Read in the data for the ticker in the list of dataframes containing our data.
-            #Reset index because Date is the label for the index column.
-            df = ticker_data[ticker].reset_index()
-            start_date_index = df.loc[df['Date'] == start_date].index
+    def get_panel(self, start_date, end_date, tickers):
+        """
+        Returns the Close prices of the tickers over the padded window as one aligned PricePanel (dates x tickers),
+        loaded through the provider's load_panel. Panels are memoized like the data they are built from.
+        """
+        key = ('get_panel', start_date, end_date, tuple(tickers))
+        return self.memo.get_or_compute(key, lambda: self._build_panel(start_date, end_date, tickers))
+
+    def _build_panel(self, start_date, end_date, tickers):
+        data_start_date, data_end_date = self.data_range(start_date, end_date)
+        if self._panel_covers(data_start_date, data_end_date, tickers):
+            return self.panel.window(data_start_date, data_end_date)
+        return self._fetch_panel(tickers, data_start_date, data_end_date)
+
+    def _fetch_panel(self, tickers, data_start_date, data_end_date):
+        with instrumentation.span('load_panel', tickers = len(tickers)):
+            panel = self.provider.load_panel(tickers, data_start_date, data_end_date)
+        instrumentation.record_fetch(type(self.provider).__name__, tickers, data_start_date, data_end_date,
+                                     panel.close.size, panel.close.nbytes)
+        return panel
+
+    def _panel_covers(self, data_start_date, data_end_date, tickers):
+        if self.panel is None:
+            return False
+        loaded_start, loaded_end = self.panel_range
+        return loaded_start <= data_start_date and data_end_date <= loaded_end and set(tickers) <= set(self.panel.tickers)
+
+    def lookback_returns(self, start_date, end_date, days, strategy, tickers):
+        """
+        Returns calculate_returns for the signal date start_date using the panel for [start_date, end_date).
+        The returns do not depend on top_pct, so they are memoized and shared by every top_pct
+        (e.g. across the configurations of a parameter sweep).
 
-            if len(start_date_index) == 0:
-                print(f"Warning: No data found for {ticker} on {start_date}. Skipping...")
-                continue
-            else:
-                #If we found data, the row number of the start date is the first value in the index of start_date_index.
-                start_date_row_number = start_date_index[0]
+        Inside a panel preloaded by load_panel, the returns are read from its FeatureStore instead,
+        limited to the same padded window, without building the window's panel.
+        """
+        key = ('lookback_returns', start_date, end_date, days, strategy, tuple(tickers))
+        return self.memo.get_or_compute(key, lambda: self._lookback_returns(start_date, end_date, days, strategy, tickers))
+
+    def _lookback_returns(self, start_date, end_date, days, strategy, tickers):
+        data_start_date, data_end_date = self.data_range(start_date, end_date)
+        if not self._panel_covers(data_start_date, data_end_date, tickers):
+            return self.calculate_returns(start_date, days, strategy, self.get_panel(start_date, end_date, tickers), tickers)
+        with instrumentation.span('calculate_returns', days = days, strategy = strategy):
+            returns = self.feature_store.lookback_returns([start_date], *signal_horizon(days, strategy), tickers, data_start_date)[0]
+        return self._returns_dict(start_date, tickers, returns)
+
+    def feature_tensor(self, dates, signals, tickers, first_date = None):
+        """
+        Returns the lookback returns of every (days, strategy) signal at every date as a
+        (dates x tickers x signals) array, from the panel preloaded by load_panel.
+        first_date: the lookbacks must not start before this date, or before the date given for each date.
+
+        The tensor does not depend on top_pct, so it is memoized and shared by every top_pct (e.g. across the
+        configurations of a parameter sweep). It must not be modified.
+        """
+        first_dates = None if first_date is None else tuple(np.atleast_1d(to_day(first_date)).tolist())
+        key = ('feature_tensor', tuple(dates), tuple(signals), tuple(tickers), first_dates)
+        return self.memo.get_or_compute(key, lambda: self._feature_tensor(dates, signals, tickers, first_date))
+
+    def _feature_tensor(self, dates, signals, tickers, first_date):
+        horizons = [signal_horizon(days, strategy) for days, strategy in signals]
+        if self.shard_pool is not None:
+            return self.shard_pool.tensor(dates, horizons, tickers, first_date)
+        return self.feature_store.tensor(dates, horizons, tickers, first_date)
 
-            if strategy == "M":
-                #Lookback period for momentum needs to factor in additional 20 day gap to avoid reversal effect.
-                backtest_start_date = df.loc[(start_date_row_number - days - 20), 'Date']
-                backtest_end_date = df.loc[(start_date_row_number - 20), 'Date']
+    def share_panel(self, processes = None):
+        """
+        Puts the panel preloaded by load_panel into shared memory once, and computes the signals and forward
+        returns of run_strategy_many and actual_performance_many in worker processes from then on, each on a
+        shard of the tickers. Call close_shards to stop the workers and free the shared memory.
+        """
+        from shared_panel import ShardPool
+        self.close_shards()
+        self.shard_pool = ShardPool(self.panel, processes)
+        return self.shard_pool
+
+    def close_shards(self):
+        if self.shard_pool is not None:
+            self.shard_pool.close()
+            self.shard_pool = None
+
+    def covers(self, start_date, end_date, tickers):
+        """
+        Returns whether the panel preloaded by load_panel holds every window between start_date and end_date,
+        with its padding, for the tickers.
+        """
+        return self._panel_covers(*self.data_range(start_date, end_date), tickers)
 
+    def calculate_returns(self, start_date, days, strategy, ticker_data, tickers):
+
+        """
+        identifies the proper date by using searchsorted on the panel's sorted date index to locate the row that corresponds to the start_date.
+        moves back the correct number of days to get the backtest start and end rows.
+        computes returns for every ticker in one vectorized pass, as a dict with ticker as key and return as value.
+
+        ticker_data can be a PricePanel or a dict of DataFrames as returned by get_data_for_all_tickers.
+        """
+        with instrumentation.span('calculate_returns', days = days, strategy = strategy):
+            if isinstance(ticker_data, PricePanel):
+                panel = ticker_data
             else:
-                #Means that strategy was reversal.
-                #Define the backtest start and end date accordingly.
-                backtest_start_date = df.loc[(start_date_row_number - days), 'Date']
-                backtest_end_date = df.loc[(start_date_row_number), 'Date']
-
-            backtest_start_date_row_number = df.loc[df['Date'] == backtest_start_date].index.item()
-            backtest_end_date_row_number = df.loc[df['Date'] == backtest_end_date].index.item()
-            #Find start date closing price (the price the ticker begins the backtest at)
-            backtest_start_price = df.loc[backtest_start_date_row_number, 'Close']
-            #Get end date closing price (the price the ticker finishes the backtest at)
-            backtest_end_price = df.loc[backtest_end_date_row_number, 'Close']
-            #Use the two previous values to calculate returns
-            backtest_return = (backtest_end_price - backtest_start_price) / backtest_start_price
-
-            #Append returns to the dictionary backtest_returns with key ticker and value return for the ticker.
-            backtest_returns[ticker] = backtest_return
+                panel = PricePanel.from_frames(ticker_data, tickers)
+
+            returns = panel.lookback_returns([start_date], days, strategy, tickers)[0]
+        return self._returns_dict(start_date, tickers, returns)
+
+    def _returns_dict(self, start_date, tickers, returns):
+        backtest_returns = {}
+        for ticker, backtest_return in zip(tickers, returns):
+            if math.isnan(backtest_return):
+                print(f"Warning: No data found for {ticker} on {start_date}. Skipping...")
+                continue
+            backtest_returns[ticker] = float(backtest_return)
         return backtest_returns
 
 
@@ -101,51 +223,102 @@ class Strategy:
         Args: start_date, end_date, days, strategy, tickers.
 
         Returns: a dataframe of each of the stocks. If stock is not in top_pct, return is 0.
-        Otherwise, return is the return of the stock.
-        """
-        data = self.get_data_for_all_tickers(start_date, end_date, tickers)
+        Otherwise, return is the return of the stock. The selection itself is select_stocks.
 
-        returns = self.calculate_returns(start_date, days, strategy, data, tickers)
+        Results are memoized by (window, days, strategy, tickers, top_pct), so repeated calls
+        within a backtest only compute once. A copy is returned so callers cannot alter the memo.
+        """
+        key = ('run_strategy', start_date, end_date, days, strategy, tuple(tickers), self.top_pct)
+        with instrumentation.span('run_strategy', days = days, strategy = strategy):
+            return self.memo.get_or_compute(key, lambda: self._run_strategy(start_date, end_date, days, strategy, tickers)).copy()
 
-        #Calculate the number of top stocks
-        num_top_stocks = self.compute_top_stocks(top_pct = self.top_pct)
+    def _run_strategy(self, start_date, end_date, days, strategy, tickers):
+        scores = self.lookback_scores(start_date, end_date, days, strategy, tickers)
+        selected = self.select_stocks(start_date, end_date, days, strategy, tickers)
 
-        if strategy == 'M':  # selection of the top stocks based on momentum
-            selected_stocks = heapq.nlargest(num_top_stocks, returns, key=returns.get)  # sorts the dict key value pairs of the top stocks
-            
-        else:  # selection of the bottom stocks based on reversal
-            selected_stocks = heapq.nsmallest(num_top_stocks, returns, key=returns.get)  # sorts the dict key value pairs of the bottom stocks
+        # Every stock with its return if it is selected, 0 otherwise
+        return pd.DataFrame(data={'Stock': tickers, 'Return': np.where(selected, scores, 0.0)})
 
-        # Create a DataFrame with all the stocks and their returns initialized to 0
-        stock_returns_df = pd.DataFrame(data={'Stock': tickers, 'Return': [0] * len(tickers)})
+    def lookback_scores(self, start_date, end_date, days, strategy, tickers):
+        """
+        Returns lookback_returns as an array in the order of tickers, NaN for tickers without data.
+        """
+        returns = self.lookback_returns(start_date, end_date, days, strategy, tickers)
+        return np.array([returns.get(ticker, np.nan) for ticker in tickers], dtype = float)
 
-        # Update the returns for the stocks selected based on the top_pct criteria
-        for stock in selected_stocks:
-            stock_returns_df.loc[stock_returns_df['Stock'] == stock, 'Return'] = returns[stock]
+    def select_stocks(self, start_date, end_date, days, strategy, tickers):
+        """
+        Returns a boolean array over tickers that is True for the top_pct stocks selected at start_date:
+        the highest lookback returns for momentum (M), the lowest for reversal (R). Stocks without
+        data are never selected. Memoized like run_strategy.
+        """
+        key = ('select_stocks', start_date, end_date, days, strategy, tuple(tickers), self.top_pct)
+        return self.memo.get_or_compute(key, lambda: top_k_mask(self.lookback_scores(start_date, end_date, days, strategy, tickers),
+                                                                self.compute_top_stocks(self.top_pct), strategy == 'M'))
 
-        return stock_returns_df
-    
+    def run_strategy_many(self, window_starts, signals, tickers):
+        """
+        Returns run_strategy's Return for every window from window_starts[i] to window_starts[i + 1] and every
+        (days, strategy) signal at once, as a (windows x tickers x signals) array. The signals of all windows
+        are read from the panel preloaded by load_panel, which must cover them, and ranked in one pass.
+        """
+        start_dates = list(window_starts[:-1])
+        first_dates = to_day(start_dates) - np.timedelta64(400, 'D')
+        with instrumentation.span('run_strategy', windows = len(start_dates), signals = len(signals)):
+            scores = self.feature_tensor(start_dates, signals, tickers, first_dates)
+            num_top_stocks = self.compute_top_stocks(self.top_pct)
+            returns = np.zeros(scores.shape)
+            for k, (days, strategy) in enumerate(signals):
+                selected = top_k_mask(scores[:, :, k], num_top_stocks, strategy == 'M')
+                returns[:, :, k] = np.where(selected, scores[:, :, k], 0.0)
+        return returns
 
     def actual_performance(self, start_date, end_date):
-        backtest_data = self.run_strategy(self.start_date, self.end_date, self.days, self.strategy, self.tickers)
-        stocks_list = []
-        for index, row in backtest_data.iterrows():
-            if row['Return'] > 0:
-                stocks_list.append(row['Stock'])
-
-        start_date_formatted = datetime.strptime(start_date, "%Y%m%d").strftime("%Y-%m-%d")
-        end_date_formatted = datetime.strptime(end_date, "%Y%m%d").strftime("%Y-%m-%d")
-
-        stock_returns = []
+        """
+        Returns the return from the Close of start_date to the Close of end_date of the stocks selected by this
+        Strategy's own days/strategy lookback over its self.start_date..self.end_date window.
+        Returns are taken from the price panel loaded for the window.
 
-        for stock in stocks_list:
-            stock_data = yf.download(stock, start=start_date_formatted, end=end_date_formatted)
-            
-            if not stock_data.empty:
-                stock_return = (stock_data['Close'][-1] - stock_data['Close'][0])/stock_data['Close'][0]
-                stock_returns.append({'Stock': stock, 'Return': stock_return})
+        Results are memoized like run_strategy.
+        """
+        key = ('actual_performance', start_date, end_date, self.start_date, self.end_date, self.days, self.strategy, tuple(self.tickers), self.top_pct)
+        with instrumentation.span('actual_performance'):
+            return self.memo.get_or_compute(key, lambda: self._actual_performance(start_date, end_date)).copy()
 
-        result_df = pd.DataFrame(stock_returns, columns=['Stock', 'Return'])
+    def actual_performance_many(self, window_starts, tickers):
+        """
+        Returns actual_performance for every window from window_starts[i] to window_starts[i + 1] at once, as a
+        (windows x tickers) array of returns that is NaN for the stocks actual_performance leaves out.
+        The forward returns of all windows come from the panel preloaded by load_panel, which must cover them.
+        """
+        with instrumentation.span('actual_performance', windows = len(window_starts) - 1):
+            selected = self.select_stocks(self.start_date, self.end_date, self.days, self.strategy, self.tickers)
+            stocks = {ticker for ticker, is_selected in zip(self.tickers, selected) if is_selected}
+            #The forward returns do not depend on top_pct, so they are memoized like the signals of feature_tensor.
+            key = ('window_returns', tuple(window_starts), tuple(tickers))
+            returns = self.memo.get_or_compute(key, lambda: self._window_returns(window_starts, tickers)).copy()
+            returns[:, [ticker not in stocks for ticker in tickers]] = np.nan
+        return returns
+
+    def _window_returns(self, window_starts, tickers):
+        if self.shard_pool is not None:
+            return self.shard_pool.window_returns(window_starts, tickers)
+        return self.panel.window_returns(window_starts, tickers)
+
+    def _actual_performance(self, start_date, end_date):
+        #Every selected stock, whatever the sign of its lookback return.
+        selected = self.select_stocks(self.start_date, self.end_date, self.days, self.strategy, self.tickers)
+        stocks_list = [ticker for ticker, is_selected in zip(self.tickers, selected) if is_selected]
+
+        #Forward returns come from the same already-loaded panel that the signals for this window use,
+        #computed for all selected stocks at once instead of downloading each stock again.
+        panel = self.get_panel(start_date, end_date, self.tickers)
+        returns = panel.forward_returns(start_date, end_date, stocks_list)
+
+        #Stocks without any price in the window are left out.
+        has_return = ~np.isnan(returns)
+        result_df = pd.DataFrame({'Stock': np.array(stocks_list, dtype = object)[has_return], 'Return': returns[has_return]},
+                                 columns=['Stock', 'Return'])
         
         return result_df
 
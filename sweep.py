@@ -0,0 +1,195 @@
+import argparse
+import copy
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from args_check import ArgsCheck
+from data_provider import CsvProvider
+from linreg import Linreg
+from memo import LRUMemo
+from portfolio_statistics import PortfolioStatistics
+from shared_panel import SharedPanel
+from stock_strategy import Strategy
+
+PARAMETER_COLUMNS = ['days_1', 'days_2', 'strategy_1', 'strategy_2', 'top_pct']
+
+#Set in each worker process by _init_worker.
+_worker_state = {}
+
+
+class Sweep:
+    """
+    Runs the Linreg backtest for every combination of a grid of
+    (days_1, days_2, strategy_1, strategy_2, top_pct) and collects the PortfolioStatistics of each.
+
+    The price panel is loaded once for the whole sweep and shared by all configurations: worker processes
+    attach to it in shared memory (shared_panel.SharedPanel) instead of receiving a copy. Configurations
+    that differ only in top_pct form a group, which runs as one task, so its signals and forward returns are
+    computed once (see Strategy.feature_tensor) for all of its top_pcts. Groups are spread across a pool of
+    worker processes.
+    """
+    def __init__(self, tickers, start_date, end_date, aum, days_1, days_2, strategies_1 = ('M',), strategies_2 = ('R',),
+                 top_pcts = (10,), provider = None, processes = None):
+        """
+        days_1, days_2, strategies_1, strategies_2, top_pcts: lists of values to sweep over.
+        processes: number of worker processes. None uses every CPU; 1 runs in this process.
+        """
+        self.tickers = tickers
+        self.start_date = start_date
+        self.end_date = end_date
+        self.aum = aum
+        self.days_1 = list(days_1)
+        self.days_2 = list(days_2)
+        self.strategies_1 = list(strategies_1)
+        self.strategies_2 = list(strategies_2)
+        self.top_pcts = list(top_pcts)
+        self.provider = provider
+        self.processes = processes if processes is not None else os.cpu_count()
+
+    def configurations(self):
+        """
+        Returns every (days_1, days_2, strategy_1, strategy_2, top_pct) combination of the grid.
+        """
+        return list(itertools.product(self.days_1, self.days_2, self.strategies_1, self.strategies_2, self.top_pcts))
+
+    def groups(self):
+        """
+        Returns the configurations grouped by their (days_1, days_2, strategy_1, strategy_2) signals, in order.
+        """
+        return [list(group) for _, group in itertools.groupby(self.configurations(), lambda configuration: configuration[:4])]
+
+    def shared_strategy(self):
+        """
+        Returns a Strategy with the whole backtest's price panel, and the FeatureStore every configuration
+        reads its signals from, loaded once.
+        """
+        strategy = Strategy(self.tickers, self.start_date, self.end_date, 10, 'M', self.top_pcts[0], provider = self.provider)
+        linreg = Linreg(self.tickers, self.start_date, self.end_date, self.days_1[0], self.days_2[0],
+                        self.strategies_1[0], self.strategies_2[0], self.top_pcts[0], self.aum, strategy = strategy)
+        last_trading_days, window_starts = linreg.window_starts()
+        if len(window_starts) > 0:
+            linreg.load_panel(window_starts)
+        return strategy
+
+    def run(self, writer = None):
+        """
+        Runs every configuration and returns a DataFrame with one row per configuration: the parameters
+        followed by the PortfolioStatistics metrics. Regression coefficients and t-values get one column each.
+
+        writer: a result_writer.ResultWriter each row is streamed to, as the statistics table, as soon as its
+        configuration completes.
+        """
+        strategy = self.shared_strategy()
+        groups = self.groups()
+        settings = (self.tickers, self.start_date, self.end_date, self.aum)
+
+        if self.processes == 1 or len(groups) <= 1 or strategy.panel is None:
+            _init_worker(strategy, settings)
+            rows = [_write_row(writer, row) for group in groups for row in _run_group(group)]
+        else:
+            #Workers attach to the preloaded prices in shared memory, so neither the panel nor the data provider
+            #is sent to them.
+            shared = copy.copy(strategy)
+            shared.provider = None
+            shared.panel = None
+            shared.feature_store = None
+            shared.memo = LRUMemo(strategy.memo.maxsize)
+            chunksize = max(1, len(groups) // (self.processes * 4))
+            with SharedPanel(strategy.panel) as shared_panel:
+                with ProcessPoolExecutor(self.processes, initializer = _init_worker, initargs = (shared, settings, shared_panel.handle())) as executor:
+                    rows = [_write_row(writer, row) for group_rows in executor.map(_run_group, groups, chunksize = chunksize) for row in group_rows]
+
+        return pd.DataFrame(rows)
+
+
+def _write_row(writer, row):
+    if writer is not None:
+        writer.write('statistics', pd.DataFrame([row]))
+    return row
+
+
+def _init_worker(strategy, settings, handle = None):
+    if handle is not None:
+        #The shared block is kept referenced for as long as the worker reads its panel.
+        _worker_state['memory'], panel = SharedPanel.attach(handle)
+        strategy.set_panel(panel, strategy.panel_range)
+    _worker_state['strategy'] = strategy
+    _worker_state['settings'] = settings
+
+
+def _run_group(configurations):
+    """
+    Runs a group of configurations sharing their signals on the worker's shared Strategy, and returns their rows.
+    The memo is cleared first, so it only ever holds the signals of one group.
+    """
+    _worker_state['strategy'].memo.clear()
+    return [_run_configuration(configuration) for configuration in configurations]
+
+
+def _run_configuration(configuration):
+    """
+    Runs one configuration of the sweep on the worker's shared Strategy and returns its row of results.
+    """
+    tickers, start_date, end_date, aum = _worker_state['settings']
+    days_1, days_2, strategy_1, strategy_2, top_pct = configuration
+    linreg = Linreg(tickers, start_date, end_date, days_1, days_2, strategy_1, strategy_2, top_pct, aum,
+                    strategy = _worker_state['strategy'])
+    statistics = PortfolioStatistics(linreg).calculate_statistics()
+
+    row = dict(zip(PARAMETER_COLUMNS, configuration))
+    for name, value in statistics.items():
+        if isinstance(value, pd.Series):
+            for parameter, parameter_value in value.items():
+                row[f'{name}: {parameter}'] = parameter_value
+        else:
+            row[name] = value
+    return row
+
+
+def parse_arguments(arguments = None):
+    """
+    Parses the sweep's command line. Every grid argument accepts a space separated list of values.
+    """
+    parser = argparse.ArgumentParser(description = 'Run the linear regression backtest over a grid of parameters.')
+    parser.add_argument('--tickers', nargs='+', type=str, help='list of tickers')
+    parser.add_argument('--b', type=str, help='start date in YYYYMMDD format')
+    parser.add_argument('--e', type=str, help='end date in YYYYMMDD format')
+    parser.add_argument('--initial_aum', type=float, help='initial assets under management')
+    parser.add_argument('--days_1', nargs='+', type=int, required=True, help='lookback days for the first strategy')
+    parser.add_argument('--days_2', nargs='+', type=int, required=True, help='lookback days for the second strategy')
+    parser.add_argument('--strategy_1', nargs='+', type=str, default=['M'], help='types of the first strategy (M or R)')
+    parser.add_argument('--strategy_2', nargs='+', type=str, default=['R'], help='types of the second strategy (M or R)')
+    parser.add_argument('--top_pct', nargs='+', type=int, required=True, help='top percentiles to select')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes (default: all CPUs)')
+    parser.add_argument('--data_dir', type=str, default=None, help='read prices from <TICKER>.csv files in this directory instead of yfinance')
+    parser.add_argument('--output', type=str, default=None, help='CSV file to write the results table to')
+    parser.add_argument('--results_dir', type=str, default=None, help='directory to stream the results table to as columnar files')
+    parser.add_argument('--results_format', type=str, default='numpy', choices=['numpy', 'parquet', 'arrow'],
+                        help='format of the files in --results_dir (default: numpy; parquet and arrow need pyarrow)')
+    args = parser.parse_args(arguments)
+
+    ArgsCheck.ticker_check(args.tickers)
+    ArgsCheck.date_check(args.b, args.e)
+    ArgsCheck.aum_check(args.initial_aum)
+    for strategy in args.strategy_1 + args.strategy_2:
+        ArgsCheck.strategy_check(strategy)
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    provider = None
+    if args.data_dir is not None:
+        provider = CsvProvider(args.data_dir)
+    sweep = Sweep(args.tickers, args.b, args.e, args.initial_aum, args.days_1, args.days_2, args.strategy_1,
+                  args.strategy_2, args.top_pct, provider = provider, processes = args.processes)
+    if args.results_dir is not None:
+        from result_writer import ResultWriter
+        with ResultWriter(args.results_dir, args.results_format) as writer:
+            results = sweep.run(writer)
+    else:
+        results = sweep.run()
+    if args.output is not None:
+        results.to_csv(args.output, index = False)
+    print(results.to_string())
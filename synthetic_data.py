@@ -0,0 +1,44 @@
+import zlib
+import numpy as np
+import pandas as pd
+import trading_calendar
+from data_provider import DataProvider, slice_dates
+
+#Every synthetic price series starts on this date, so a ticker's prices do not depend on the requested range.
+ORIGIN = '19850101'
+
+
+def synthetic_tickers(num_tickers):
+    """
+    Returns num_tickers ticker names: T0000, T0001, ...
+    """
+    return [f'T{i:04d}' for i in range(num_tickers)]
+
+
+class SyntheticProvider(DataProvider):
+    """
+    Generates deterministic random-walk OHLCV data on NYSE trading days for any ticker, so that
+    benchmarks and tests can run any universe size and period without network access.
+
+    Each ticker's daily log returns are drawn from its own random stream, seeded by the ticker name
+    and seed, with a drift and volatility of its own. The same ticker always gets the same prices.
+    """
+    def __init__(self, seed = 0, origin = ORIGIN):
+        self.seed = seed
+        self.origin = origin
+
+    def fetch(self, ticker, start_date, end_date):
+        days = trading_calendar.get_calendar('NYSE').trading_days(self.origin, pd.Timestamp(end_date))
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+        drift, volatility = rng.uniform(-0.0002, 0.0006), rng.uniform(0.005, 0.03)
+        log_returns = rng.normal(drift, volatility, (len(days), 2))
+        close = 100 * np.exp(np.cumsum(log_returns[:, 0]))
+        open_prices = close * np.exp(log_returns[:, 1] / 4)
+        data = pd.DataFrame({'Open': open_prices,
+                             'High': np.maximum(open_prices, close) * (1 + volatility / 2),
+                             'Low': np.minimum(open_prices, close) * (1 - volatility / 2),
+                             'Close': close,
+                             'Adj Close': close,
+                             'Volume': np.round(1e6 * np.exp(log_returns[:, 1])).astype(np.int64)},
+                            index = pd.DatetimeIndex(days, name = 'Date'))
+        return slice_dates(data, start_date, end_date)
@@ -0,0 +1,24 @@
+import pytest
+"""
+Shared test options and fixtures. Tests marked benchmark check wall-clock timings, which depend on the
+machine and its load, so they only run with --benchmark. Every test saves trading calendars and cached
+prices under its own temporary directory instead of ~/.bloopberg.
+"""
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action = 'store_true', default = False, help = 'also run the wall-clock benchmarks')
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: wall-clock timing check, only run with --benchmark')
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+    skip = pytest.mark.skip(reason = 'wall-clock benchmark, run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture(autouse = True)
+def bloopberg_dirs(tmp_path, monkeypatch):
+    monkeypatch.setenv('BLOOPBERG_CALENDAR_DIR', str(tmp_path / 'calendars'))
+    monkeypatch.setenv('BLOOPBERG_CACHE_DIR', str(tmp_path / 'cache'))
@@ -121,4 +121,20 @@ def test_date_check_normal():
     date1 = '20230203'
     date2 = '20230303'
     output = ArgsCheck.date_check(date1, date2)
-    assert output == 1
\ No newline at end of file
+    assert output == 1
+def test_training_window_check():
+    #Check that only 'expanding' or a positive number of months is accepted.
+    ArgsCheck.training_window_check('expanding')
+    ArgsCheck.training_window_check('12')
+    for training_window in ['0', '-3', 'rolling', '1.5']:
+        with pytest.raises(SystemExit) as sample:
+            ArgsCheck.training_window_check(training_window)
+        assert sample.value.code == 'Error: Training window must be a number of months greater than 0 or expanding.'
+def test_frequency_check():
+    #Check that only a calendar rebalance frequency or a positive number of trading days is accepted.
+    for frequency in ['daily', 'weekly', 'monthly', 'quarterly', '5']:
+        ArgsCheck.frequency_check(frequency)
+    for frequency in ['0', 'yearly', '2.5']:
+        with pytest.raises(SystemExit) as sample:
+            ArgsCheck.frequency_check(frequency)
+        assert sample.value.code == 'Error: Frequency must be daily, weekly, monthly, quarterly or a number of trading days greater than 0.'
@@ -0,0 +1,34 @@
+import sys
+import pytest
+import pandas as pd
+sys.path.append('../')
+from backtest_result import BacktestResult
+"""
+Tests the result object returned by Linreg.perform_strategy.
+"""
+def make_result():
+    dates = pd.bdate_range('2021-01-01', periods = 4)
+    top_stocks = pd.DataFrame({'Stock': ['A'], 'Return_actual': [0.21]})
+    aum_history = pd.Series([121.0], index = dates[-1:])
+    holdings = pd.DataFrame([[1.0]], index = dates[:1], columns = ['A'])
+    equity_curve = pd.Series([100.0, 110.0, 99.0, 121.0], index = dates)
+    return BacktestResult(100.0, top_stocks, aum_history, holdings, equity_curve)
+
+def test_final_aum():
+    #Check that the final AUM is the last monthly AUM, or the initial AUM without any month.
+    result = make_result()
+    assert result.final_aum == 121.0
+    empty = BacktestResult(100.0, pd.DataFrame(), pd.Series(dtype = float), pd.DataFrame(), pd.Series(dtype = float))
+    assert empty.final_aum == 100.0
+
+def test_daily_returns():
+    #Check that daily returns are taken from the equity curve, starting from the initial AUM.
+    returns = make_result().daily_returns
+    assert returns.to_numpy() == pytest.approx([0.0, 0.1, -0.1, 121 / 99 - 1])
+    assert len(make_result().daily_returns.index) == 4
+
+def test_unpacking():
+    #Check that the result unpacks like the old (final AUM, top stocks) tuple.
+    aum, top_stocks = make_result()
+    assert aum == 121.0
+    assert list(top_stocks['Stock']) == ['A']
@@ -0,0 +1,33 @@
+import sys
+import json
+import pytest
+sys.path.append('../')
+from benchmark import STAGES, Benchmark, compare, run_benchmarks
+"""
+Tests the offline benchmark suite on a tiny synthetic universe.
+"""
+def test_run_benchmarks(tmp_path):
+    #Check that every stage of every case is timed and the results can be saved as JSON.
+    results = run_benchmarks([4], [1], top_pct = 50)
+    assert [row['stage'] for row in results['results']] == STAGES
+    assert all(row['tickers'] == 4 and row['years'] == 1 and row['seconds'] > 0 for row in results['results'])
+    assert 'numpy' in results['environment']
+    path = tmp_path / 'results.json'
+    path.write_text(json.dumps(results))
+    assert json.loads(path.read_text())['results'] == results['results']
+
+def test_compare():
+    #Check the speedup against a baseline run, and NaN for cases the baseline does not have.
+    baseline = {'results': [{'tickers': 4, 'years': 1, 'stage': 'load_panel', 'seconds': 2.0}]}
+    current = {'results': [{'tickers': 4, 'years': 1, 'stage': 'load_panel', 'seconds': 0.5},
+                           {'tickers': 8, 'years': 1, 'stage': 'load_panel', 'seconds': 1.0}]}
+    comparison = compare(current, baseline)
+    assert comparison['speedup'].iloc[0] == 4.0
+    assert comparison['speedup'].isna().iloc[1]
+
+def test_short_period():
+    #Check that a period without two month-ends is rejected.
+    benchmark = Benchmark(4, 1)
+    benchmark.start_date = '20221201'
+    with pytest.raises(ValueError):
+        benchmark.run()
@@ -0,0 +1,93 @@
+import sys
+import time
+import numpy as np
+import pytest
+sys.path.append('../')
+import bootstrap
+"""
+Tests the block bootstrap and random portfolio resampling of backtest returns.
+"""
+
+def test_block_bootstrap_indices():
+    #Check that every resample is made of consecutive blocks that wrap around the end.
+    positions = bootstrap.block_bootstrap_indices(10, 50, 4, np.random.default_rng(0))
+    assert positions.shape == (50, 10)
+    blocks = positions[:, :8].reshape(50, 2, 4)
+    assert (np.diff(blocks, axis = 2) % 10 == 1).all()
+    assert positions.min() >= 0 and positions.max() < 10
+
+def test_block_bootstrap_chunks():
+    #Check that a seed gives the same resamples whatever the memory cap, and the observed statistics.
+    returns = np.random.default_rng(1).normal(0.001, 0.01, 250)
+    small = bootstrap.block_bootstrap(returns, 500, 10, 100.0, seed = 3, memory_cap = 10 ** 5)
+    large = bootstrap.block_bootstrap(returns, 500, 10, 100.0, seed = 3)
+    assert np.array_equal(small.sharpe, large.sharpe)
+    assert np.array_equal(small.final_aum, large.final_aum)
+    assert small.observed_final_aum == pytest.approx(100 * np.prod(1 + returns))
+    assert small.observed_sharpe == pytest.approx((returns.mean() - 0.0001) / returns.std(ddof = 1))
+    #A block as long as the series only rotates it, which keeps the final AUM.
+    rotated = bootstrap.block_bootstrap(returns, 20, 250, 100.0, seed = 3)
+    assert rotated.final_aum == pytest.approx(np.full(20, rotated.observed_final_aum))
+
+def test_block_bootstrap_large():
+    #Check that 10,000 resamples of ten years of daily returns all give a finite Sharpe ratio and a positive final AUM.
+    returns = np.random.default_rng(2).normal(0.0005, 0.01, 2520)
+    result = bootstrap.block_bootstrap(returns, 10000, 20, seed = 0)
+    assert len(result) == 10000
+    assert np.isfinite(result.sharpe).all()
+    assert np.isfinite(result.final_aum).all()
+    assert (result.final_aum > 0).all()
+
+@pytest.mark.benchmark
+def test_block_bootstrap_time():
+    #Check that 10,000 resamples of ten years of daily returns take seconds.
+    returns = np.random.default_rng(2).normal(0.0005, 0.01, 2520)
+    start = time.perf_counter()
+    bootstrap.block_bootstrap(returns, 10000, 20, seed = 0)
+    assert time.perf_counter() - start < 5
+
+def test_random_subsets():
+    #Check that subsets hold distinct positions below their size, and every position when the size is at most k.
+    picks = bootstrap.random_subsets(np.random.default_rng(0), [6, 3, 40], 4, 2000)
+    assert picks.shape == (2000, 3, 4)
+    assert (np.diff(picks, axis = 2) > 0).all()
+    assert picks[:, 0].max() < 6 and picks[:, 2].max() < 40
+    assert (picks[:, 1] == np.arange(4)).all()
+    #Every position is about as likely.
+    counts = np.bincount(picks[:, 0].ravel(), minlength = 6)
+    assert counts / counts.sum() == pytest.approx(np.full(6, 1 / 6), abs = 0.02)
+
+def test_random_portfolios():
+    #Check random portfolios against holding every available stock, and against a single stock.
+    period_returns = np.array([[0.1, np.nan, 0.3], [0.0, 0.2, np.nan], [np.nan, np.nan, 0.05]])
+    every = bootstrap.random_portfolios(period_returns, 3, 10, 1.0, seed = 0, observed_returns = [0.2, 0.1, 0.05])
+    assert every.final_aum == pytest.approx(np.full(10, 1.2 * 1.1 * 1.05))
+    assert every.observed_final_aum == pytest.approx(1.2 * 1.1 * 1.05)
+    single = bootstrap.random_portfolios(period_returns, 1, 1000, 1.0, seed = 0)
+    possible = [(1 + first) * (1 + second) * 1.05 for first in [0.1, 0.3] for second in [0.0, 0.2]]
+    assert set(np.round(single.final_aum, 9)) == set(np.round(possible, 9))
+
+def test_p_value():
+    #Check that the p-value counts the observation itself.
+    assert bootstrap.ResamplingResult.p_value([1, 2, 3], 2.5) == 2 / 4
+    assert bootstrap.ResamplingResult.p_value([1, 2, 3], 10) == 1 / 4
+
+def test_block_bootstrap_p_values():
+    #Check that the p-values test against no excess return: small for a clear positive drift, large for none.
+    drift = bootstrap.block_bootstrap(np.random.default_rng(4).normal(0.003, 0.01, 500), 2000, 20, seed = 0).summary()
+    assert drift['Sharpe p-value'] < 0.01
+    assert drift['Final AUM p-value'] < 0.01
+    returns = np.random.default_rng(4).normal(0.003, 0.01, 500)
+    none = bootstrap.block_bootstrap(returns - returns.mean() + 0.0001, 2000, 20, seed = 0).summary()
+    assert 0.2 < none['Sharpe p-value'] < 0.8
+
+def test_resample_backtest():
+    #Check that a backtest is compared with resamples that start from its initial AUM.
+    from equivalence import FIXTURE_FINAL_AUM, fixture_case
+    from linreg import Linreg
+    linreg = Linreg(**fixture_case())
+    results = bootstrap.resample_backtest(linreg, 200, seed = 0)
+    for result in results.values():
+        assert len(result) == 200
+        assert result.observed_final_aum == pytest.approx(FIXTURE_FINAL_AUM)
+        assert 0 < result.summary()['Final AUM p-value'] <= 1
@@ -0,0 +1,40 @@
+import sys
+import pandas as pd
+sys.path.append('../')
+from checkpoint import BacktestCheckpoint
+"""
+Tests saving, loading and matching backtest checkpoints.
+"""
+SETTINGS = {'tickers': ['SPY', 'AAPL'], 'start_date': '20200601', 'top_pct': 50}
+DATES = list(pd.to_datetime(['2020-06-30', '2020-07-31', '2020-08-31']))
+
+def make_checkpoint():
+    return BacktestCheckpoint(SETTINGS, DATES, 110.0, pd.DataFrame({'Stock': ['SPY', 'AAPL']}),
+                              pd.Series([105.0, 110.0], index = DATES[1:]), [[1.0, 0.0], [0.0, 1.0]],
+                              pd.Series(dtype = float), [], None, None)
+
+def test_save_and_load(tmp_path):
+    #Check that a saved checkpoint loads with the same state.
+    path = str(tmp_path / 'state' / 'checkpoint.pkl')
+    make_checkpoint().save(path)
+    checkpoint = BacktestCheckpoint.load(path)
+    assert checkpoint.months == 2
+    assert checkpoint.aum == 110.0
+    assert checkpoint.last_rebalance_date == pd.Timestamp('2020-08-31')
+    assert checkpoint.top_stocks['Stock'].tolist() == ['SPY', 'AAPL']
+
+def test_load_missing_or_corrupt(tmp_path):
+    #Check that a missing or unreadable checkpoint loads as None.
+    path = tmp_path / 'checkpoint.pkl'
+    assert BacktestCheckpoint.load(str(path)) is None
+    path.write_bytes(b'not a pickle')
+    assert BacktestCheckpoint.load(str(path)) is None
+
+def test_matches():
+    #Check that a checkpoint only matches the same settings and rebalance dates that start with its own.
+    checkpoint = make_checkpoint()
+    assert checkpoint.matches(dict(SETTINGS), DATES + [pd.Timestamp('2020-09-30')])
+    assert checkpoint.matches(dict(SETTINGS), DATES)
+    assert not checkpoint.matches(dict(SETTINGS, top_pct = 10), DATES)
+    assert not checkpoint.matches(dict(SETTINGS), DATES[:2])
+    assert not checkpoint.matches(dict(SETTINGS), DATES[:2] + [pd.Timestamp('2020-08-14')])
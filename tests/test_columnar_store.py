@@ -0,0 +1,63 @@
+import sys
+import pytest
+import numpy as np
+sys.path.append('../')
+from columnar_store import ColumnarStore
+from equivalence import FIXTURE_FINAL_AUM, fixture_case
+from linreg import Linreg
+from stock_strategy import Strategy
+"""
+Tests the memory-mapped columnar price store on the saved SPY and AAPL data.
+"""
+
+def make_store(directory, dtype = 'float64'):
+    return ColumnarStore.build(str(directory), fixture_case()['provider'], ['SPY', 'AAPL'], '20180101', '20210301', dtype = dtype)
+
+def test_store_matches_provider(tmp_path):
+    #Check that a reopened store gives back the same data as the provider it was built from.
+    make_store(tmp_path)
+    store = ColumnarStore(str(tmp_path))
+    assert store.tickers == ['SPY', 'AAPL']
+    expected = fixture_case()['provider'].fetch('AAPL', '20200101', '20200201')
+    data = store.fetch('AAPL', '20200101', '20200201')
+    assert list(data.index) == list(expected.index)
+    assert np.allclose(data['Close'].to_numpy(), expected['Close'].to_numpy())
+    assert len(store.fetch('SPY', '20180101', '20180201')) == 21
+    #AAPL has no prices before 2020, so those dates are left out.
+    assert len(store.fetch('AAPL', '20180101', '20180201')) == 0
+
+def test_load_panel_is_memory_mapped(tmp_path):
+    #Check that panels are views of the mapped file rather than copies.
+    store = make_store(tmp_path)
+    panel = store.load_panel(['AAPL'], '20200101', '20200201')
+    assert len(panel) == 21
+    assert np.shares_memory(panel.close, store.field('Close'))
+    assert panel.column_indices(['AAPL']).tolist() == [1]
+
+def test_strategy_panel_is_memory_mapped(tmp_path):
+    #Check that a Strategy's preloaded panel and its feature store read the mapped file without copying it.
+    store = make_store(tmp_path)
+    strategy = Strategy(['SPY', 'AAPL'], '20200601', '20210129', 30, 'M', 50, provider = store)
+    strategy.load_panel('20200601', '20210129', ['SPY', 'AAPL'])
+    assert np.shares_memory(strategy.panel.close, store.field('Close'))
+    assert strategy.feature_store.panel is strategy.panel
+    assert np.isfinite(strategy.feature_tensor(['20201030'], [(30, 'M'), (60, 'R')], ['SPY', 'AAPL'])).all()
+
+def test_load_panel_missing_ticker(tmp_path):
+    #Check that tickers missing from the store get NaN prices.
+    store = make_store(tmp_path)
+    panel = store.load_panel(['AAPL', 'NOPE'], '20200101', '20200201')
+    assert panel.tickers == ['SPY', 'AAPL', 'NOPE']
+    assert np.isnan(panel.close[:, 2]).all()
+
+def test_float32(tmp_path):
+    #Check that a float32 store is kept as float32 in the panel.
+    store = make_store(tmp_path, 'float32')
+    assert store.field('Close').dtype == np.float32
+    assert store.load_panel(['SPY'], '20200101', '20200201').close.dtype == np.float32
+
+def test_linreg_reads_store(tmp_path):
+    #Check that a backtest on the store gives the same result as on the CSV files.
+    store = make_store(tmp_path)
+    linreg = Linreg(**{**fixture_case(), 'provider': store})
+    assert linreg.perform_strategy().final_aum == pytest.approx(FIXTURE_FINAL_AUM)
@@ -0,0 +1,120 @@
+import sys
+import os
+import pytest
+import pandas as pd
+sys.path.append('../')
+from data_cache import DataCache
+from data_provider import DataProvider
+"""
+Tests the on-disk DataCache using the SPY data we saved in getdata_spy.csv as a
+stand-in for the yf API, so that no network access is needed.
+"""
+SPY = pd.read_csv(os.path.join(os.path.dirname(__file__), 'getdata_spy.csv'), index_col = 0, parse_dates = True)
+
+class FakeDownload(DataProvider):
+    """
+    Records every upstream request and serves rows of the saved SPY data for any ticker.
+    """
+    def __init__(self):
+        self.requests = []
+
+    def fetch(self, ticker, start_date, end_date):
+        self.requests.append((ticker, pd.Timestamp(start_date), pd.Timestamp(end_date)))
+        return SPY.loc[(SPY.index >= start_date) & (SPY.index < end_date)]
+
+    def fetch_many(self, tickers, start_date, end_date):
+        self.requests.append((tuple(tickers), pd.Timestamp(start_date), pd.Timestamp(end_date)))
+        return {ticker: SPY.loc[(SPY.index >= start_date) & (SPY.index < end_date)] for ticker in tickers}
+
+def test_cache_first_request_downloads(tmp_path):
+    #Check that a cold cache downloads the full range exactly once.
+    download = FakeDownload()
+    cache = DataCache(str(tmp_path), download)
+    data = cache.fetch('SPY', '2020-01-01', '2020-07-01')
+    assert len(download.requests) == 1
+    assert data.index[0] == pd.Timestamp('2020-01-02')
+    assert data.index[-1] == pd.Timestamp('2020-06-30')
+
+def test_cache_hit_no_download(tmp_path):
+    #Check that a range inside the cached range does not hit upstream again.
+    download = FakeDownload()
+    cache = DataCache(str(tmp_path), download)
+    cache.fetch('SPY', '2020-01-01', '2020-07-01')
+    data = cache.fetch('SPY', '2020-02-01', '2020-03-01')
+    assert len(download.requests) == 1
+    expected = SPY.loc['2020-02-01':'2020-02-29']
+    assert data['Close'].tolist() == expected['Close'].tolist()
+
+def test_cache_fetches_only_missing_head_and_tail(tmp_path):
+    #Check that an overlapping request only downloads the missing head and tail.
+    download = FakeDownload()
+    cache = DataCache(str(tmp_path), download)
+    cache.fetch('SPY', '2020-03-01', '2020-05-01')
+    data = cache.fetch('SPY', '2020-01-01', '2020-07-01')
+    assert download.requests[1:] == [(('SPY',), pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-01')),
+                                     (('SPY',), pd.Timestamp('2020-05-01'), pd.Timestamp('2020-07-01'))]
+    expected = SPY.loc['2020-01-01':'2020-06-30']
+    assert data['Close'].tolist() == expected['Close'].tolist()
+
+def test_cache_persists_between_instances(tmp_path):
+    #Check that a new DataCache on the same directory reuses what was saved to disk.
+    cache = DataCache(str(tmp_path), FakeDownload())
+    cache.fetch('SPY', '2020-01-01', '2020-07-01')
+    download = FakeDownload()
+    data = DataCache(str(tmp_path), download).fetch('SPY', '2020-01-01', '2020-07-01')
+    assert download.requests == []
+    assert len(data) == len(SPY.loc['2020-01-01':'2020-06-30'])
+
+def test_cache_clear(tmp_path):
+    #Check that clearing a ticker removes its data and coverage.
+    cache = DataCache(str(tmp_path), FakeDownload())
+    cache.fetch('SPY', '2020-01-01', '2020-07-01')
+    cache.clear('SPY')
+    assert cache.coverage('SPY') == None
+    assert not os.path.exists(os.path.join(str(tmp_path), 'SPY.csv'))
+
+def test_cache_batches_missing_ranges(tmp_path):
+    #Check that tickers missing the same range are fetched from the provider in one call.
+    download = FakeDownload()
+    cache = DataCache(str(tmp_path), download)
+    cache.fetch('SPY', '2020-01-01', '2020-07-01')
+    data = cache.fetch_many(['SPY', 'AAA', 'BBB'], '2020-01-01', '2020-07-01')
+    assert download.requests[1:] == [(('AAA', 'BBB'), pd.Timestamp('2020-01-01'), pd.Timestamp('2020-07-01'))]
+    assert sorted(data) == ['AAA', 'BBB', 'SPY']
+    assert len(data['AAA']) == len(data['SPY'])
+
+def test_cache_writes_index_once(tmp_path, monkeypatch):
+    #Check that one fetch_many writes index.json once for all its tickers, and nothing when every ticker is cached.
+    cache = DataCache(str(tmp_path), FakeDownload())
+    writes = []
+    write_index = cache._write_index
+    monkeypatch.setattr(cache, '_write_index', lambda index: writes.append(dict(index)) or write_index(index))
+    tickers = [f'T{i}' for i in range(20)]
+    cache.fetch_many(tickers, '2020-01-01', '2020-07-01')
+    assert len(writes) == 1 and sorted(writes[0]) == sorted(tickers)
+    cache.fetch_many(tickers, '2020-02-01', '2020-03-01')
+    assert len(writes) == 1
+    assert DataCache(str(tmp_path), FakeDownload()).coverage('T19') == (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-07-01'))
+    assert not os.path.exists(os.path.join(str(tmp_path), 'index.json.tmp'))
+
+def test_cache_failed_fetch_not_covered(tmp_path):
+    #Check that a ticker the provider failed to fetch is not recorded as cached.
+    class FailingDownload(FakeDownload):
+        def fetch_many(self, tickers, start_date, end_date):
+            data = FakeDownload.fetch_many(self, tickers, start_date, end_date)
+            data.pop('BAD')
+            return data
+    cache = DataCache(str(tmp_path), FailingDownload())
+    data = cache.fetch_many(['SPY', 'BAD'], '2020-01-01', '2020-07-01')
+    assert data['BAD'].empty
+    assert cache.coverage('BAD') == None
+    assert cache.coverage('SPY') == (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-07-01'))
+
+def test_getdata_reads_through_cache():
+    #Check that Getdata without a provider reads from the default cache instead of the yf API.
+    from getdata import Getdata
+    DataCache(provider = FakeDownload()).fetch('SPY', '2020-01-01', '2020-07-01')
+    getdata = Getdata('20200201', '20200601', 'SPY')
+    assert isinstance(getdata.provider, DataCache)
+    assert getdata.provider.upstream_calls == 0
+    assert getdata.get_first_last_trading_days() == [pd.Timestamp('2020-02-03'), pd.Timestamp('2020-05-29')]
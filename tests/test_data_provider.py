@@ -0,0 +1,101 @@
+import sys
+import os
+import types
+import numpy as np
+import pytest
+import pandas as pd
+sys.path.append('../')
+from data_provider import CsvProvider, DataProvider, YahooProvider
+from getdata import Getdata
+from stock_strategy import Strategy
+"""
+Tests the offline CsvProvider on the files we previously downloaded from yfinance,
+and that Getdata and Strategy read their data through a provider.
+"""
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def make_provider():
+    return CsvProvider(TEST_DIR, 'getdata_{lower}.csv')
+
+def test_csv_provider_iso_dates():
+    #Check that the ISO dates in getdata_spy.csv are parsed and sliced as [start, end).
+    data = make_provider().fetch('SPY', '20230101', '20230201')
+    assert data.index[0] == pd.Timestamp('2023-01-03')
+    assert data.index[-1] == pd.Timestamp('2023-01-31')
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+def test_csv_provider_day_first_dates():
+    #Check that the D/M/YY dates in getdata_aapl.csv are read day first.
+    data = make_provider().fetch('AAPL', '20200101', '20200201')
+    assert data.index[0] == pd.Timestamp('2020-01-02')
+    assert data.index[-1] == pd.Timestamp('2020-01-31')
+    assert data.index.is_monotonic_increasing
+
+def test_csv_provider_fetch_many():
+    #Check that the batched call returns one DataFrame per ticker, and an empty one for unknown tickers.
+    data = make_provider().fetch_many(['SPY', 'AAPL', 'NOPE'], '20200101', '20200201')
+    assert sorted(data) == ['AAPL', 'NOPE', 'SPY']
+    assert len(data['SPY']) == len(data['AAPL']) == 21
+    assert data['NOPE'].empty
+
+def test_getdata_with_provider():
+    #Check that Getdata works offline when given a provider.
+    expected = ['2020-01-02 00:00:00', '2021-02-02 00:00:00']
+    downloaded = Getdata('20200101', '20210203', 'AAPL', provider = make_provider()).get_first_last_trading_days()
+    assert expected == [str(i) for i in downloaded]
+
+def test_strategy_uses_batched_provider():
+    #Check that Strategy loads all tickers through a single fetch_many call.
+    class CountingProvider(DataProvider):
+        def __init__(self):
+            self.inner = make_provider()
+            self.calls = []
+        def fetch(self, ticker, start_date, end_date):
+            self.calls.append(ticker)
+            return self.inner.fetch(ticker, start_date, end_date)
+        def fetch_many(self, tickers, start_date, end_date):
+            self.calls.append(tuple(tickers))
+            return self.inner.fetch_many(tickers, start_date, end_date)
+
+    provider = CountingProvider()
+    x = Strategy(['SPY', 'AAPL'], '20201201', '20201231', 30, 'M', 50, provider = provider)
+    result = x.run_strategy('20201201', '20201231', 30, 'M', ['SPY', 'AAPL'])
+    assert provider.calls == [('SPY', 'AAPL')]
+    assert result['Stock'].tolist() == ['SPY', 'AAPL']
+    assert (result['Return'] != 0).sum() == 1
+
+def fake_yfinance(monkeypatch):
+    """
+    Installs a stand-in for yfinance returning the saved SPY and AAPL data the way the real one does: adjusted
+    prices without an Adj Close column unless auto_adjust is False, and extra columns from Ticker.history.
+    """
+    def frame(ticker, start, end, auto_adjust):
+        data = make_provider().fetch(ticker, start, end)
+        if auto_adjust:
+            data = data.drop(columns = ['Adj Close'])
+        return data
+
+    class Ticker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+        def history(self, start, end, auto_adjust = True):
+            data = frame(self.ticker, start, end, auto_adjust)
+            data['Dividends'] = 0.0
+            data.index = data.index.tz_localize('America/New_York')
+            return data
+
+    def download(tickers, start, end, group_by = 'column', auto_adjust = True):
+        return pd.concat({ticker: frame(ticker, start, end, auto_adjust) for ticker in tickers}, axis = 1)
+
+    monkeypatch.setitem(sys.modules, 'yfinance', types.SimpleNamespace(Ticker = Ticker, download = download))
+
+def test_yahoo_fetch_many_matches_fetch(monkeypatch):
+    #Check that the batched yf.download and the per-ticker yf.Ticker paths return the same unadjusted columns.
+    fake_yfinance(monkeypatch)
+    provider = YahooProvider()
+    data = provider.fetch_many(['SPY', 'AAPL'], '20200101', '20200201')
+    for ticker in ['SPY', 'AAPL']:
+        single = provider.fetch(ticker, '20200101', '20200201')
+        assert list(single.columns) == list(data[ticker].columns) == YahooProvider.COLUMNS
+        assert data[ticker].index.equals(single.index)
+        assert np.array_equal(data[ticker].to_numpy(), single.to_numpy())
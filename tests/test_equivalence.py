@@ -0,0 +1,60 @@
+import sys
+import copy
+import pytest
+sys.path.append('../')
+from equivalence import ENGINES, ReferenceBacktest, compare, fixture_case, run_equivalence, synthetic_case
+from linreg import Linreg
+"""
+Tests the differential harness checking the optimized backtest engines against the reference backtest.
+"""
+def test_fixtures():
+    #Check that every engine matches the reference on the SPY and AAPL fixtures.
+    results = run_equivalence({'fixtures': fixture_case()})
+    assert results['engine'].tolist() == list(ENGINES)
+    assert results['passed'].all()
+    assert (results['speedup'] > 0).all()
+
+def test_synthetic_training_windows():
+    #Check the engines on a synthetic universe with rolling and expanding training windows and weekly rebalancing.
+    cases = {'rolling': synthetic_case(12, 1, top_pct = 25, training_window = 3),
+             'expanding': synthetic_case(12, 1, top_pct = 25, training_window = 'expanding'),
+             'weekly': synthetic_case(8, 1, end_date = '20220630', top_pct = 25, frequency = 'weekly')}
+    results = run_equivalence(cases, {'vectorized': {}})
+    assert results['passed'].all()
+
+def test_reference_is_independent(monkeypatch):
+    #Check that a fault in a fast kernel is caught: the reference does not select stocks with selection.top_k_mask.
+    import stock_strategy
+    from selection import top_k_mask
+    monkeypatch.setattr(stock_strategy, 'top_k_mask', lambda scores, k, largest: top_k_mask(scores, k, not largest))
+    results = run_equivalence({'fixtures': fixture_case()}, {'vectorized': {}})
+    assert not results['passed'].any()
+
+def test_compare_finds_differences():
+    #Check that a different final AUM and a different selection are reported.
+    settings = fixture_case()
+    reference_backtest = ReferenceBacktest(settings)
+    reference = reference_backtest.run()
+    result = Linreg(**settings).perform_strategy()
+    assert compare(reference, reference_backtest.predictions, result)['passed']
+
+    changed = copy.deepcopy(result)
+    changed.aum_history.iloc[-1] *= 1.01
+    assert compare(reference, reference_backtest.predictions, changed)['aum_error'] > 0.009
+
+    changed = copy.deepcopy(result)
+    changed.top_stocks.loc[0, 'Stock'] = 'SPY' if result.top_stocks.loc[0, 'Stock'] == 'AAPL' else 'AAPL'
+    comparison = compare(reference, reference_backtest.predictions, changed)
+    assert comparison['selection_mismatches'] == 1
+    assert not comparison['passed']
+
+def test_empty_months_hold_cash():
+    #Check that months without any stock to hold keep the AUM flat, like the reference, instead of turning it into NaN.
+    settings = {**fixture_case(), 'start_date': '20200901', 'end_date': '20210630'}
+    reference_aum, _ = ReferenceBacktest(settings).run()
+    result = Linreg(**settings).perform_strategy()
+    assert (result.holdings.sum(axis = 1) == 0).any()
+    assert result.final_aum == pytest.approx(reference_aum)
+    assert not result.aum_history.isna().any()
+    assert not result.equity_curve.isna().any()
+    assert run_equivalence({'empty months': settings})['passed'].all()
@@ -0,0 +1,78 @@
+import sys
+import pytest
+import numpy as np
+sys.path.append('../')
+from equivalence import FIXTURE_FINAL_AUM, fixture_case
+from feature_store import FeatureStore, signal_horizon, horizon_family
+from synthetic_data import SyntheticProvider, synthetic_tickers
+"""
+Tests lookback returns read from the feature store against the price panel's.
+"""
+TICKERS = synthetic_tickers(20)
+
+def make_panel():
+    panel = SyntheticProvider().load_panel(TICKERS, '20190101', '20211231')
+    panel.close[100:110, 3] = np.nan
+    return panel
+
+def test_matches_price_panel():
+    #Check every signal against PricePanel.lookback_returns, including missing prices.
+    panel = make_panel()
+    store = FeatureStore(panel)
+    dates = panel.dates[::15]
+    for days, strategy in [(5, 'R'), (30, 'M'), (60, 'R'), (250, 'M')]:
+        expected = panel.lookback_returns(dates, days, strategy, TICKERS[::-1])
+        returns = store.lookback_returns(dates, *signal_horizon(days, strategy), TICKERS[::-1])
+        assert np.array_equal(np.isnan(returns), np.isnan(expected))
+        assert returns[~np.isnan(returns)] == pytest.approx(expected[~np.isnan(expected)], rel = 1e-12)
+
+def test_tensor():
+    #Check that the tensor holds one feature per horizon, in order.
+    panel = make_panel()
+    store = FeatureStore(panel)
+    signals = horizon_family(range(5, 255, 5))
+    assert len(signals) == 100 and signals[0] == (5, 'M') and signals[-1] == (250, 'R')
+    dates = panel.dates[300::21]
+    tensor = store.tensor(dates, [signal_horizon(days, strategy) for days, strategy in signals])
+    assert tensor.shape == (len(dates), len(TICKERS), 100)
+    expected = panel.lookback_returns(dates, 120, 'R')
+    assert tensor[:, :, signals.index((120, 'R'))] == pytest.approx(expected, rel = 1e-12)
+
+def test_first_date_and_unknown_dates():
+    #Check that lookbacks starting before first_date, and dates not in the index, are NaN.
+    panel = make_panel()
+    store = FeatureStore(panel)
+    date = panel.dates[150]
+    assert not np.isnan(store.lookback_returns([date], 50, 0, TICKERS[4:], first_date = panel.dates[100])).any()
+    assert np.isnan(store.lookback_returns([date], 50, 0, first_date = panel.dates[101])).all()
+    assert np.isnan(store.lookback_returns(['20190105'], 5, 0)).all()
+
+def test_log_prices_per_ticker():
+    #Check that each ticker's log prices are taken once, by the first query that reads it, and reused after.
+    panel = make_panel()
+    store = FeatureStore(panel)
+    assert not store.has_log_close.any()
+    first = store.lookback_returns(panel.dates[::30], 20, 0, TICKERS[2:4])
+    assert store.has_log_close.tolist() == [i in (2, 3) for i in range(len(TICKERS))]
+    assert np.array_equal(store.log_close[:, 2], np.log(panel.close[:, 2]), equal_nan = True)
+    panel.close[:, 2] = 1.0
+    assert np.array_equal(store.lookback_returns(panel.dates[::30], 20, 0, TICKERS[2:4]), first, equal_nan = True)
+
+def test_linreg_signals():
+    #Check a regression on more than two signals, and refitting any subset without reading prices again.
+    import pandas as pd
+    from linreg import Linreg
+    signals = [(30, 'M'), (60, 'R'), (10, 'R'), (90, 'M')]
+    linreg = Linreg(**fixture_case(), signals = signals)
+    linreg.perform_strategy()
+    frame = linreg.training_frames[0]
+    assert list(frame.columns) == ['Stock', 'Return_strategy_1', 'Return_strategy_2', 'Return_strategy_3', 'Return_strategy_4', 'Return_actual']
+    assert linreg.monthly_models.params.shape == (7, 5)
+    model = linreg.fit_model(['Return_strategy_3'])
+    assert list(model.params.index) == ['const', 'Return_strategy_3']
+
+    #The first two signals give the same backtest as the default two strategies.
+    default = Linreg(**fixture_case(), signals = signals, regressors = ['Return_strategy_1', 'Return_strategy_2'])
+    assert default.perform_strategy().final_aum == pytest.approx(FIXTURE_FINAL_AUM)
+    with pytest.raises(ValueError):
+        Linreg(**fixture_case(), regressors = ['Return_strategy_3'])
@@ -0,0 +1,96 @@
+import sys
+import os
+import threading
+import time
+import pytest
+import pandas as pd
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+sys.path.append('../')
+from data_provider import DataProvider, HttpCsvProvider
+from fetcher import ConcurrentFetcher, RateLimiter, is_retryable
+"""
+Tests concurrent fetching against a local HTTP server that serves the saved price files,
+standing in for a remote data source.
+"""
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class FlakyHandler(SimpleHTTPRequestHandler):
+    """
+    Serves files from the tests directory, but answers the first request for any path
+    listed in `flaky` with a 503 error.
+    """
+    flaky = set()
+    failed = set()
+
+    def do_GET(self):
+        if self.path in self.flaky and self.path not in self.failed:
+            self.failed.add(self.path)
+            self.send_error(503)
+            return
+        SimpleHTTPRequestHandler.do_GET(self)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    FlakyHandler.flaky = set()
+    FlakyHandler.failed = set()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), partial(FlakyHandler, directory = TEST_DIR))
+    thread = threading.Thread(target = httpd.serve_forever, daemon = True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_fetch_many_concurrently(server):
+    #Check that several tickers are fetched and match the saved files.
+    fetcher = ConcurrentFetcher(HttpCsvProvider(server, 'getdata_{lower}.csv'), max_workers = 4)
+    data = fetcher.fetch_many(['SPY', 'AAPL'], '20200101', '20200201')
+    assert sorted(data) == ['AAPL', 'SPY']
+    assert len(data['SPY']) == len(data['AAPL']) == 21
+    assert fetcher.failures == {}
+
+def test_missing_ticker_is_isolated(server):
+    #Check that a missing symbol is skipped without retries and without aborting the other tickers.
+    fetcher = ConcurrentFetcher(HttpCsvProvider(server, 'getdata_{lower}.csv'), max_workers = 4, backoff = 0)
+    data = fetcher.fetch_many(['SPY', 'NOPE', 'AAPL'], '20200101', '20200201')
+    assert sorted(data) == ['AAPL', 'SPY']
+    assert list(fetcher.failures) == ['NOPE']
+    assert fetcher.requests == 3
+
+def test_retry_after_server_error(server):
+    #Check that a 503 is retried and the ticker is still fetched.
+    FlakyHandler.flaky = {'/getdata_spy.csv'}
+    fetcher = ConcurrentFetcher(HttpCsvProvider(server, 'getdata_{lower}.csv'), backoff = 0.01)
+    data = fetcher.fetch_many(['SPY'], '20200101', '20200201')
+    assert len(data['SPY']) == 21
+    assert fetcher.requests == 2
+
+def test_retry_after_yfinance_rate_limit():
+    #Check that yfinance's rate limit error is retried, unlike its other errors.
+    exceptions = pytest.importorskip('yfinance.exceptions')
+    assert is_retryable(exceptions.YFRateLimitError())
+    assert not is_retryable(exceptions.YFTickerMissingError('NOPE', 'no data'))
+
+    class RateLimitedProvider(DataProvider):
+        def __init__(self):
+            self.calls = 0
+        def fetch(self, ticker, start_date, end_date):
+            self.calls += 1
+            if self.calls == 1:
+                raise exceptions.YFRateLimitError()
+            return pd.DataFrame({'Close': [1.0]})
+    fetcher = ConcurrentFetcher(RateLimitedProvider(), backoff = 0.01)
+    data = fetcher.fetch_many(['SPY'], '20200101', '20200201')
+    assert len(data['SPY']) == 1
+    assert fetcher.requests == 2
+
+def test_rate_limiter():
+    #Check that the rate limiter spaces out requests.
+    limiter = RateLimiter(50)
+    start = time.monotonic()
+    for i in range(11):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.19
@@ -0,0 +1,128 @@
+import sys
+import os
+import json
+import time
+import shutil
+import pytest
+sys.path.append('../')
+import instrumentation
+import main
+from equivalence import FIXTURE_FINAL_AUM, fixture_case
+from linreg import Linreg
+"""
+Tests the stage timings and counters collected by instrumentation, and the --profile option.
+"""
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture
+def profiler():
+    profiler = instrumentation.enable()
+    yield profiler
+    instrumentation.disable()
+
+def test_disabled_span_is_shared():
+    #Check that a span does nothing and allocates nothing when profiling is off.
+    assert instrumentation.active() is None
+    assert instrumentation.span('run_strategy', days = 30) is instrumentation._NULL_SPAN
+    instrumentation.count('memo.hits')
+    instrumentation.record_fetch('CsvProvider', ['SPY'], '20200101', '20210101', 10, 80)
+    assert instrumentation.active() is None
+
+@pytest.mark.benchmark
+def test_disabled_overhead():
+    #Check that a disabled span costs well under a microsecond on average.
+    start = time.perf_counter()
+    for _ in range(100000):
+        with instrumentation.span('month'):
+            pass
+    assert (time.perf_counter() - start) / 100000 < 1e-6
+
+def test_summary(profiler):
+    #Check the calls, seconds and counters of the summary.
+    for _ in range(3):
+        with instrumentation.span('run_strategy'):
+            time.sleep(0.001)
+    instrumentation.count('memo.hits', 2)
+    summary = profiler.summary()
+    assert summary['stages']['run_strategy']['calls'] == 3
+    assert summary['stages']['run_strategy']['seconds'] >= 0.003
+    assert summary['counters'] == {'memo.hits': 2}
+
+def test_month_attribution(profiler):
+    #Check that spans inside a month span are attributed to that month, and spans outside it to none.
+    with instrumentation.span('month', date = '2020-06-30'):
+        with instrumentation.span('select'):
+            pass
+    with instrumentation.span('select'):
+        pass
+    months = profiler.summary()['months']
+    assert list(months) == ['2020-06-30']
+    assert set(months['2020-06-30']) == {'month', 'select'}
+    assert profiler.summary()['stages']['select']['calls'] == 2
+
+def test_chunk_attribution(profiler):
+    #Check that spans inside a chunk span are shared out among its months, unless they are inside a month span.
+    with instrumentation.span('chunk', dates = ['2020-06-30', '2020-07-31']):
+        with instrumentation.span('select'):
+            time.sleep(0.002)
+        with instrumentation.span('month', date = '2020-07-31'):
+            with instrumentation.span('online_statistics'):
+                pass
+    months = profiler.summary()['months']
+    assert set(months['2020-06-30']) == {'chunk', 'select'}
+    assert set(months['2020-07-31']) == {'chunk', 'select', 'month', 'online_statistics'}
+    assert months['2020-06-30']['select'] == months['2020-07-31']['select'] == pytest.approx(profiler.summary()['stages']['select']['seconds'] / 2)
+
+def test_duplicate_fetches(profiler):
+    #Check that identical fetches are counted as duplicates.
+    instrumentation.record_fetch('CsvProvider', ['SPY'], '20200101', '20210101', 10, 80)
+    instrumentation.record_fetch('CsvProvider', ['SPY'], '20200101', '20210101', 10, 80)
+    instrumentation.record_fetch('CsvProvider', ['AAPL'], '20200101', '20210101', 5, 40)
+    counters = profiler.summary()['counters']
+    assert counters['fetches'] == counters['fetches.CsvProvider'] == 3
+    assert counters['duplicate_fetches'] == 1
+    assert counters['rows_loaded'] == 25
+    assert counters['bytes_loaded'] == 200
+
+def test_backtest_stages(profiler):
+    #Check that a backtest reports its stages per month and loads its data once.
+    Linreg(**fixture_case()).perform_strategy()
+    summary = profiler.summary()
+    for stage in ['window_starts', 'load_panel', 'merge_data', 'fit_regressions', 'select', 'mark_to_market']:
+        assert stage in summary['stages']
+    assert summary['stages']['month']['calls'] == 7
+    assert len(summary['months']) == 7
+    #Every month gets its share of the stages its chunk runs for all its months at once.
+    for timings in summary['months'].values():
+        assert {'merge_data', 'fit_regressions', 'select', 'mark_to_market', 'online_statistics'} <= set(timings)
+    assert sum(timings['select'] for timings in summary['months'].values()) == pytest.approx(summary['stages']['select']['seconds'])
+    assert summary['counters']['fetches'] == 1
+    assert summary['counters']['memo.misses'] > 0
+
+def test_chrome_trace(profiler, tmp_path):
+    #Check that the Chrome trace holds one complete event per span and the counters.
+    with instrumentation.span('month', date = '2020-06-30'):
+        instrumentation.count('memo.hits')
+    path = tmp_path / 'trace.json'
+    profiler.write(str(path), 'chrome')
+    with open(path) as file:
+        trace = json.load(file)
+    events = trace['traceEvents']
+    assert [event['ph'] for event in events] == ['X', 'C']
+    assert events[0]['args']['month'] == '2020-06-30'
+    assert events[1]['args'] == {'memo.hits': 1}
+
+def test_main_profile(tmp_path):
+    #Check that --profile writes a JSON summary and leaves profiling off afterwards.
+    for ticker in ['SPY', 'AAPL']:
+        shutil.copy(os.path.join(TEST_DIR, f'getdata_{ticker.lower()}.csv'), tmp_path / f'{ticker}.csv')
+    path = tmp_path / 'profile.json'
+    statistics = main.main(['--tickers', 'SPY', 'AAPL', '--b', '20200601', '--e', '20210129', '--initial_aum', '100000',
+                            '--strategy_type', 'M', '--days', '30', '--days_2', '60', '--top_pct', '50', '--data_dir', str(tmp_path),
+                            '--profile', str(path)])
+    assert statistics['Final AUM'] == pytest.approx(FIXTURE_FINAL_AUM)
+    assert instrumentation.active() is None
+    with open(path) as file:
+        summary = json.load(file)
+    assert summary['stages']['perform_strategy']['calls'] == 1
+    assert summary['stages']['calculate_statistics']['calls'] == 1
@@ -0,0 +1,209 @@
+import sys
+import os
+import pytest
+import numpy as np
+import pandas as pd
+sys.path.append('../')
+from equivalence import FIXTURE_FINAL_AUM, fixture_case
+from linreg import Linreg
+"""
+Tests the linear regression backtest on the saved SPY and AAPL data.
+"""
+def make_linreg(**settings):
+    """
+    Returns the Linreg of the SPY and AAPL fixtures, with any of its settings overridden.
+    """
+    return Linreg(**{**fixture_case(), **settings})
+
+def test_perform_strategy_result():
+    #Check the final AUM and that the result is kept on the instance.
+    linreg = make_linreg()
+    result = linreg.perform_strategy()
+    assert linreg.result is result
+    assert result.final_aum == pytest.approx(FIXTURE_FINAL_AUM)
+    assert len(result.top_stocks) == len(result.aum_history) == 7
+    assert result.holdings.sum(axis = 1).tolist() == [1.0] * 7
+
+def test_equity_curve_matches_monthly_aum():
+    #Check that the daily equity curve ends every month at the monthly AUM, with or without a single load.
+    for single_load in [True, False]:
+        result = make_linreg(single_load = single_load).perform_strategy()
+        equity_curve = result.equity_curve
+        month_ends = [equity_curve[equity_curve.index <= date].iloc[-1] for date in result.aum_history.index]
+        assert np.allclose(month_ends, result.aum_history.to_numpy())
+        #The curve starts the day after the first rebalance and ends on the last one.
+        assert equity_curve.index[0] == result.holdings.index[0] + pd.offsets.BDay()
+        assert equity_curve.index[-1] == result.aum_history.index[-1]
+
+def test_close_to_close_returns():
+    #Check that every period's AUM grows by the Close-to-Close returns of its holdings, from one rebalance to the next.
+    provider = fixture_case()['provider']
+    close = {ticker: provider.fetch(ticker, '20200101', '20210201')['Close'] for ticker in ['SPY', 'AAPL']}
+    for frequency in ['daily', 'weekly', 'monthly']:
+        result = make_linreg(provider = provider, frequency = frequency).perform_strategy()
+        aum = 100000
+        for start, end, (_, weights) in zip(result.holdings.index, result.aum_history.index, result.holdings.iterrows()):
+            returns = [close[ticker][end] / close[ticker][start] - 1 for ticker in weights.index[weights > 0]]
+            aum = aum * (1 + np.mean(returns))
+            assert result.aum_history[end] == pytest.approx(aum)
+        assert result.final_aum != pytest.approx(100000)
+
+def test_weekend_start_date():
+    #Check that a backtest starting on a weekend starts on the next trading day and gives finite results.
+    from portfolio_statistics import PortfolioStatistics
+    linreg = make_linreg(start_date = '20200606')
+    assert linreg.start_date == linreg.Strategy.start_date == '20200608'
+    assert linreg.perform_strategy().final_aum == pytest.approx(make_linreg(start_date = '20200608').perform_strategy().final_aum)
+    statistics = PortfolioStatistics(linreg).calculate_statistics()
+    assert np.isfinite([statistics['Final AUM'], statistics['Daily Sharpe Ratio of the portfolio']]).all()
+
+def test_resume_from_checkpoint(tmp_path):
+    #Check that a run resumed from the checkpoint of a shorter run computes only the new months and gives the same result.
+    from checkpoint import BacktestCheckpoint
+    path = str(tmp_path / 'checkpoint.pkl')
+    make_linreg(end_date = '20201215').perform_strategy(checkpoint = path)
+    #December is cut short by the end date, so only the months up to November 30 are kept.
+    assert BacktestCheckpoint.load(path).months == 5
+    assert BacktestCheckpoint.load(path).last_rebalance_date == pd.Timestamp('2020-11-30')
+
+    resumed = make_linreg()
+    merged = []
+    resumed.merge_windows = lambda window_starts: merged.extend(window_starts[:-1]) or Linreg.merge_windows(resumed, window_starts)
+    result = resumed.perform_strategy(checkpoint = path)
+    assert merged == ['20201030', '20201130', '20201231']
+    expected = make_linreg().perform_strategy()
+    assert result.final_aum == pytest.approx(expected.final_aum)
+    assert result.top_stocks.equals(expected.top_stocks)
+    assert result.equity_curve.equals(expected.equity_curve)
+    assert result.holdings.equals(expected.holdings)
+    assert resumed.monthly_models.params.shape == (7, 3)
+    assert resumed.online_statistics.months == 7
+    assert BacktestCheckpoint.load(path).months == 7
+
+def test_checkpoint_saved_after_every_chunk(tmp_path):
+    #Check that an interrupted run leaves a checkpoint of its completed chunks, which a later run resumes from.
+    from checkpoint import BacktestCheckpoint
+    path = str(tmp_path / 'checkpoint.pkl')
+    saved = []
+    def progress(statistics):
+        checkpoint = BacktestCheckpoint.load(path)
+        saved.append(checkpoint.months if checkpoint is not None else 0)
+        if statistics.months == 5:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        make_linreg().perform_strategy(progress = progress, checkpoint = path, chunk_months = 2)
+    assert saved == [0, 0, 2, 2, 4]
+    assert not os.path.exists(path + '.tmp')
+
+    resumed = make_linreg()
+    result = resumed.perform_strategy(checkpoint = path, chunk_months = 2)
+    expected = make_linreg().perform_strategy()
+    assert result.final_aum == pytest.approx(expected.final_aum)
+    assert result.top_stocks.equals(expected.top_stocks)
+    assert result.equity_curve.equals(expected.equity_curve)
+    assert resumed.online_statistics.months == 7
+
+def test_checkpoint_of_other_settings_is_ignored(tmp_path):
+    #Check that a checkpoint computed with different settings is not resumed.
+    path = str(tmp_path / 'checkpoint.pkl')
+    make_linreg(end_date = '20201215').perform_strategy(checkpoint = path)
+    linreg = make_linreg(top_pct = 100)
+    assert linreg.resume(path, linreg.rebalance_dates()) is None
+    assert len(linreg.perform_strategy(checkpoint = path).aum_history) == 7
+
+def test_training_windows():
+    #Check that rolling and expanding training windows fit each month on the frames of its window.
+    import ols
+    linreg = make_linreg(training_window = 3)
+    linreg.perform_strategy()
+    frames = linreg.training_frames
+    for i in [0, 2, 5]:
+        training_data = pd.concat(frames[max(i - 2, 0):i + 1])
+        expected = ols.fit_ols(training_data[linreg.feature_columns], training_data['Return_actual'])
+        assert linreg.monthly_models.params[i] == pytest.approx(np.asarray(expected.params), abs = 1e-9)
+        assert linreg.monthly_models.nobs[i] == len(training_data)
+
+    linreg.training_window = 'expanding'
+    expanding = linreg.fit_window_models(frames)
+    training_data = pd.concat(frames)
+    expected = ols.fit_ols(training_data[linreg.feature_columns], training_data['Return_actual'])
+    assert expanding.params[-1] == pytest.approx(np.asarray(expected.params), abs = 1e-9)
+    #Fitting only the later months gives the same fits as fitting all of them.
+    assert linreg.fit_window_models(frames, 4).params == pytest.approx(expanding.params[4:])
+    linreg.training_window = 3
+    assert linreg.fit_window_models(frames, 5).params == pytest.approx(linreg.fit_window_models(frames).params[5:], abs = 1e-9)
+
+
+def test_one_month_window_matches_batched_fits():
+    #Check that a one-month window fitted with the accumulator matches the batched fits used by default.
+    from synthetic_data import SyntheticProvider, synthetic_tickers
+    linreg = Linreg(synthetic_tickers(20), '20210101', '20211231', 30, 60, 'M', 'R', 20, 100000, provider = SyntheticProvider())
+    linreg.perform_strategy()
+    assert linreg.fit_window_models(linreg.training_frames).params == pytest.approx(linreg.monthly_models.params)
+
+def test_chunks():
+    #Check that computing the months in chunks of any size gives the same backtest, with any training window.
+    for training_window in [1, 3, 'expanding']:
+        results = []
+        for chunk_months in [1, 3, 64]:
+            linreg = make_linreg(training_window = training_window)
+            results.append((linreg.perform_strategy(chunk_months = chunk_months), linreg.monthly_models.params))
+        for result, params in results[1:]:
+            assert result.holdings.equals(results[0][0].holdings)
+            assert result.equity_curve.to_numpy() == pytest.approx(results[0][0].equity_curve.to_numpy())
+            assert params == pytest.approx(results[0][1])
+
+def test_invalid_training_window():
+    #Check that a training window that is not a positive number of months or 'expanding' is rejected.
+    with pytest.raises(ValueError):
+        make_linreg(training_window = 0)
+
+def test_rebalance_frequencies():
+    #Check weekly and every-N-days backtests, merged at once from the preloaded panel or window by window.
+    from synthetic_data import SyntheticProvider, synthetic_tickers
+    import trading_calendar
+    tickers = synthetic_tickers(20)
+    for frequency in ['weekly', 10]:
+        results = [Linreg(tickers, '20210104', '20210630', 30, 60, 'M', 'R', 20, 100000, provider = SyntheticProvider(),
+                          single_load = single_load, frequency = frequency).perform_strategy() for single_load in [True, False]]
+        rebalance_dates = trading_calendar.get_calendar('NYSE').rebalance_dates('20210104', '20210630', frequency)
+        assert len(results[0].aum_history) == len(rebalance_dates) - 1
+        assert results[0].final_aum == pytest.approx(results[1].final_aum)
+        assert results[0].holdings.equals(results[1].holdings)
+        assert np.allclose(results[0].equity_curve, results[1].equity_curve)
+    with pytest.raises(ValueError):
+        Linreg(['SPY'], '20200601', '20210129', 30, 60, 'M', 'R', 50, 100000, frequency = 'yearly')
+
+def test_daily_rebalancing():
+    #Check that rebalancing daily on a preloaded panel fetches nothing more and holds the top 10% every trading day.
+    from synthetic_data import SyntheticProvider, synthetic_tickers
+    import trading_calendar
+    fetches = []
+    class CountingProvider(SyntheticProvider):
+        def fetch(self, ticker, start_date, end_date):
+            fetches.append(ticker)
+            return super().fetch(ticker, start_date, end_date)
+    tickers = synthetic_tickers(50)
+    linreg = Linreg(tickers, '20210104', '20210630', 30, 60, 'M', 'R', 10, 100000, provider = CountingProvider(), frequency = 'daily')
+    linreg.load_panel(['20201101', '20210630'])
+    loaded = len(fetches)
+    result = linreg.perform_strategy()
+    assert len(fetches) == loaded
+    rebalance_dates = trading_calendar.get_calendar('NYSE').rebalance_dates('20210104', '20210630', 'daily')
+    assert len(result.aum_history) == len(rebalance_dates) - 1
+    assert ((result.holdings > 0).sum(axis = 1) == 5).all()
+
+@pytest.mark.benchmark
+def test_daily_rebalancing_time():
+    #Check that rebalancing daily on a preloaded panel costs about as much as rebalancing monthly.
+    import time
+    from synthetic_data import SyntheticProvider, synthetic_tickers
+    tickers = synthetic_tickers(50)
+    seconds = {}
+    for frequency in ['monthly', 'daily']:
+        linreg = Linreg(tickers, '20200102', '20211231', 30, 60, 'M', 'R', 10, 100000, provider = SyntheticProvider(), frequency = frequency)
+        linreg.load_panel(['20191101', '20211231'])
+        start = time.perf_counter()
+        linreg.perform_strategy()
+        seconds[frequency] = time.perf_counter() - start
+    assert seconds['daily'] < 5 * seconds['monthly'] + 0.5
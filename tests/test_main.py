@@ -0,0 +1,102 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import pytest
+sys.path.append('../')
+import main
+from equivalence import FIXTURE_FINAL_AUM
+"""
+Tests the command line entry point: --help and invalid arguments must not load pandas, numpy or any other
+heavy library. The import-time budget and wall-clock checks only run with --benchmark.
+"""
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_main(*arguments):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py')] + list(arguments), capture_output = True, text = True)
+    return result, time.perf_counter() - start
+
+def loaded_heavy_modules(arguments = None):
+    """
+    Imports main in a fresh interpreter, parses the arguments if any are given, and returns the heavy modules
+    that ended up in sys.modules.
+    """
+    code = ('import sys, main\n'
+            f'arguments = {arguments!r}\n'
+            'if arguments is not None:\n'
+            '    try:\n'
+            '        main.parse_arguments(arguments)\n'
+            '    except SystemExit:\n'
+            '        pass\n'
+            'print([name for name in main.HEAVY_MODULES if name in sys.modules])')
+    result = subprocess.run([sys.executable, '-c', code], capture_output = True, text = True, cwd = ROOT)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1]
+
+def test_import_loads_no_heavy_modules():
+    #Check that importing main, printing the help and rejecting arguments do not import any heavy library.
+    assert loaded_heavy_modules() == '[]'
+    assert loaded_heavy_modules(['--help']) == '[]'
+    assert loaded_heavy_modules(['--b', '20200101', '--e', '20210101']) == '[]'
+    assert loaded_heavy_modules(['--b', '20200101', '--e', '20210101', '--initial_aum', '1000']) == '[]'
+
+def test_help():
+    #Check that --help lists the arguments added by main.
+    result, _ = run_main('--help')
+    assert result.returncode == 0
+    assert '--strategy_2' in result.stdout
+
+def test_invalid_arguments():
+    #Check that invalid arguments are reported with an error and exit code 1.
+    result, _ = run_main('--b', '20200101', '--e', '20210101', '--initial_aum', '1000')
+    assert result.returncode == 1
+    assert 'Error: Please provide at least one ticker.' in result.stderr
+
+@pytest.mark.benchmark
+def test_import_time_budget():
+    #Check that importing main stays within its import-time budget.
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], capture_output = True, text = True, cwd = ROOT)
+    #Lines look like "import time:       self |  cumulative | name", times in microseconds.
+    cumulative = [int(line.split('|')[1]) for line in result.stderr.splitlines() if re.search(r'\|\s*main$', line)]
+    assert len(cumulative) == 1
+    assert cumulative[0] / 1e6 < main.IMPORT_BUDGET
+
+@pytest.mark.benchmark
+def test_help_and_invalid_arguments_are_fast():
+    #Check that --help and invalid arguments return in under a second.
+    assert run_main('--help')[1] < 1.0
+    assert run_main('--b', '20200101', '--e', '20210101', '--initial_aum', '1000')[1] < 1.0
+
+def test_parse_arguments_defaults():
+    #Check that the second strategy defaults to the opposite strategy with the same days.
+    arguments = main.parse_arguments(['--tickers', 'SPY', 'AAPL', '--b', '20200601', '--e', '20210129', '--initial_aum', '100000',
+                                      '--strategy_type', 'M', '--days', '30', '--top_pct', '50'])
+    assert vars(arguments) == {'tickers': ['SPY', 'AAPL'], 'b': '20200601', 'e': '20210129', 'initial_aum': 100000.0, 'strategy_type': 'M',
+                               'days': 30, 'top_pct': 50, 'profile': None, 'profile_format': 'json', 'days_2': 30, 'strategy_2': 'R',
+                               'data_dir': None, 'store': None, 'progress': False, 'checkpoint': None, 'training_window': 1,
+                               'frequency': 'monthly'}
+    arguments = main.parse_arguments(['--tickers', 'SPY', '--b', '20200601', '--e', '20210129', '--initial_aum', '100000', '--strategy_type', 'R',
+                                      '--days', '30', '--top_pct', '50', '--training_window', 'expanding', '--frequency', '10'])
+    assert (arguments.strategy_2, arguments.training_window, arguments.frequency) == ('M', 'expanding', 10)
+
+def test_parse_arguments_top_pct():
+    #Check that a missing top percentile exits.
+    with pytest.raises(SystemExit) as sample:
+        main.parse_arguments(['--tickers', 'SPY', '--b', '20200601', '--e', '20210129', '--initial_aum', '100000',
+                              '--strategy_type', 'M', '--days', '30'])
+    assert sample.value.code == 'Error: Top percentile must be between 1 and 100.'
+
+def test_main_runs_backtest(tmp_path, capsys):
+    #Check that main runs the backtest on local data and prints its statistics.
+    for ticker in ['SPY', 'AAPL']:
+        shutil.copy(os.path.join(TEST_DIR, f'getdata_{ticker.lower()}.csv'), tmp_path / f'{ticker}.csv')
+    statistics = main.main(['--tickers', 'SPY', 'AAPL', '--b', '20200601', '--e', '20210129', '--initial_aum', '100000',
+                            '--strategy_type', 'M', '--days', '30', '--days_2', '60', '--top_pct', '50', '--data_dir', str(tmp_path), '--progress'])
+    assert statistics['Final AUM'] == pytest.approx(FIXTURE_FINAL_AUM)
+    output = capsys.readouterr().out
+    assert 'Final AUM: ' in output
+    assert '7 months to 2020-12-31' in output
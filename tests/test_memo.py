@@ -0,0 +1,29 @@
+import sys
+import pytest
+sys.path.append('../')
+from memo import LRUMemo
+"""
+Tests the bounded LRU memo table used by Strategy.
+"""
+def test_memo_computes_once():
+    #Check that a key is only computed on the first call.
+    memo = LRUMemo(4)
+    calls = []
+    for i in range(3):
+        value = memo.get_or_compute('a', lambda: calls.append(1) or 10)
+    assert value == 10
+    assert len(calls) == 1
+    assert memo.hits == 2
+    assert memo.misses == 1
+
+def test_memo_evicts_least_recently_used():
+    #Check that the least recently used key is evicted when the memo is full.
+    memo = LRUMemo(2)
+    memo.get_or_compute('a', lambda: 1)
+    memo.get_or_compute('b', lambda: 2)
+    memo.get_or_compute('a', lambda: 1)
+    memo.get_or_compute('c', lambda: 3)
+    assert len(memo) == 2
+    assert 'a' in memo
+    assert 'b' not in memo
+    assert 'c' in memo
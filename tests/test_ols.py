@@ -0,0 +1,115 @@
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+sys.path.append('../')
+import ols
+"""
+Tests the closed-form regression kernel against numpy's least squares solver and the
+textbook standard error formula.
+"""
+def make_data(seed, rows, columns = 2):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size = (rows, columns))
+    y = 0.5 + X @ np.arange(1.0, columns + 1) + rng.normal(scale = 0.1, size = rows)
+    return X, y
+
+def expected_fit(X, y):
+    #Coefficients, standard errors and t-values computed the textbook way.
+    design = np.column_stack([np.ones(len(X)), X])
+    params = np.linalg.lstsq(design, y, rcond = None)[0]
+    residuals = y - design @ params
+    sigma2 = residuals @ residuals / (len(X) - design.shape[1])
+    bse = np.sqrt(np.diag(np.linalg.inv(design.T @ design)) * sigma2)
+    return params, bse, params / bse
+
+def test_fit_ols_matches_lstsq():
+    #Check a single fit, including parameter names taken from DataFrame columns.
+    X, y = make_data(0, 50)
+    result = ols.fit_ols(pd.DataFrame(X, columns = ['Return_strategy_1', 'Return_strategy_2']), y)
+    params, bse, tvalues = expected_fit(X, y)
+    assert list(result.params.index) == ['const', 'Return_strategy_1', 'Return_strategy_2']
+    assert result.params.values == pytest.approx(params)
+    assert result.bse.values == pytest.approx(bse)
+    assert result.tvalues.values == pytest.approx(tvalues)
+
+def test_batched_ols_with_mask():
+    #Check that padded fits of different sizes give the same answer as fitting each one alone.
+    frames = []
+    for seed, rows in enumerate([10, 25, 7]):
+        X, y = make_data(seed, rows, 3)
+        frames.append(pd.DataFrame(np.column_stack([X, y]), columns = ['a', 'b', 'c', 'y']))
+    X = np.zeros((3, 25, 3))
+    y = np.zeros((3, 25))
+    mask = np.zeros((3, 25), dtype = bool)
+    for i, frame in enumerate(frames):
+        X[i, :len(frame)] = frame[['a', 'b', 'c']].values
+        y[i, :len(frame)] = frame['y'].values
+        mask[i, :len(frame)] = True
+    result = ols.batched_ols(X, y, mask)
+    assert result.params.shape == (3, 4)
+    for i, frame in enumerate(frames):
+        params, bse, tvalues = expected_fit(frame[['a', 'b', 'c']].values, frame['y'].values)
+        assert result.params[i] == pytest.approx(params)
+        assert result.bse[i] == pytest.approx(bse)
+        assert result.tvalues[i] == pytest.approx(tvalues)
+    predictions = result.predict(X)
+    assert predictions[0, :10] == pytest.approx(np.column_stack([np.ones(10), frames[0][['a', 'b', 'c']].values]) @ result.params[0])
+
+def test_ols_accumulator_remove():
+    #Check that removing a block gives the fit of the blocks that are left.
+    X, y = make_data(3, 60)
+    accumulator = ols.OLSAccumulator(2)
+    for start in range(0, 60, 20):
+        accumulator.add(X[start:start + 20], y[start:start + 20])
+    accumulator.remove(X[:20], y[:20])
+    expected = ols.fit_ols(X[20:], y[20:])
+    result = accumulator.fit()
+    assert accumulator.nobs == 40
+    assert result.params == pytest.approx(expected.params)
+    assert result.tvalues == pytest.approx(expected.tvalues)
+
+def test_ols_accumulator_remove_to_constant_features():
+    #Check that the rounding left by a removed block does not fit huge slopes on features without variance.
+    X, y = make_data(3, 40)
+    accumulator = ols.OLSAccumulator(2)
+    accumulator.add(X[:20] * 0.05, y[:20])
+    accumulator.add(np.zeros((4, 2)), y[20:24])
+    accumulator.remove(X[:20] * 0.05, y[:20])
+    expected = ols.batched_ols(np.zeros((1, 4, 2)), y[None, 20:24])
+    assert accumulator.fit().params == pytest.approx(expected.params[0])
+
+def test_concat():
+    #Check that joining two batches of fits gives the batch of all of them.
+    X, y = make_data(0, 40, 2)
+    X = X.reshape(4, 10, 2)
+    y = y.reshape(4, 10)
+    whole = ols.batched_ols(X, y)
+    joined = ols.concat([ols.batched_ols(X[:1], y[:1]), None, ols.batched_ols(X[1:], y[1:])])
+    assert joined.params == pytest.approx(whole.params)
+    assert joined.tvalues == pytest.approx(whole.tvalues)
+    assert list(joined.nobs) == [10] * 4
+    assert ols.concat([None]) is None
+
+def test_underdetermined_fit():
+    #Check that a cross-section smaller than the number of parameters still predicts, with NaN t-values.
+    X = np.array([[0.1, 0.2], [0.3, -0.1]])
+    y = np.array([0.05, 0.02])
+    result = ols.fit_ols(X, y)
+    assert result.predict(X) == pytest.approx(y)
+    assert np.isnan(result.tvalues).all()
+
+def test_ols_accumulator():
+    #Check that a regression accumulated block by block matches fitting all the rows at once.
+    rng = np.random.default_rng(3)
+    X = rng.normal(size = (60, 2))
+    y = 0.5 + X @ np.array([1.5, -2.0]) + rng.normal(scale = 0.1, size = 60)
+    accumulator = ols.OLSAccumulator(2)
+    for rows in np.array_split(np.arange(60), 5):
+        accumulator.add(X[rows], y[rows])
+    expected = ols.fit_ols(pd.DataFrame(X, columns = ['a', 'b']), y)
+    result = accumulator.fit(['a', 'b'])
+    assert result.nobs == 60
+    assert list(result.params.index) == ['const', 'a', 'b']
+    assert result.params.to_numpy() == pytest.approx(expected.params.to_numpy())
+    assert result.tvalues.to_numpy() == pytest.approx(expected.tvalues.to_numpy())
@@ -0,0 +1,40 @@
+import sys
+import pytest
+import numpy as np
+sys.path.append('../')
+from online_stats import RunningMoments, OnlineStatistics
+"""
+Tests the streaming statistics accumulators against batch NumPy results.
+"""
+def test_running_moments_chunks():
+    #Check that updating chunk by chunk gives the batch mean, variance and maximum.
+    values = np.random.default_rng(0).normal(1.0, 2.0, 1000)
+    moments = RunningMoments()
+    for chunk in np.array_split(values, [1, 7, 300, 301]):
+        moments.update(chunk)
+    assert moments.count == 1000
+    assert moments.mean == pytest.approx(values.mean())
+    assert moments.variance == pytest.approx(values.var(ddof = 1))
+    assert moments.max == values.max()
+
+def test_running_moments_skips_nan():
+    #Check that NaN values are skipped, like pandas.
+    moments = RunningMoments()
+    moments.update([np.nan])
+    assert moments.count == 0 and np.isnan(moments.mean)
+    moments.update([1.0, np.nan, 3.0])
+    assert moments.mean == 2.0
+    assert moments.std == pytest.approx(np.sqrt(2.0))
+
+def test_online_statistics_drawdown():
+    #Check daily returns and the maximum drawdown across months.
+    statistics = OnlineStatistics(100.0)
+    statistics.update('2021-01-29', 120.0, [0.2], [110.0, 120.0])
+    statistics.update('2021-02-26', 99.0, [-0.175], [90.0, 99.0])
+    assert statistics.months == 2
+    assert statistics.final_aum == 99.0
+    assert statistics.total_stock_return == pytest.approx(0.025)
+    assert statistics.max_drawdown == pytest.approx(0.25)
+    assert statistics.returns.mean == pytest.approx(np.mean([0.1, 120 / 110 - 1, -0.25, 0.1]))
+    assert statistics.aum.max == 120.0
+    assert '2 months to 2021-02-26: AUM 99.00' in statistics.progress()
@@ -0,0 +1,70 @@
+import sys
+import pytest
+import pandas as pd
+sys.path.append('../')
+from equivalence import FIXTURE_FINAL_AUM, fixture_case
+from linreg import Linreg
+from portfolio_statistics import PortfolioStatistics
+"""
+Tests the portfolio statistics on a backtest of the saved SPY and AAPL data.
+"""
+
+def make_linreg():
+    return Linreg(**fixture_case())
+
+def test_backtest_runs_once(monkeypatch):
+    #Check that calculating the statistics runs the backtest only once.
+    linreg = make_linreg()
+    runs = []
+    perform_strategy = linreg.perform_strategy
+    monkeypatch.setattr(linreg, 'perform_strategy', lambda: runs.append(1) or perform_strategy())
+    statistics = PortfolioStatistics(linreg).calculate_statistics()
+    assert len(runs) == 1
+    assert statistics['Final AUM'] == pytest.approx(FIXTURE_FINAL_AUM)
+
+def test_existing_result_is_reused(monkeypatch):
+    #Check that a backtest already run on the Linreg instance is not run again.
+    linreg = make_linreg()
+    result = linreg.perform_strategy()
+    monkeypatch.setattr(linreg, 'perform_strategy', lambda: pytest.fail('backtest ran again'))
+    assert PortfolioStatistics(linreg).result is result
+
+def test_daily_statistics_from_equity_curve():
+    #Check that the daily AUM statistics come from the daily equity curve.
+    linreg = make_linreg()
+    statistics = PortfolioStatistics(linreg).calculate_statistics()
+    equity_curve = linreg.result.equity_curve
+    assert len(equity_curve) > len(linreg.result.aum_history)
+    assert statistics['Average daily AUM'] == pytest.approx(equity_curve.mean())
+    assert statistics['Maximum daily AUM'] == pytest.approx(equity_curve.max())
+    assert statistics['Daily Standard deviation of the return of the portfolio'] == pytest.approx(linreg.result.daily_returns.std())
+
+def test_progress_is_live():
+    #Check that each chunk's months are reported before the next chunk's windows are merged.
+    from linreg import Linreg
+    linreg = make_linreg()
+    merged = []
+    linreg.merge_windows = lambda window_starts: merged.append(len(window_starts) - 1) or Linreg.merge_windows(linreg, window_starts)
+    seen = []
+    linreg.perform_strategy(progress = lambda statistics: seen.append((statistics.months, sum(merged))), chunk_months = 3)
+    assert seen == [(1, 4), (2, 4), (3, 4), (4, 7), (5, 7), (6, 7), (7, 8)]
+
+def test_online_statistics_match_batch():
+    #Check that the statistics accumulated month by month match the batch statistics.
+    linreg = make_linreg()
+    months = []
+    linreg.perform_strategy(progress = lambda statistics: months.append(statistics.months))
+    assert months == list(range(1, 8))
+    portfolio_statistics = PortfolioStatistics(linreg)
+    batch = portfolio_statistics.calculate_statistics()
+    online = portfolio_statistics.calculate_statistics(online = True)
+    assert batch.keys() == online.keys()
+    for key, value in batch.items():
+        if isinstance(value, pd.Series):
+            assert online[key].to_numpy() == pytest.approx(value.to_numpy())
+            assert list(online[key].index) == list(value.index)
+        elif isinstance(value, pd.Timestamp):
+            assert online[key] == value
+        else:
+            assert online[key] == pytest.approx(value)
+    assert batch['Maximum drawdown (AUM)'] > 0
@@ -0,0 +1,122 @@
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+sys.path.append('../')
+from price_panel import PricePanel
+"""
+Tests the vectorized lookback-return engine on small hand-made panels.
+"""
+def make_panel():
+    #Three tickers over 60 business days, each growing at a constant daily rate.
+    dates = pd.bdate_range('2021-01-01', periods = 60)
+    rows = np.arange(60)
+    close = np.column_stack([100 * 1.01 ** rows, 50 * 0.99 ** rows, np.full(60, 10.0)])
+    frames = {ticker: pd.DataFrame({'Close': close[:, i]}, index = dates) for i, ticker in enumerate(['A', 'B', 'C'])}
+    return dates, PricePanel.from_frames(frames)
+
+def test_positions():
+    #Check that dates in the index are found and dates outside it give -1.
+    dates, panel = make_panel()
+    positions = panel.positions([dates[0], dates[10], '20210102'])
+    assert positions.tolist() == [0, 10, -1]
+
+def test_lookback_returns_all_dates_at_once():
+    #Check momentum and reversal returns for several rebalance dates in a single call.
+    dates, panel = make_panel()
+    momentum = panel.lookback_returns([dates[40], dates[59]], 10, 'M')
+    reversal = panel.lookback_returns([dates[40], dates[59]], 10, 'R')
+    assert momentum.shape == (2, 3)
+    assert momentum[:, 0] == pytest.approx([1.01 ** 10 - 1] * 2)
+    assert reversal[:, 1] == pytest.approx([0.99 ** 10 - 1] * 2)
+    assert reversal[:, 2] == pytest.approx([0.0, 0.0])
+
+def test_lookback_returns_not_enough_history():
+    #Check that lookbacks running past the first row are NaN rather than wrapping around.
+    dates, panel = make_panel()
+    momentum = panel.lookback_returns([dates[25]], 10, 'M')
+    reversal = panel.lookback_returns([dates[25]], 10, 'R', ['C'])
+    assert np.isnan(momentum).all()
+    assert reversal.tolist() == [[0.0]]
+
+def test_missing_prices():
+    #Check that tickers without a price on the signal date are NaN and other tickers are unaffected.
+    dates = pd.bdate_range('2021-01-01', periods = 30)
+    frames = {'A': pd.DataFrame({'Close': np.arange(1.0, 31.0)}, index = dates),
+              'B': pd.DataFrame({'Close': np.arange(1.0, 30.0)}, index = dates[:-1])}
+    panel = PricePanel.from_frames(frames)
+    returns = panel.lookback_returns([dates[-1]], 5, 'R')
+    assert returns[0, 0] == pytest.approx(30 / 25 - 1)
+    assert np.isnan(returns[0, 1])
+
+def test_forward_returns():
+    #Check Close-to-Close returns from start to end for all tickers at once.
+    dates, panel = make_panel()
+    returns = panel.forward_returns(dates[10], dates[21])
+    assert returns == pytest.approx([1.01 ** 11 - 1, 0.99 ** 11 - 1, 0.0])
+    #A date that is not a trading day is rebalanced at the latest Close before it.
+    assert panel.forward_returns(dates[10] + pd.Timedelta(days = 1), dates[21]) == pytest.approx(returns)
+
+def test_forward_returns_missing_prices():
+    #Check that a ticker's own first and last prices in the window are used, and NaN without any price before the end.
+    dates = pd.bdate_range('2021-01-01', periods = 10)
+    close_b = np.arange(1.0, 11.0)
+    close_b[:2] = np.nan
+    frames = {'A': pd.DataFrame({'Close': np.full(10, np.nan)}, index = dates),
+              'B': pd.DataFrame({'Close': close_b}, index = dates)}
+    panel = PricePanel.from_frames(frames)
+    returns = panel.forward_returns(dates[0], dates[-1], ['B', 'A'])
+    assert returns[0] == pytest.approx(10 / 3 - 1)
+    assert np.isnan(returns[1])
+    assert np.isnan(panel.forward_returns(dates[-1], dates[-1])).all()
+
+def test_window_is_view():
+    #Check that a window only holds the rows in [start, end) and shares memory with the panel.
+    dates, panel = make_panel()
+    window = panel.window(dates[5], dates[15])
+    assert len(window) == 10
+    assert window.dates[0] == panel.dates[5]
+    assert np.shares_memory(window.close, panel.close)
+
+def test_holding_growth():
+    #Check the daily growth of a portfolio that is rebalanced at the Close of each window start.
+    dates, panel = make_panel()
+    weights = [[1.0, 0.0, 0.0], [0.0, 0.5, 0.5]]
+    growth_dates, growth = panel.holding_growth([dates[10], dates[20], dates[30]], weights)
+    assert list(growth_dates) == list(panel.dates[11:31])
+    assert growth[:10] == pytest.approx(1.01 ** np.arange(1, 11))
+    assert growth[10:] == pytest.approx((0.99 ** np.arange(1, 11) + 1) / 2)
+    #The last growth of each window matches the forward returns of its holdings.
+    assert growth[9] - 1 == pytest.approx(panel.forward_returns(dates[10], dates[20])[0])
+    #A window without holdings is held in cash.
+    growth_dates, growth = panel.holding_growth([dates[10], dates[20], dates[30]], [[0.0, 0.0, 0.0], [0.0, 0.5, 0.5]])
+    assert growth[:10] == pytest.approx(np.ones(10))
+
+def test_holding_growth_missing_prices():
+    #Check that holdings are marked to their latest price and count at their starting value before their first price.
+    dates = pd.bdate_range('2021-01-01', periods = 6)
+    frames = {'A': pd.DataFrame({'Close': [np.nan, 2.0, np.nan, 4.0, 5.0, 6.0]}, index = dates),
+              'B': pd.DataFrame({'Close': np.full(6, 10.0)}, index = dates)}
+    panel = PricePanel.from_frames(frames)
+    growth_dates, growth = panel.holding_growth([dates[0], dates[6 - 1]], [[1.0, 1.0]])
+    assert list(growth_dates) == list(panel.dates[1:])
+    assert growth == pytest.approx([1.0, 1.0, 1.5, 1.75, 2.0])
+
+def test_window_returns():
+    #Check that the returns of consecutive windows computed at once match forward_returns of each window.
+    dates = pd.bdate_range('2021-01-01', periods = 12)
+    close_a = np.arange(1.0, 13.0)
+    close_a[[0, 5, 6, 7]] = np.nan
+    frames = {'A': pd.DataFrame({'Close': close_a}, index = dates),
+              'B': pd.DataFrame({'Close': 2.0 ** np.arange(12)}, index = dates)}
+    panel = PricePanel.from_frames(frames)
+    window_starts = [dates[0], dates[3], dates[5], dates[8], dates[8], dates[11]]
+    returns = panel.window_returns(window_starts)
+    assert returns.shape == (5, 2)
+    for i in range(5):
+        expected = panel.forward_returns(window_starts[i], window_starts[i + 1])
+        assert np.array_equal(returns[i], expected, equal_nan = True)
+    #A's first price in the third window is the Close it ends on, and the fourth window is empty.
+    assert returns[[0, 1, 4], 0] == pytest.approx([4 / 2 - 1, 5 / 4 - 1, 12 / 9 - 1])
+    assert returns[:, 1][[0, 1, 2, 4]] == pytest.approx([7.0, 3.0, 7.0, 7.0])
+    assert np.isnan(returns[2, 0]) and np.isnan(returns[3]).all()
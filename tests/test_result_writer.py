@@ -0,0 +1,123 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+sys.path.append('../')
+from backtest_result import StoredBacktestResult
+from equivalence import fixture_case
+from linreg import Linreg
+from portfolio_statistics import PortfolioStatistics
+from result_writer import ResultWriter, ResultReader
+"""
+Tests streaming results to columnar files in chunks and reading them back memory-mapped.
+"""
+
+def make_rows(start, count):
+    return pd.DataFrame({'Stock': [f'T{i % 3}' for i in range(start, start + count)], 'Return': np.arange(start, start + count) / 100,
+                         'Date': pd.date_range('2020-01-01', periods = count) + pd.Timedelta(days = start)})
+
+def test_chunks(tmp_path):
+    #Check that rows are written out in chunks as they are buffered, and can be read before the writer is closed.
+    writer = ResultWriter(str(tmp_path), chunk_rows = 4)
+    writer.write('rows', make_rows(0, 3))
+    assert 'rows' not in ResultReader(str(tmp_path)).tables
+    writer.write('rows', make_rows(3, 7))
+    assert len(ResultReader(str(tmp_path)).column('rows', 'Return')) == 10
+    writer.write('rows', make_rows(10, 1))
+    writer.close()
+
+    reader = ResultReader(str(tmp_path))
+    frame = reader.read('rows')
+    expected = pd.concat([make_rows(0, 3), make_rows(3, 7), make_rows(10, 1)], ignore_index = True)
+    assert frame['Stock'].tolist() == expected['Stock'].tolist()
+    assert frame['Return'].tolist() == expected['Return'].tolist()
+    assert (frame['Date'].to_numpy() == expected['Date'].to_numpy()).all()
+    assert reader.categories('rows', 'Stock') == ['T0', 'T1', 'T2']
+    assert isinstance(reader.column('rows', 'Return'), np.memmap)
+
+def test_rewrite_table(tmp_path):
+    #Check that writing a table again replaces the earlier files.
+    for count in [5, 2]:
+        with ResultWriter(str(tmp_path)) as writer:
+            writer.write('rows', make_rows(0, count))
+    assert len(ResultReader(str(tmp_path)).read('rows')) == 2
+
+def test_backtest_result(tmp_path):
+    #Check that a backtest written while it runs reads back the same result as one kept in memory.
+    in_memory = Linreg(**fixture_case())
+    expected = in_memory.perform_strategy()
+    linreg = Linreg(**fixture_case())
+    with ResultWriter(str(tmp_path), chunk_rows = 5) as writer:
+        result = linreg.perform_strategy(writer = writer, chunk_months = 2)
+    assert isinstance(result, StoredBacktestResult)
+    assert sorted(ResultReader(str(tmp_path)).tables) == ['aum_history', 'equity_curve', 'holdings', 'top_stocks']
+    assert result.final_aum == expected.final_aum
+    assert result.top_stocks.equals(expected.top_stocks)
+    assert result.equity_curve.equals(expected.equity_curve)
+    assert result.holdings.to_numpy().tolist() == expected.holdings.to_numpy().tolist()
+    assert (result.holdings.index == expected.holdings.index).all()
+    statistics = PortfolioStatistics(linreg).calculate_statistics()
+    expected_statistics = PortfolioStatistics(in_memory).calculate_statistics()
+    assert list(statistics) == list(expected_statistics)
+    for name in statistics:
+        if isinstance(statistics[name], pd.Series):
+            assert statistics[name].to_numpy() == pytest.approx(expected_statistics[name].to_numpy()), name
+        elif isinstance(statistics[name], pd.Timestamp):
+            assert statistics[name] == expected_statistics[name]
+        else:
+            assert statistics[name] == pytest.approx(expected_statistics[name]), name
+
+def test_backtest_releases_training_frames(tmp_path):
+    #Check that a streamed backtest only keeps the training frames its window still needs, and still fits its model.
+    for training_window, kept in [(1, 0), (3, 3), ('expanding', 0)]:
+        expected = Linreg(**fixture_case(), training_window = training_window)
+        expected.perform_strategy()
+        linreg = Linreg(**fixture_case(), training_window = training_window)
+        with ResultWriter(str(tmp_path / str(training_window))) as writer:
+            result = linreg.perform_strategy(writer = writer, chunk_months = 2)
+        assert result.final_aum == pytest.approx(expected.result.final_aum)
+        assert sum(frame is not None for frame in linreg.training_frames) == kept
+        assert np.allclose(linreg.fit_model().params, expected.fit_model().params)
+        with pytest.raises(ValueError):
+            linreg.fit_model(['Return_strategy_1'])
+
+def test_backtest_streams_chunks(tmp_path):
+    #Check that every chunk of months is on disk before the next one is computed.
+    linreg = Linreg(**fixture_case())
+    written = []
+    with ResultWriter(str(tmp_path), chunk_rows = 1) as writer:
+        def progress(statistics):
+            written.append((statistics.months, len(ResultReader(str(tmp_path)).column('aum_history', 'AUM'))))
+        linreg.perform_strategy(progress = progress, writer = writer, chunk_months = 2)
+    assert written == [(1, 2), (2, 2), (3, 4), (4, 4), (5, 6), (6, 6), (7, 7)]
+
+def test_sweep_streams_statistics(tmp_path):
+    #Check that a sweep streams one statistics row per configuration.
+    from sweep import Sweep
+    settings = fixture_case()
+    sweep = Sweep(settings['tickers'], settings['start_date'], '20201031', settings['aum'], [20], [60], ['M'], ['R', 'M'], [50],
+                  provider = settings['provider'], processes = 1)
+    with ResultWriter(str(tmp_path), chunk_rows = 1) as writer:
+        results = sweep.run(writer)
+    statistics = ResultReader(str(tmp_path)).read('statistics')
+    assert statistics['strategy_2'].tolist() == ['R', 'M']
+    assert statistics['Final AUM'].tolist() == results['Final AUM'].tolist()
+
+def test_columnar_formats(tmp_path):
+    #Check the parquet and arrow formats when pyarrow is installed.
+    pytest.importorskip('pyarrow')
+    for format in ['parquet', 'arrow']:
+        directory = str(tmp_path / format)
+        with ResultWriter(directory, format, chunk_rows = 4) as writer:
+            writer.write('rows', make_rows(0, 10))
+        reader = ResultReader(directory)
+        assert reader.tables == {'rows': format}
+        assert reader.read('rows', ['Return'])['Return'].tolist() == make_rows(0, 10)['Return'].tolist()
+
+def test_columnar_formats_need_pyarrow(tmp_path, monkeypatch):
+    #Check that the parquet format fails with a clear error without pyarrow.
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with pytest.raises(ImportError, match = 'pyarrow'):
+        ResultWriter(str(tmp_path), 'parquet')
+    with pytest.raises(ValueError):
+        ResultWriter(str(tmp_path), 'csv')
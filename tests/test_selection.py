@@ -0,0 +1,61 @@
+import sys
+import heapq
+import time
+import numpy as np
+import pytest
+sys.path.append('../')
+from selection import top_k_mask
+"""
+Tests the top-k selection kernel against heapq.
+"""
+
+def heapq_mask(row, k, largest):
+    scores = {i: value for i, value in enumerate(row) if not np.isnan(value)}
+    pick = heapq.nlargest if largest else heapq.nsmallest
+    mask = np.zeros(len(row), dtype = bool)
+    mask[pick(k, scores, key = scores.get)] = True
+    return mask
+
+def test_matches_heapq():
+    #Check every row against heapq, with NaNs and ties.
+    rng = np.random.default_rng(0)
+    scores = np.round(rng.normal(size = (50, 40)), 1)
+    scores[rng.random(scores.shape) < 0.2] = np.nan
+    for k in [1, 5, 40]:
+        for largest in [True, False]:
+            mask = top_k_mask(scores, k, largest)
+            for row, row_mask in zip(scores, mask):
+                assert (row_mask == heapq_mask(row, k, largest)).all()
+
+def test_ties_go_left():
+    #Check that ties at the k-th score select the leftmost tickers.
+    assert top_k_mask([1.0, 2.0, 2.0, 2.0], 2).tolist() == [False, True, True, False]
+    assert top_k_mask([3.0, 1.0, 1.0], 2, largest = False).tolist() == [False, True, True]
+
+def test_nan_and_empty():
+    #Check that NaN scores are never selected and k = 0 selects nothing.
+    assert top_k_mask([np.nan, 1.0, np.nan], 2).tolist() == [False, True, False]
+    assert top_k_mask([np.nan, np.nan], 1).tolist() == [False, False]
+    assert not top_k_mask(np.ones((3, 4)), 0).any()
+
+def test_rows():
+    #Check that every row of a matrix of scores is selected on its own.
+    mask = top_k_mask([[1.0, 3.0, 2.0], [3.0, 2.0, 1.0]], 2)
+    assert mask.tolist() == [[False, True, True], [True, True, False]]
+
+def test_large_universe():
+    #Check that the top 10% of 5,000 stocks are the 500 highest scores.
+    scores = np.random.default_rng(1).normal(size = 5000)
+    mask = top_k_mask(scores, 500)
+    assert mask.sum() == 500
+    assert np.flatnonzero(mask).tolist() == sorted(np.argsort(-scores)[:500].tolist())
+
+@pytest.mark.benchmark
+def test_large_universe_is_fast():
+    #Check that picking the top 10% of 5,000 stocks takes well under a millisecond.
+    scores = np.random.default_rng(1).normal(size = 5000)
+    top_k_mask(scores, 500)
+    start = time.perf_counter()
+    for _ in range(100):
+        top_k_mask(scores, 500)
+    assert (time.perf_counter() - start) / 100 < 1e-3
@@ -0,0 +1,60 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+sys.path.append('../')
+from feature_store import FeatureStore
+from linreg import Linreg
+from price_panel import PricePanel
+from shared_panel import SharedPanel, ShardPool
+from synthetic_data import SyntheticProvider, synthetic_tickers
+"""
+Tests the price panel in shared memory and the worker processes computing its signals in shards of tickers.
+"""
+def make_panel():
+    dates = pd.bdate_range('2020-01-01', periods = 300)
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, (300, 7)), axis = 0))
+    close[:40, 2] = np.nan
+    close[200:230, 5] = np.nan
+    return PricePanel(dates.values.astype('datetime64[D]'), [f'T{i}' for i in range(7)], close)
+
+def test_attach_shares_memory():
+    #Check that a panel attached to the shared block sees the prices without a copy.
+    panel = make_panel()
+    with SharedPanel(panel) as shared:
+        memory, attached = SharedPanel.attach(shared.handle())
+        assert np.array_equal(attached.close, panel.close, equal_nan = True)
+        assert attached.tickers == panel.tickers
+        shared.prices[0, 0] = -1.0
+        assert attached.close[0, 0] == -1.0
+        del attached
+        memory.close()
+
+def test_shards():
+    #Check that the shards cover every ticker once, and that there are no empty shards.
+    with ShardPool(make_panel(), 3) as pool:
+        assert pool.shards() == [(0, 2), (2, 4), (4, 7)]
+    with ShardPool(make_panel(), 10) as pool:
+        assert len(pool.shards()) == 7
+
+def test_shard_pool_matches_panel():
+    #Check that the workers' signals and forward returns, joined, match those of the whole panel.
+    panel = make_panel()
+    dates = panel.dates[[50, 120, 121, 250, 299]]
+    horizons = [(20, 0), (30, 20), (60, 0)]
+    window_starts = panel.dates[[60, 80, 190, 215, 260]]
+    with ShardPool(panel, 3) as pool:
+        assert np.array_equal(pool.tensor(dates, horizons, first_date = panel.dates[10]),
+                              FeatureStore(panel).tensor(dates, horizons, first_date = panel.dates[10]), equal_nan = True)
+        assert np.array_equal(pool.window_returns(window_starts), panel.window_returns(window_starts), equal_nan = True)
+        assert np.array_equal(pool.window_returns(window_starts, ['T5', 'T0']), panel.window_returns(window_starts, ['T5', 'T0']),
+                              equal_nan = True)
+
+def test_linreg_processes():
+    #Check that a backtest merged by worker processes selects the same stocks as one merged in-process.
+    tickers = synthetic_tickers(12)
+    results = [Linreg(tickers, '20210104', '20211231', 30, 60, 'M', 'R', 25, 100000, provider = SyntheticProvider(),
+                      processes = processes).perform_strategy() for processes in [1, 2]]
+    assert results[0].holdings.equals(results[1].holdings)
+    assert results[0].final_aum == pytest.approx(results[1].final_aum)
+    assert results[0].top_stocks['Predicted_Return'].to_numpy() == pytest.approx(results[1].top_stocks['Predicted_Return'].to_numpy())
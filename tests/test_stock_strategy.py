@@ -1,8 +1,22 @@
 import sys
+import os
+import numpy as np
+import pandas as pd
 import pytest
 sys.path.append('../')
+from data_provider import CsvProvider
 from stock_strategy import Strategy
 
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def make_strategy(start_date, end_date, days, strategy, top_pct, provider = None):
+    """
+    Returns a Strategy of SPY and AAPL reading the saved getdata_*.csv prices, or prices from provider.
+    """
+    if provider is None:
+        provider = CsvProvider(TEST_DIR, 'getdata_{lower}.csv')
+    return Strategy(['SPY', 'AAPL'], start_date, end_date, days, strategy, top_pct, provider = provider)
+
 def test_compute_top_stocks_zero():
     x = Strategy(tickers = ['A', 'B', 'C', 'D', 'E'],
                  start_date = '19990101',
@@ -37,4 +51,84 @@ def test_compute_top_stocks_all():
     assert expected == actual
 
 def test_calculate_returns():
-    pass
\ No newline at end of file
+    #Check momentum and reversal lookback returns against prices read straight from getdata_spy.csv.
+    x = make_strategy('20201201', '20201231', 30, 'M', 50)
+    data = x.get_data_for_all_tickers('20201201', '20201231', ['SPY', 'AAPL'])
+    close = data['SPY']['Close']
+    row = close.index.get_loc(pd.Timestamp('2020-12-01'))
+    momentum = x.calculate_returns('20201201', 30, 'M', data, ['SPY', 'AAPL'])
+    reversal = x.calculate_returns('20201201', 30, 'R', data, ['SPY', 'AAPL'])
+    assert momentum['SPY'] == pytest.approx((close.iloc[row - 20] - close.iloc[row - 50]) / close.iloc[row - 50])
+    assert reversal['SPY'] == pytest.approx((close.iloc[row] - close.iloc[row - 30]) / close.iloc[row - 30])
+    assert sorted(momentum) == ['AAPL', 'SPY']
+
+def test_run_strategy_memoized():
+    #Check that identical run_strategy and actual_performance calls are computed once and returned as copies.
+    x = make_strategy('20201201', '20201231', 30, 'M', 50)
+    first = x.run_strategy('20201201', '20201231', 30, 'M', ['SPY', 'AAPL'])
+    first['Return'] = 5
+    second = x.run_strategy('20201201', '20201231', 30, 'M', ['SPY', 'AAPL'])
+    assert (second['Return'] != 5).all()
+    x.actual_performance('20201201', '20201231')
+    misses = x.memo.misses
+    x.actual_performance('20201201', '20201231')
+    assert x.memo.misses == misses
+
+def test_actual_performance_from_loaded_data():
+    #Check that forward returns computed from the loaded panel match the saved prices.
+    x = make_strategy('20201201', '20201231', 10, 'R', 100)
+    result = x.actual_performance('20201201', '20201231')
+    spy = x.provider.fetch('SPY', '20201201', '20210101')['Close']
+    expected = (spy.iloc[-1] - spy.iloc[0]) / spy.iloc[0]
+    assert result.loc[result['Stock'] == 'SPY', 'Return'].item() == pytest.approx(expected)
+
+def test_load_panel_single_load():
+    #Check that after load_panel, windows inside the loaded range never go back to the provider.
+    class CountingProvider(CsvProvider):
+        calls = 0
+        def fetch_many(self, tickers, start_date, end_date):
+            CountingProvider.calls += 1
+            return CsvProvider.fetch_many(self, tickers, start_date, end_date)
+    x = make_strategy('20200901', '20201231', 10, 'M', 50, CountingProvider(TEST_DIR, 'getdata_{lower}.csv'))
+    x.load_panel('20200901', '20201231', ['SPY', 'AAPL'])
+    x.run_strategy('20201030', '20201130', 30, 'R', ['SPY', 'AAPL'])
+    x.actual_performance('20201030', '20201130')
+    assert CountingProvider.calls == 1
+
+def test_actual_performance_keeps_negative_selections():
+    #Check that selected stocks with a negative lookback return still get their forward return.
+    x = make_strategy('20201030', '20201130', 10, 'R', 100)
+    assert x.select_stocks('20201030', '20201130', 10, 'R', ['SPY', 'AAPL']).tolist() == [True, True]
+    result = x.actual_performance('20201030', '20201130')
+    assert result['Stock'].tolist() == ['SPY', 'AAPL']
+
+def test_lookback_returns_from_feature_store():
+    #Check that lookback returns read from the preloaded panel's feature store match those of the window's own panel.
+    loaded = make_strategy('20200601', '20201231', 10, 'M', 50)
+    loaded.load_panel('20200601', '20201231', ['SPY', 'AAPL'])
+    windowed = make_strategy('20200601', '20201231', 10, 'M', 50)
+    for days, strategy in [(30, 'M'), (60, 'R'), (200, 'M')]:
+        expected = windowed.lookback_returns('20201030', '20201130', days, strategy, ['SPY', 'AAPL'])
+        returns = loaded.lookback_returns('20201030', '20201130', days, strategy, ['SPY', 'AAPL'])
+        assert sorted(returns) == sorted(expected)
+        for ticker in expected:
+            assert returns[ticker] == pytest.approx(expected[ticker], rel = 1e-12)
+    assert loaded.feature_tensor(['20201030'], [(30, 'M'), (60, 'R')], ['SPY', 'AAPL']).shape == (1, 2, 2)
+
+def test_strategy_many_windows():
+    #Check that merging every window of a preloaded panel at once matches run_strategy and actual_performance of each window.
+    x = make_strategy('20200601', '20201231', 10, 'R', 50)
+    window_starts = ['20200831', '20200930', '20201030', '20201130', '20201231']
+    x.load_panel(window_starts[0], window_starts[-1], ['SPY', 'AAPL'])
+    assert x.covers(window_starts[0], window_starts[-1], ['SPY', 'AAPL'])
+    assert not x.covers('20190102', window_starts[-1], ['SPY', 'AAPL'])
+    signals = [(30, 'M'), (60, 'R')]
+    returns = x.run_strategy_many(window_starts, signals, ['SPY', 'AAPL'])
+    actual = x.actual_performance_many(window_starts, ['SPY', 'AAPL'])
+    for i in range(len(window_starts) - 1):
+        for k, (days, strategy) in enumerate(signals):
+            expected = x.run_strategy(window_starts[i], window_starts[i + 1], days, strategy, ['SPY', 'AAPL'])['Return']
+            assert returns[i, :, k] == pytest.approx(expected.to_numpy(), rel = 1e-12)
+        expected = x.actual_performance(window_starts[i], window_starts[i + 1])
+        assert [ticker for ticker, value in zip(['SPY', 'AAPL'], actual[i]) if not np.isnan(value)] == expected['Stock'].tolist()
+        assert actual[i][~np.isnan(actual[i])] == pytest.approx(expected['Return'].to_numpy())
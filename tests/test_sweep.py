@@ -0,0 +1,74 @@
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+sys.path.append('../')
+from equivalence import fixture_case
+from sweep import Sweep, parse_arguments
+"""
+Tests the parameter sweep on the saved SPY and AAPL data.
+"""
+
+def make_sweep(processes, top_pcts = (50,)):
+    settings = fixture_case()
+    return Sweep(settings['tickers'], settings['start_date'], '20201031', settings['aum'], [20], [60], ['M'], ['R', 'M'], top_pcts,
+                 provider = settings['provider'], processes = processes)
+
+def test_sweep_configurations():
+    #Check that the grid is the full product of the parameter lists.
+    sweep = make_sweep(1)
+    assert sweep.configurations() == [(20, 60, 'M', 'R', 50), (20, 60, 'M', 'M', 50)]
+
+def test_sweep_shared_panel():
+    #Check that the configurations run on the panel the shared Strategy loaded, without loading it again.
+    from linreg import Linreg
+    strategy = make_sweep(1).shared_strategy()
+    panel = strategy.panel
+    linreg = Linreg(**{**fixture_case(), 'end_date': '20201031', 'days_1': 20, 'strategy_2': 'M', 'provider': None}, strategy = strategy)
+    assert strategy.covers(*[linreg.window_starts()[1][i] for i in [0, -1]], ['SPY', 'AAPL'])
+    linreg.perform_strategy()
+    assert strategy.panel is panel
+
+def test_sweep_process_pool_matches_single_process():
+    #Check that running configurations in worker processes gives the same table as running them in-process.
+    single = make_sweep(1).run()
+    pooled = make_sweep(2).run()
+    assert len(single) == 2
+    assert single[['days_1', 'days_2', 'strategy_1', 'strategy_2', 'top_pct']].values.tolist() == [[20, 60, 'M', 'R', 50], [20, 60, 'M', 'M', 50]]
+    pd.testing.assert_frame_equal(single, pooled)
+
+def test_sweep_signals_once_per_group(monkeypatch):
+    #Check that configurations differing only in top_pct run as one group, whose signals are computed once.
+    from stock_strategy import Strategy
+    sweep = make_sweep(1, [50, 100])
+    assert sweep.groups() == [[(20, 60, 'M', 'R', 50), (20, 60, 'M', 'R', 100)], [(20, 60, 'M', 'M', 50), (20, 60, 'M', 'M', 100)]]
+    computed = []
+    feature_tensor = Strategy._feature_tensor
+    monkeypatch.setattr(Strategy, '_feature_tensor', lambda self, *arguments: computed.append(arguments[1]) or feature_tensor(self, *arguments))
+    results = sweep.run()
+    assert computed == [[(20, 'M'), (60, 'R')], [(20, 'M'), (60, 'M')]]
+    assert results['top_pct'].tolist() == [50, 100, 50, 100]
+    assert results['Final AUM'].tolist()[0] == make_sweep(1).run()['Final AUM'].tolist()[0]
+
+def test_sweep_workers_attach_to_shared_panel():
+    #Check that a worker reads the panel from the shared memory block instead of a copy.
+    import copy
+    import sweep
+    from shared_panel import SharedPanel
+    strategy = make_sweep(2).shared_strategy()
+    worker_strategy = copy.copy(strategy)
+    worker_strategy.panel = None
+    with SharedPanel(strategy.panel) as shared_panel:
+        sweep._init_worker(worker_strategy, None, shared_panel.handle())
+        assert np.shares_memory(worker_strategy.panel.close, np.ndarray(shared_panel.shape, shared_panel.dtype, buffer = sweep._worker_state['memory'].buf))
+        assert np.array_equal(worker_strategy.panel.close, strategy.panel.close, equal_nan = True)
+        assert worker_strategy.panel_range == strategy.panel_range
+        sweep._worker_state.clear()
+
+def test_sweep_parse_arguments():
+    #Check that grid arguments accept several values.
+    args = parse_arguments(['--tickers', 'AAPL', 'KO', '--b', '20220103', '--e', '20220301', '--initial_aum', '1000',
+                            '--days_1', '20', '30', '--days_2', '60', '--top_pct', '10', '20'])
+    assert args.days_1 == [20, 30]
+    assert args.strategy_2 == ['R']
+    assert args.top_pct == [10, 20]
@@ -0,0 +1,30 @@
+import sys
+import pytest
+import numpy as np
+sys.path.append('../')
+from synthetic_data import SyntheticProvider, synthetic_tickers
+"""
+Tests the deterministic synthetic price generator used by the benchmarks.
+"""
+def test_synthetic_tickers():
+    #Check the generated ticker names.
+    assert synthetic_tickers(3) == ['T0000', 'T0001', 'T0002']
+
+def test_fetch_format():
+    #Check that the data has the usual columns on NYSE trading days of [start, end).
+    data = SyntheticProvider().fetch('T0001', '20200101', '20200201')
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+    assert len(data) == 21
+    assert str(data.index[0]) == '2020-01-02 00:00:00'
+    assert (data['High'] >= data[['Open', 'Close']].max(axis = 1)).all()
+    assert (data['Low'] <= data[['Open', 'Close']].min(axis = 1)).all()
+
+def test_deterministic():
+    #Check that prices only depend on the ticker and seed, not on the requested range.
+    provider = SyntheticProvider()
+    short = provider.fetch('T0001', '20200101', '20200201')
+    long = SyntheticProvider().fetch('T0001', '20190101', '20210101')
+    assert np.array_equal(short['Close'].to_numpy(), long.loc[short.index, 'Close'].to_numpy())
+    other = provider.fetch('T0002', '20200101', '20200201')
+    assert not np.array_equal(short['Close'].to_numpy(), other['Close'].to_numpy())
+    assert not np.array_equal(short['Close'].to_numpy(), SyntheticProvider(1).fetch('T0001', '20200101', '20200201')['Close'].to_numpy())
@@ -0,0 +1,112 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+sys.path.append('../')
+import trading_calendar
+from trading_calendar import TradingCalendar, month_end_positions
+"""
+Tests the shared trading calendar against the schedules built by Pandas Market Calendars.
+"""
+CALENDAR = TradingCalendar.build('NYSE', '2019-01-01', '2021-12-31')
+
+def schedule_days(start_date, end_date):
+    import pandas_market_calendars as mcal
+    return mcal.get_calendar('NYSE').schedule(start_date = start_date, end_date = end_date).index
+
+def test_trading_days():
+    #Check that the trading days match the NYSE schedule.
+    expected = schedule_days('2020-01-01', '2020-12-31')
+    assert list(CALENDAR.trading_days('20200101', '20201231')) == list(expected.values.astype('datetime64[D]'))
+    assert CALENDAR.count('20200101', '20201231') == len(expected) == 253
+
+def test_is_valid_range():
+    #Check that a range without trading days is not valid.
+    assert CALENDAR.is_valid_range('20200102', '20200102')
+    assert not CALENDAR.is_valid_range('20200101', '20200101')
+    assert not CALENDAR.is_valid_range('20200104', '20200105')
+    assert not CALENDAR.is_valid_range('20200110', '20200101')
+
+def test_out_of_bounds():
+    #Check that dates outside the calendar raise OutOfBoundsDatetime.
+    with pytest.raises(pd.errors.OutOfBoundsDatetime):
+        CALENDAR.count('20180101', '20200101')
+    with pytest.raises(pd.errors.OutOfBoundsDatetime):
+        CALENDAR.snap('20220103')
+
+def test_month_ends():
+    #Check that month ends match grouping the schedule by month, including a partial last month.
+    for start_date, end_date in [('20200105', '20210115'), ('20200601', '20210129'), ('20200131', '20200131'), ('20200315', '20200320')]:
+        days = schedule_days(start_date, end_date).to_series()
+        expected = days.groupby(days.dt.strftime('%Y-%m')).max()
+        assert list(CALENDAR.month_ends(start_date, end_date)) == list(expected.values.astype('datetime64[D]'))
+    assert len(CALENDAR.month_ends('20200104', '20200105')) == 0
+
+def test_snap():
+    #Check snapping weekends and holidays to the previous and next trading day.
+    assert CALENDAR.snap('20200704') == np.datetime64('2020-07-02')
+    assert CALENDAR.snap('20200704', 'next') == np.datetime64('2020-07-06')
+    assert CALENDAR.snap('20200706') == CALENDAR.snap('20200706', 'next') == np.datetime64('2020-07-06')
+    assert CALENDAR.is_trading_day('20200706')
+    assert not CALENDAR.is_trading_day('20200703')
+    assert trading_calendar.snap('20171230', 'next') == '20180102'
+    assert trading_calendar.snap('20171230') == '20171229'
+
+def test_is_month_end():
+    #Check that only the last trading day of a month is a month end.
+    assert CALENDAR.is_month_end('20200731')
+    assert CALENDAR.is_month_end('20201231')
+    assert not CALENDAR.is_month_end('20200730')
+    assert not CALENDAR.is_month_end('20200801')
+
+def test_month_end_positions():
+    #Check the positions of the last date of each month.
+    days = np.array(['2020-01-30', '2020-01-31', '2020-02-03', '2020-03-02'], dtype = 'datetime64[D]')
+    assert list(month_end_positions(days)) == [1, 2, 3]
+    assert len(month_end_positions(days[:0])) == 0
+
+def test_rebalance_dates():
+    #Check that every rebalance frequency ends its periods on the last trading day, like grouping the schedule.
+    days = schedule_days('20200105', '20210115').to_series()
+    groups = {'daily': days.dt.strftime('%Y-%m-%d'), 'weekly': (days - pd.to_timedelta(days.dt.weekday, 'D')).dt.strftime('%Y-%m-%d'),
+              'monthly': days.dt.strftime('%Y-%m'), 'quarterly': days.dt.year * 4 + days.dt.quarter}
+    for frequency, keys in groups.items():
+        expected = days.groupby(keys).max()
+        assert list(CALENDAR.rebalance_dates('20200105', '20210115', frequency)) == list(expected.values.astype('datetime64[D]'))
+    expected = list(days.iloc[9::10]) + [days.iloc[-1]]
+    assert list(CALENDAR.rebalance_dates('20200105', '20210115', 10)) == list(pd.DatetimeIndex(expected).values.astype('datetime64[D]'))
+    with pytest.raises(ValueError):
+        CALENDAR.rebalance_dates('20200105', '20210115', 'yearly')
+
+def test_period_start_and_end():
+    #Check the start of the period before a rebalance date, and which days end a period.
+    assert CALENDAR.period_start('20200710', 'weekly') == np.datetime64('2020-07-02')
+    assert CALENDAR.period_start('20200630', 'quarterly') == np.datetime64('2020-03-30')
+    assert CALENDAR.period_start('20200707', 'daily') == np.datetime64('2020-07-06')
+    assert CALENDAR.period_start('20200707', 3) == np.datetime64('2020-07-01')
+    assert CALENDAR.is_period_end('20200710', 'weekly')
+    assert CALENDAR.is_period_end('20200702', 'weekly')
+    assert not CALENDAR.is_period_end('20200709', 'weekly')
+    assert CALENDAR.is_period_end('20200630', 'quarterly') and not CALENDAR.is_period_end('20200731', 'quarterly')
+    #July 3 2020 is a holiday, so the third trading day from July 1 is July 6.
+    assert CALENDAR.is_period_end('20200706', 3, '20200701') and not CALENDAR.is_period_end('20200707', 3, '20200701')
+
+def test_get_calendar_saves_and_loads(tmp_path, monkeypatch):
+    #Check that the calendar is saved once and then loaded from disk instead of rebuilt.
+    monkeypatch.setattr(trading_calendar, '_calendars', {})
+    built = []
+    build = TradingCalendar.build
+    monkeypatch.setattr(TradingCalendar, 'build', classmethod(lambda cls, name: built.append(name) or build(name, '2019-01-01', '2030-12-31')))
+
+    calendar = trading_calendar.get_calendar('NYSE', str(tmp_path))
+    assert built == ['NYSE']
+    assert os.path.exists(tmp_path / 'NYSE.npz')
+    assert trading_calendar.get_calendar('NYSE', str(tmp_path)) is calendar
+
+    monkeypatch.setattr(trading_calendar, '_calendars', {})
+    loaded = trading_calendar.get_calendar('NYSE', str(tmp_path))
+    assert built == ['NYSE']
+    assert loaded is not calendar
+    assert np.array_equal(loaded.days, calendar.days)
+    assert loaded.last_day == np.datetime64('2030-12-31')
@@ -0,0 +1,279 @@
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import instrumentation
+
+DEFAULT_CALENDAR_DIR = os.path.join(os.path.expanduser('~'), '.bloopberg', 'calendars')
+#Range covered by a freshly built calendar: from the first year pandas_market_calendars knows about
+#to YEARS_AHEAD years after the current one.
+FIRST_DAY = np.datetime64('1885-01-01')
+YEARS_AHEAD = 5
+
+#Calendars already loaded in this process, by exchange name.
+_calendars = {}
+#Rebalance frequencies with calendar periods. A whole number N rebalances every N trading days.
+FREQUENCIES = ['daily', 'weekly', 'monthly', 'quarterly']
+
+
+def as_day(date):
+    """
+    Converts a date, datetime, pd.Timestamp or 'YYYYMMDD' string to numpy datetime64[D].
+    """
+    if isinstance(date, str):
+        date = pd.Timestamp(date)
+    return np.datetime64(date, 'D')
+
+
+def month_end_positions(days):
+    """
+    Returns the positions of the last date of each month in a sorted datetime64 array.
+    """
+    return period_end_positions(days, 'monthly')
+
+
+def period_keys(days, frequency = 'monthly'):
+    """
+    Returns the rebalance period of every date of a sorted datetime64 array, as integers that change
+    exactly where a new period starts. Weeks start on Monday. Periods of N trading days (frequency = N)
+    are counted from the first date.
+    """
+    days = np.asarray(days).astype('datetime64[D]')
+    if frequency == 'daily':
+        return np.arange(len(days))
+    if frequency == 'weekly':
+        #1970-01-01, day 0, was a Thursday.
+        return (days.astype(np.int64) + 3) // 7
+    if frequency == 'monthly':
+        return days.astype('datetime64[M]').astype(np.int64)
+    if frequency == 'quarterly':
+        return days.astype('datetime64[M]').astype(np.int64) // 3
+    if isinstance(frequency, (int, np.integer)) and not isinstance(frequency, bool) and frequency > 0:
+        return np.arange(len(days)) // frequency
+    raise ValueError(f"frequency must be one of {', '.join(FREQUENCIES)} or a number of trading days greater than 0.")
+
+
+def period_end_positions(days, frequency = 'monthly'):
+    """
+    Returns the positions of the last date of each rebalance period in a sorted datetime64 array.
+    The last date is always included, ending a possibly partial last period.
+    """
+    keys = period_keys(days, frequency)
+    if len(keys) == 0:
+        return np.empty(0, dtype = np.int64)
+    return np.append(np.flatnonzero(keys[1:] != keys[:-1]), len(keys) - 1)
+
+
+class TradingCalendar:
+    """
+    An exchange's trading days held as one sorted datetime64[D] array, with the position of the last
+    trading day of every month precomputed.
+
+    Every query is a binary search on these arrays, so no pandas schedule is built after the calendar
+    itself. Use get_calendar() to share one calendar per exchange across the process; it is built with
+    pandas_market_calendars once and then saved to disk.
+    """
+    def __init__(self, days, first_day, last_day):
+        """
+        days: the trading days between first_day and last_day, the range the calendar can answer for.
+        """
+        self.days = np.unique(np.asarray(days, dtype = 'datetime64[D]'))
+        self.first_day = as_day(first_day)
+        self.last_day = as_day(last_day)
+        self.month_end_positions = month_end_positions(self.days)
+
+    @classmethod
+    def build(cls, name = 'NYSE', first_day = FIRST_DAY, last_day = None):
+        """
+        Builds the calendar of an exchange with pandas_market_calendars. last_day defaults to the end of the
+        year YEARS_AHEAD years from now.
+        """
+        import pandas_market_calendars as mcal
+        if last_day is None:
+            last_day = np.datetime64(f'{datetime.today().year + YEARS_AHEAD}-12-31')
+        valid_days = mcal.get_calendar(name).valid_days(start_date = pd.Timestamp(first_day), end_date = pd.Timestamp(last_day))
+        return cls(valid_days.tz_localize(None).values, first_day, last_day)
+
+    def save(self, path):
+        """
+        Saves the calendar to a .npz file. The file is written to a temporary path first and then
+        moved into place, so a concurrent reader never sees a partial file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, days = self.days, bounds = np.array([self.first_day, self.last_day]))
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['days'], data['bounds'][0], data['bounds'][1])
+
+    def __len__(self):
+        return len(self.days)
+
+    def _range(self, start_date, end_date):
+        #Positions [lo, hi) of the trading days in [start_date, end_date].
+        start_date = self._check(start_date)
+        end_date = self._check(end_date)
+        return np.searchsorted(self.days, start_date, 'left'), np.searchsorted(self.days, end_date, 'right')
+
+    def _check(self, date):
+        date = as_day(date)
+        if date < self.first_day or date > self.last_day:
+            raise pd.errors.OutOfBoundsDatetime(f'{date} is outside the trading calendar ({self.first_day} to {self.last_day}).')
+        return date
+
+    def trading_days(self, start_date, end_date):
+        """
+        Returns the trading days in [start_date, end_date].
+        """
+        lo, hi = self._range(start_date, end_date)
+        return self.days[lo:hi]
+
+    def count(self, start_date, end_date):
+        """
+        Returns the number of trading days in [start_date, end_date].
+        """
+        lo, hi = self._range(start_date, end_date)
+        return max(hi - lo, 0)
+
+    def is_valid_range(self, start_date, end_date):
+        """
+        Returns whether there is at least one trading day in [start_date, end_date].
+        Raises pd.errors.OutOfBoundsDatetime for dates outside the calendar.
+        """
+        return self.count(start_date, end_date) > 0
+
+    def is_trading_day(self, date):
+        date = self._check(date)
+        position = np.searchsorted(self.days, date)
+        return position < len(self.days) and self.days[position] == date
+
+    def is_month_end(self, date):
+        """
+        Returns whether date is the last trading day of its month.
+        """
+        return self.is_period_end(date, 'monthly')
+
+    def is_period_end(self, date, frequency = 'monthly', start_date = None):
+        """
+        Returns whether date is the last trading day of its rebalance period, so that it stays a rebalance
+        date however far the period of a backtest is extended. Periods of N trading days are counted from
+        start_date.
+        """
+        date = self._check(date)
+        position = np.searchsorted(self.days, date)
+        if position + 1 >= len(self.days) or self.days[position] != date:
+            return False
+        if isinstance(frequency, (int, np.integer)) and not isinstance(frequency, bool):
+            first = self._range(start_date, date)[0]
+            return (position - first + 1) % frequency == 0
+        keys = period_keys(self.days[position:position + 2], frequency)
+        return keys[0] != keys[1]
+
+    def rebalance_positions(self, start_date, end_date, frequency = 'monthly'):
+        """
+        Returns the positions in self.days of the last trading day of each rebalance period in
+        [start_date, end_date], the final one being the last trading day on or before end_date.
+        frequency is 'daily', 'weekly', 'monthly', 'quarterly' or a number of trading days.
+        """
+        lo, hi = self._range(start_date, end_date)
+        if hi <= lo:
+            return np.empty(0, dtype = np.int64)
+        if frequency == 'monthly':
+            a, b = np.searchsorted(self.month_end_positions, [lo, hi - 1], 'left')
+            return np.append(self.month_end_positions[a:b], hi - 1)
+        return lo + period_end_positions(self.days[lo:hi], frequency)
+
+    def rebalance_dates(self, start_date, end_date, frequency = 'monthly'):
+        """
+        Returns the last trading day of each rebalance period in [start_date, end_date], see rebalance_positions.
+        """
+        return self.days[self.rebalance_positions(start_date, end_date, frequency)]
+
+    def period_start(self, date, frequency = 'monthly'):
+        """
+        Returns the trading day one rebalance period before date: the same day of the previous week, month
+        or quarter (or the trading day before it), or N trading days earlier.
+        """
+        if frequency == 'daily':
+            frequency = 1
+        if isinstance(frequency, (int, np.integer)) and not isinstance(frequency, bool):
+            position = np.searchsorted(self.days, self._check(date), 'left') - frequency
+            if position < 0:
+                raise pd.errors.OutOfBoundsDatetime(f'No trading day {frequency} days before {date} in the trading calendar.')
+            return self.days[position]
+        offsets = {'weekly': pd.DateOffset(weeks = 1), 'monthly': pd.DateOffset(months = 1), 'quarterly': pd.DateOffset(months = 3)}
+        if frequency not in offsets:
+            raise ValueError(f"frequency must be one of {', '.join(FREQUENCIES)} or a number of trading days greater than 0.")
+        return self.snap(pd.Timestamp(date) - offsets[frequency], 'previous')
+
+    def month_ends(self, start_date, end_date):
+        """
+        Returns the last trading day of each month in [start_date, end_date]. For the final month this is
+        the last trading day on or before end_date, like grouping a schedule of the period by month.
+        """
+        #Months ending before the last trading day of the period, then that day itself.
+        return self.rebalance_dates(start_date, end_date, 'monthly')
+
+    def snap(self, date, direction = 'previous'):
+        """
+        Returns date if it is a trading day, otherwise the closest trading day before it
+        (direction = 'previous') or after it (direction = 'next').
+        """
+        date = self._check(date)
+        if direction == 'previous':
+            position = np.searchsorted(self.days, date, 'right') - 1
+        elif direction == 'next':
+            position = np.searchsorted(self.days, date, 'left')
+        else:
+            raise ValueError("direction must be 'previous' or 'next'.")
+        if position < 0 or position >= len(self.days):
+            raise pd.errors.OutOfBoundsDatetime(f'No trading day {direction} to {date} in the trading calendar.')
+        return self.days[position]
+
+
+def get_calendar(name = 'NYSE', calendar_dir = None):
+    """
+    Returns the shared TradingCalendar of an exchange.
+
+    The calendar is loaded from <calendar_dir>/<name>.npz if it is there and still covers the next year,
+    and built and saved otherwise. calendar_dir defaults to $BLOOPBERG_CALENDAR_DIR or ~/.bloopberg/calendars.
+    """
+    if name in _calendars:
+        return _calendars[name]
+    if calendar_dir is None:
+        calendar_dir = os.environ.get('BLOOPBERG_CALENDAR_DIR', DEFAULT_CALENDAR_DIR)
+    path = os.path.join(calendar_dir, name + '.npz')
+    next_year = as_day(datetime.today()) + np.timedelta64(365, 'D')
+
+    calendar = None
+    if os.path.exists(path):
+        try:
+            calendar = TradingCalendar.load(path)
+        except (OSError, ValueError, KeyError):
+            calendar = None
+        if calendar is not None and calendar.last_day < next_year:
+            calendar = None
+    if calendar is None:
+        with instrumentation.span('calendar.build', exchange = name):
+            calendar = TradingCalendar.build(name)
+        try:
+            calendar.save(path)
+        except OSError:
+            #The calendar still works without a saved copy; it is just rebuilt next time.
+            pass
+    _calendars[name] = calendar
+    return calendar
+
+
+def snap(date, direction = 'previous', name = 'NYSE'):
+    """
+    Returns TradingCalendar.snap of date on the shared calendar of an exchange as a 'YYYYMMDD' string,
+    e.g. snap('20171230', 'next') == '20180102'.
+    """
+    return pd.Timestamp(get_calendar(name).snap(date, direction)).strftime('%Y%m%d')